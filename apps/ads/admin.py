@@ -16,7 +16,7 @@ class CountryAdmin(ImportExportModelAdmin, admin.ModelAdmin):
 
 
 class CityAdmin(ImportExportModelAdmin, admin.ModelAdmin):
-    list_display = ['name', 'country', 'short_name', 'date_create']
+    list_display = ['name', 'country', 'short_name', 'latitude', 'longitude', 'date_create']
     search_fields = ['name', 'country']
 
 
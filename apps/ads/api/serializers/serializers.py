@@ -1,7 +1,12 @@
-from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
 
+from apps.ads import cards
+from apps.ads.category_tree import category_tree
 from apps.ads.models import *
+from apps.ads.registry import optional_fields
+from apps.ads.typed_values import TYPED_VALUE_FIELDS
 
 
 class CategoryListSerializers(serializers.ModelSerializer):
@@ -34,9 +39,14 @@ class CategoryDetailSerializers(serializers.ModelSerializer):
         ]
 
     def get_subcategory(self, obj):
-        if obj.subcategory is None:
-            return obj.subcategory
-        return CategoryDetailSerializers(obj.subcategory).data
+        """ nested parent chain, read from the in-memory category tree instead of one query per level """
+        node = category_tree.get(obj.id)
+        parent = category_tree.get(node.parent_id if node else obj.subcategory_id)
+        if parent is None:
+            return None
+        if parent.data is None:
+            parent.data = CategoryDetailSerializers(parent.category).data
+        return parent.data
 
 
 class CountryListSerializers(serializers.ModelSerializer):
@@ -61,7 +71,7 @@ class CityListSerializers(serializers.ModelSerializer):
     class Meta:
         model = City
         fields = [
-            'id', 'name', 'country', 'short_name', 'date_create', 'date_update'
+            'id', 'name', 'country', 'short_name', 'latitude', 'longitude', 'date_create', 'date_update'
         ]
 
     def create(self, validated_data):
@@ -78,7 +88,7 @@ class CitySerializer(serializers.ModelSerializer):
     class Meta:
         model = City
         fields = [
-            'id', 'name', 'country', 'short_name', 'date_create', 'date_update'
+            'id', 'name', 'country', 'short_name', 'latitude', 'longitude', 'date_create', 'date_update'
         ]
 
 
@@ -133,6 +143,7 @@ class JobListSerializers(serializers.ModelSerializer):
             'additionally',
         ]
 
+    @transaction.atomic
     def create(self, validated_data):
         """
         create job additionally
@@ -147,22 +158,13 @@ class JobListSerializers(serializers.ModelSerializer):
         """
         user = self.context.get('request').user
         additionally = validated_data.pop('additionally', [])
-        job_instance = Job.objects.create(**validated_data, user=user)
-        for item in additionally:
-            optional_field_id = item.get('optionalFieldID')
-            try:
-                optional_field_instance = OptionalField.objects.get(id=optional_field_id)
-            except ObjectDoesNotExist:
-                raise serializers.ValidationError({"optionalFieldID": f"Invalid OptionalField ID: {optional_field_id}"})
-            OptionalFieldThrough.objects.create(
-                job=job_instance,
-                optional_field=optional_field_instance,
-                value=item.get('value'),
-                image=item.get('image'),
-                file=item.get('file')
-            )
+        job_instance = Job.objects.create(**validated_data, user_id=user.id)
+        OptionalFieldThrough.objects.bulk_create(
+            [self.build_optional_field(job_instance, item) for item in additionally]
+        )
         return job_instance
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         user = self.context.get('request').user
         additionally_data = validated_data.pop('additionally', [])
@@ -170,42 +172,94 @@ class JobListSerializers(serializers.ModelSerializer):
         # Update the Job instance fields
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.user = user  # Assuming you want to update the user as well
+        instance.user_id = user.id  # Assuming you want to update the user as well
         instance.save()
 
-        # Process the additionally data
         if additionally_data:
-            existing_ids = [item['id'] for item in additionally_data if 'id' in item]
-            for item in additionally_data:
-                if 'id' in item and OptionalFieldThrough.objects.filter(id=item['id']).exists():
-                    # Update existing OptionalFieldThrough instance
-                    optional_instance = OptionalFieldThrough.objects.get(id=item['id'])
-                    optional_instance.value = item.get('value', optional_instance.value)
-                    optional_instance.image = item.get('image', optional_instance.image)
-                    optional_instance.file = item.get('file', optional_instance.file)
-                    optional_instance.save()
-                else:
-                    # Create new OptionalFieldThrough instance
-                    optional_field_id = item.get('optionalFieldID')
-                    try:
-                        optional_field_instance = OptionalField.objects.get(id=optional_field_id)
-                    except ObjectDoesNotExist:
-                        raise serializers.ValidationError(
-                            {"optionalFieldID": f"Invalid OptionalField ID: {optional_field_id}"})
-                    OptionalFieldThrough.objects.create(
-                        job=instance,
-                        optional_field=optional_field_instance,
-                        value=item.get('value'),
-                        image=item.get('image'),
-                        file=item.get('file')
-                    )
-
-            # Delete OptionalFieldThrough instances that were not included in the update
-            if existing_ids:
-                instance.optionallyfieldthrough_set.exclude(id__in=existing_ids).delete()
-
+            self.update_additionally(instance, additionally_data)
         return instance
 
+    @staticmethod
+    def build_optional_field(job, item):
+        optional_field_id = item.get('optionalFieldID')
+        optional_field = optional_fields.get(optional_field_id)
+        if optional_field is None:
+            raise serializers.ValidationError({"optionalFieldID": f"Invalid OptionalField ID: {optional_field_id}"})
+        row = OptionalFieldThrough(
+            job=job,
+            optional_field_id=optional_field_id,
+            value=item.get('value'),
+            image=item.get('image'),
+            file=item.get('file')
+        )
+        row.fill_typed_values(optional_field.type)
+        return row
+
+    def update_additionally(self, instance, additionally_data):
+        """
+        Items with the id of one of the job's rows update it, the others are created.
+        When ids are sent, the job's rows that were not sent are deleted.
+        One SELECT, then at most one bulk UPDATE, one bulk INSERT and one DELETE.
+        """
+        existing = {row.id: row for row in instance.optionalfieldthrough_set.all()}
+        to_update, to_create = [], []
+        for item in additionally_data:
+            row = existing.get(item.get('id'))
+            if row is None:
+                to_create.append(self.build_optional_field(instance, item))
+                continue
+            row.value = item.get('value', row.value)
+            row.image = item.get('image', row.image)
+            row.file = item.get('file', row.file)
+            optional_field = optional_fields.get(row.optional_field_id)
+            row.fill_typed_values(optional_field.type if optional_field else None)
+            to_update.append(row)
+
+        if to_update:
+            OptionalFieldThrough.objects.bulk_update(to_update, ['value', 'image', 'file', *TYPED_VALUE_FIELDS])
+        if to_create:
+            OptionalFieldThrough.objects.bulk_create(to_create)
+        sent_ids = [item['id'] for item in additionally_data if 'id' in item]
+        if sent_ids:
+            kept = {row.id for row in to_update}
+            removed = [pk for pk in existing if pk not in kept]
+            if removed:
+                OptionalFieldThrough.objects.filter(id__in=removed).delete()
+
+
+class JobBulkSerializers(serializers.ModelSerializer):
+    """
+    One ad of /ads/bulk/. Foreign keys are checked against the id sets in the context
+    (category_ids, city_ids, optional_field_ids) instead of one query per item.
+    """
+    category = serializers.IntegerField(required=False, allow_null=True)
+    city = serializers.IntegerField(required=False, allow_null=True)
+    additionally = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+
+    class Meta:
+        model = Job
+        fields = [
+            'title', 'category', 'city', 'description', 'contact_number',
+            'email', 'name', 'additionally',
+        ]
+
+    def validate_category(self, value):
+        if value is not None and value not in self.context['category_ids']:
+            raise serializers.ValidationError(f"Invalid Category ID: {value}")
+        return value
+
+    def validate_city(self, value):
+        if value is not None and value not in self.context['city_ids']:
+            raise serializers.ValidationError(f"Invalid City ID: {value}")
+        return value
+
+    def validate_additionally(self, value):
+        for item in value:
+            optional_field_id = item.get('optionalFieldID')
+            if optional_field_id not in self.context['optional_field_ids']:
+                raise serializers.ValidationError(f"Invalid OptionalField ID: {optional_field_id}")
+        return value
+
 
 class JobDetailSerializers(serializers.ModelSerializer):
     """ Job details create update and details """
@@ -222,8 +276,23 @@ class JobDetailSerializers(serializers.ModelSerializer):
             'is_top', 'is_vip', 'optional_field'
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Load everything the serializer reads in a constant number of queries:
+        one JOIN for category, city and user, one prefetch for the optional fields.
+        """
+        return queryset.select_related('category', 'city', 'user').prefetch_related(
+            Prefetch(
+                'optionalfieldthrough_set',
+                queryset=OptionalFieldThrough.objects.select_related('optional_field')
+            )
+        )
+
     def get_category(self, obj):
         """ get job category. type : str """
+        if obj.category is None:
+            return None
         return obj.category.name
 
     def get_city(self, obj):
@@ -234,7 +303,9 @@ class JobDetailSerializers(serializers.ModelSerializer):
                 "country": "Spain"
             }
         """
-        return list(City.objects.filter(id=obj.city.id).values('name', 'country'))[0]
+        if obj.city is None:
+            return None
+        return {'name': obj.city.name, 'country': obj.city.country_id}
 
     def get_user(self, obj):
         """
@@ -245,20 +316,65 @@ class JobDetailSerializers(serializers.ModelSerializer):
                 ...
             }
         """
-        return list(CustomUser.objects.filter(id=obj.user.id).values(
-            'id', 'email', 'phone', 'first_name', 'last_name', 'photo'
-        ))[0]
+        user = obj.user
+        if user is None:
+            return None
+        return {
+            'id': user.id,
+            'email': user.email,
+            'phone': user.phone,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'photo': user.photo.name,
+        }
 
     def get_optional_field(self, obj):
-        optional_fields = OptionalFieldThrough.objects.filter(job=obj)
+        optional_fields = obj.optionalfieldthrough_set.all()
         data = OptionalFieldThroughDetailSerializers(optional_fields, many=True).data
         return data
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         request = self.context.get('request')
-        if 'user' in representation and 'photo' in representation['user']:
+        if representation.get('user') and 'photo' in representation['user']:
             logo_path = representation['user']['photo']
             if logo_path and request:
                 representation['user']['photo'] = request.build_absolute_uri(logo_path)
         return representation
+
+
+class JobCardListSerializers(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        """ Jobs without a card yet get theirs built in one batch """
+        jobs = list(data)
+        missing = [job.pk for job in jobs if not hasattr(job, 'card')]
+        built = cards.refresh_job_cards(missing, using=Job.objects.db) if missing else {}
+        for job in jobs:
+            if job.pk in built:
+                job.card = built[job.pk]
+        return [self.child.to_representation(job) for job in jobs]
+
+
+class JobCardSerializers(serializers.BaseSerializer):
+    """
+    Read-only JobDetailSerializers output served from JobCard.
+    Querysets must select_related('card'); only the request dependent urls (photo, user.photo) are computed here.
+    """
+
+    class Meta:
+        list_serializer_class = JobCardListSerializers
+
+    def to_representation(self, instance):
+        representation = dict(instance.card.payload)
+        request = self.context.get('request')
+        if request is None:
+            return representation
+        if representation.get('photo'):
+            representation['photo'] = request.build_absolute_uri(representation['photo'])
+        if representation.get('user') and representation['user'].get('photo'):
+            representation['user'] = {
+                **representation['user'], 'photo': request.build_absolute_uri(representation['user']['photo'])
+            }
+        # optional_field[].image / .file stay as stored: JobDetailSerializers returns them relative
+        return representation
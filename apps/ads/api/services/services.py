@@ -0,0 +1,74 @@
+from django.db import transaction
+from rest_framework import serializers
+
+from apps.ads import cards, search
+from apps.ads.api.serializers.serializers import JobBulkSerializers
+from apps.ads.models import Job, Category, City, OptionalFieldThrough
+from apps.ads.registry import optional_fields
+from utils.cache import bump_model_version
+
+
+class JobBulkService:
+    """ Validates a batch of ads up front and writes the valid ones with bulk_create """
+
+    MAX_ITEMS = 10000
+    CHUNK_SIZE = 1000
+
+    def __init__(self, user, chunk_size=CHUNK_SIZE):
+        self.user = user
+        self.chunk_size = chunk_size
+
+    def get_serializer_context(self):
+        return {
+            'category_ids': set(Category.objects.values_list('id', flat=True)),
+            'city_ids': set(City.objects.values_list('id', flat=True)),
+            'optional_field_ids': optional_fields.ids(),
+        }
+
+    def validate(self, items):
+        """ Returns the valid (index, validated_data) pairs and the per-item results of the invalid ones """
+        if not isinstance(items, list):
+            raise serializers.ValidationError("Expected a list of ads.")
+        if len(items) > self.MAX_ITEMS:
+            raise serializers.ValidationError(f"At most {self.MAX_ITEMS} ads per request.")
+        child = JobBulkSerializers(many=True, context=self.get_serializer_context()).child
+        valid, results = [], []
+        for index, item in enumerate(items):
+            try:
+                valid.append((index, child.run_validation(item)))
+            except serializers.ValidationError as exc:
+                results.append({'index': index, 'status': 'invalid', 'errors': exc.detail})
+        return valid, results
+
+    def create(self, items):
+        valid, results = self.validate(items)
+        for start in range(0, len(valid), self.chunk_size):
+            results.extend(self.write_chunk(valid[start:start + self.chunk_size]))
+        if valid:
+            # bulk_create sends no post_save
+            bump_model_version(Job)
+        return sorted(results, key=lambda result: result['index'])
+
+    @transaction.atomic
+    def write_chunk(self, chunk):
+        jobs = Job.objects.bulk_create([self.build_job(data) for _, data in chunk])
+        OptionalFieldThrough.objects.bulk_create([
+            self.build_optional_field(job, item)
+            for job, (_, data) in zip(jobs, chunk)
+            for item in data['additionally']
+        ])
+        search.index_jobs(jobs, using=Job.objects.db)
+        cards.refresh_job_cards([job.pk for job in jobs], using=Job.objects.db)
+        return [{'index': index, 'status': 'created', 'id': job.pk} for job, (index, _) in zip(jobs, chunk)]
+
+    def build_job(self, data):
+        data = {key: value for key, value in data.items() if key != 'additionally'}
+        category_id = data.pop('category', None)
+        city_id = data.pop('city', None)
+        return Job(**data, category_id=category_id, city_id=city_id, user_id=self.user.id)
+
+    def build_optional_field(self, job, item):
+        optional_field_id = item.get('optionalFieldID')
+        row = OptionalFieldThrough(job=job, optional_field_id=optional_field_id, value=item.get('value'))
+        row.fill_typed_values(optional_fields.get(optional_field_id).type)
+        return row
@@ -3,16 +3,22 @@ from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
+from rest_framework.parsers import JSONParser
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 
-from apps.ads.filter import filter_by_title, filter_by_category, filter_by_city, filter_is_top_ads, filter_is_pop_ads
+from apps.ads.filter import (
+    filter_by_title, filter_by_search, filter_by_attributes, filter_by_category, filter_by_category_tree,
+    filter_by_city, filter_by_near, filter_is_top_ads
+)
+from apps.ads.api.services.services import JobBulkService
+from apps.ads.facets import FACET_PARAMS, get_job_facets
 from apps.ads.models import *
 from apps.ads.api.serializers.serializers import (
     CategoryListSerializers,
     CountryListSerializers, CityListSerializers,
     OptionalFieldListSerializers, OptionalFieldThroughListSerializers,
-    JobListSerializers, JobDetailSerializers, CategoryDetailSerializers
+    JobListSerializers, JobDetailSerializers, CategoryDetailSerializers, JobBulkSerializers, JobCardSerializers
 )
 from utils.responses import (
     bad_request_response,
@@ -22,13 +28,20 @@ from utils.responses import (
 )
 from utils.expected_fields import check_required_key
 from utils.renderers import UserRenderers
-from utils.pagination import PaginationMethod, StandardResultsSetPagination
+from utils.cache import cache_response
+from utils.conditional import conditional_detail
+from utils.parsers import NDJSONParser
+from utils.pagination import PaginationMethod, StandardResultsSetPagination, CursorResultsSetPagination
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+# every query param JobListView reads, the cache key is built from these only
+JOB_LIST_PARAMS = (*FACET_PARAMS, "page", "limit", "cursor")
+
 
 class JobListView(APIView, PaginationMethod):
     pagination_class = StandardResultsSetPagination
+    cursor_pagination_class = CursorResultsSetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = [
         "job_category",
@@ -40,33 +53,91 @@ class JobListView(APIView, PaginationMethod):
     job_category_param = openapi.Parameter('job_category', openapi.IN_QUERY, description="Filter by job category",
                                            type=openapi.TYPE_STRING)
     title_param = openapi.Parameter('title', openapi.IN_QUERY, description="Filter by title", type=openapi.TYPE_STRING)
+    search_param = openapi.Parameter('q', openapi.IN_QUERY, description="Full-text search in title and description, "
+                                                                "the newest matches ordered by relevance, "
+                                                                "not combinable with cursor",
+                                     type=openapi.TYPE_STRING)
     category_param = openapi.Parameter('category', openapi.IN_QUERY, description="Filter by category",
                                        type=openapi.TYPE_STRING)
+    category_tree_param = openapi.Parameter('categoryTree', openapi.IN_QUERY,
+                                            description="Filter by categories including their subcategories",
+                                            type=openapi.TYPE_STRING)
     city_param = openapi.Parameter('city', openapi.IN_QUERY, description="Filter by city", type=openapi.TYPE_STRING)
     is_top_param = openapi.Parameter('isTop', openapi.IN_QUERY, description="Filter by top ads",
                                      type=openapi.TYPE_BOOLEAN)
-    is_pop_param = openapi.Parameter('isPop', openapi.IN_QUERY, description="Filter by popular ads",
-                                     type=openapi.TYPE_BOOLEAN)
-
-    @swagger_auto_schema(manual_parameters=[job_category_param, title_param, category_param, city_param, is_top_param,
-                                            is_pop_param],
+    cursor_param = openapi.Parameter('cursor', openapi.IN_QUERY,
+                                     description="Cursor pagination token, send empty value for the first page. "
+                                                 "Not available with q",
+                                     type=openapi.TYPE_STRING)
+    near_param = openapi.Parameter('near', openapi.IN_QUERY, description="latitude,longitude of a point",
+                                   type=openapi.TYPE_STRING)
+    radius_param = openapi.Parameter('radius_km', openapi.IN_QUERY,
+                                     description="Radius around near in km, default 10",
+                                     type=openapi.TYPE_NUMBER)
+    attribute_param = openapi.Parameter('attr.<key>__<lookup>', openapi.IN_QUERY,
+                                        description="Filter by a typed optional field, lookup is one of "
+                                                    "exact, gt, gte, lt, lte, e.g. attr.salary__gte=3000",
+                                        type=openapi.TYPE_STRING)
+
+    @swagger_auto_schema(manual_parameters=[job_category_param, title_param, search_param, category_param,
+                                            category_tree_param, city_param, near_param, radius_param, is_top_param,
+                                            cursor_param, attribute_param],
                          operation_description="Retrieve a list of jobs",
                          tags=['Ads'],
                          responses={200: JobListSerializers(many=True)})
+    @cache_response(depends_on=[Job, JobCard, Category, City], query_params=JOB_LIST_PARAMS)
     def get(self, request):
-        queryset = Job.objects.all().order_by('-id')
+        # search results are ordered by relevance, the cursor only seeks on -id
+        if request.query_params.get("q") and self.cursor_pagination_class.cursor_query_param in request.query_params:
+            return bad_request_response("cursor can not be combined with q, page through search results with page")
+        queryset = Job.objects.select_related('card').order_by('-id')
         queryset = filter_by_title(queryset, request)
+        queryset = filter_by_search(queryset, request)
+        queryset = filter_by_attributes(queryset, request)
         queryset = filter_by_category(queryset, request)
+        queryset = filter_by_category_tree(queryset, request)
         queryset = filter_by_city(queryset, request)
+        queryset = filter_by_near(queryset, request)
         queryset = filter_is_top_ads(queryset, request)
-        queryset = filter_is_pop_ads(queryset, request)
-        serializers = super().page(queryset, JobDetailSerializers, request)
+        serializers = super().page(queryset, JobCardSerializers, request)
         return success_response(serializers.data)
 
-class MyAdsListViews(APIView):
+
+class JobFacetsView(APIView):
+    """ Counts per category, city, is_top and is_vip for the JobListView filters """
+
+    title_param = openapi.Parameter('title', openapi.IN_QUERY, description="Filter by title", type=openapi.TYPE_STRING)
+    search_param = openapi.Parameter('q', openapi.IN_QUERY, description="Full-text search in title and description",
+                                     type=openapi.TYPE_STRING)
+    category_param = openapi.Parameter('category', openapi.IN_QUERY, description="Filter by category",
+                                       type=openapi.TYPE_STRING)
+    category_tree_param = openapi.Parameter('categoryTree', openapi.IN_QUERY,
+                                            description="Filter by categories including their subcategories",
+                                            type=openapi.TYPE_STRING)
+    city_param = openapi.Parameter('city', openapi.IN_QUERY, description="Filter by city", type=openapi.TYPE_STRING)
+    near_param = openapi.Parameter('near', openapi.IN_QUERY, description="latitude,longitude of a point",
+                                   type=openapi.TYPE_STRING)
+    radius_param = openapi.Parameter('radius_km', openapi.IN_QUERY,
+                                     description="Radius around near in km, default 10",
+                                     type=openapi.TYPE_NUMBER)
+    is_top_param = openapi.Parameter('isTop', openapi.IN_QUERY, description="Filter by top ads",
+                                     type=openapi.TYPE_BOOLEAN)
+    attribute_param = JobListView.attribute_param
+
+    @swagger_auto_schema(manual_parameters=[title_param, search_param, category_param, category_tree_param, city_param,
+                                            near_param, radius_param, is_top_param, attribute_param],
+                         operation_description="Retrieve facet counts of jobs",
+                         tags=['Ads'])
+    @cache_response(depends_on=[Job, Category, City], query_params=FACET_PARAMS)
+    def get(self, request):
+        return success_response(get_job_facets(request))
+
+
+class MyAdsListViews(APIView, PaginationMethod):
     permission_classes = [IsAuthenticated, AllowAny]
     renderer_classes = [UserRenderers]
     pagination_class = StandardResultsSetPagination
+    cursor_pagination_class = CursorResultsSetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = [
         "job_category",
@@ -83,22 +154,22 @@ class MyAdsListViews(APIView):
     city_param = openapi.Parameter('city', openapi.IN_QUERY, description="Filter by city", type=openapi.TYPE_STRING)
     is_top_param = openapi.Parameter('isTop', openapi.IN_QUERY, description="Filter by top ads",
                                      type=openapi.TYPE_BOOLEAN)
-    is_pop_param = openapi.Parameter('isPop', openapi.IN_QUERY, description="Filter by popular ads",
-                                     type=openapi.TYPE_BOOLEAN)
+    cursor_param = openapi.Parameter('cursor', openapi.IN_QUERY,
+                                     description="Cursor pagination token, send empty value for the first page",
+                                     type=openapi.TYPE_STRING)
 
     @swagger_auto_schema(manual_parameters=[job_category_param, title_param, category_param, city_param, is_top_param,
-                                            is_pop_param],
+                                            cursor_param],
                          operation_description="Retrieve a list of jobs",
                          tags=['MyAds'],
                          responses={200: JobListSerializers(many=True)})
     def get(self, request):
-        queryset = Job.objects.select_related('user').filter(user=request.user).order_by('-id')
+        queryset = Job.objects.filter(user_id=request.user.id).select_related('card').order_by('-id')
         queryset = filter_by_title(queryset, request)
         queryset = filter_by_category(queryset, request)
         queryset = filter_by_city(queryset, request)
         queryset = filter_is_top_ads(queryset, request)
-        queryset = filter_is_pop_ads(queryset, request)
-        serializers = super().page(queryset, JobDetailSerializers, request)
+        serializers = super().page(queryset, JobCardSerializers, request)
         return success_response(serializers.data)
 
 
@@ -123,14 +194,29 @@ class AdsCreateView(APIView):
         return bad_request_response(serializers.errors)
     
 
+class AdsBulkCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, NDJSONParser]
+
+    @swagger_auto_schema(request_body=JobBulkSerializers(many=True),
+                         operation_description="Create many ads at once. JSON array or NDJSON (application/x-ndjson), "
+                                               "returns one result per item",
+                         tags=['Ads'])
+    def post(self, request):
+        results = JobBulkService(request.user).create(request.data)
+        return success_response(results)
+
+
 class AdsDetailView(APIView):
     permission_classes = [AllowAny]
 
     @swagger_auto_schema(operation_description="Ads get by id",
                          tags=['Ads'],
                          responses={200: JobDetailSerializers(many=True)})
+    # the card follows every source of the detail (category, city, user, optional fields)
+    @conditional_detail(Job, fields=('date_update', 'card__date_update'))
     def get(self, request, pk):
-        queryset = get_object_or_404(Job, pk=pk)
+        queryset = get_object_or_404(JobDetailSerializers.setup_eager_loading(Job.objects.all()), pk=pk)
         serializers = JobDetailSerializers(queryset)
         return success_response(serializers.data)
 
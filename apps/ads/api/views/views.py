@@ -1,8 +1,15 @@
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
+from rest_framework import status
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.ads.category_tree import category_tree
+from apps.ads.city_index import city_index, DEFAULT_LIMIT
 from apps.ads.models import *
+from apps.ads.reference import reference_snapshot
 from apps.ads.api.serializers.serializers import (
     CategoryListSerializers,
     CountryListSerializers, CityListSerializers,
@@ -16,7 +23,10 @@ from utils.responses import (
 )
 
 from utils.expected_fields import check_required_key
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from utils.cache import cache_response
+from utils.conditional import conditional_detail, conditional_list
 
 
 class CategoryListView(APIView):
@@ -26,8 +36,10 @@ class CategoryListView(APIView):
     @swagger_auto_schema(operation_description="Retrieve a list of categories",
                          tags=['Categories'],
                          responses={200: CategoryListSerializers(many=True)})
+    @conditional_list(Category)
+    @cache_response(depends_on=[Category])
     def get(self, request):
-        queryset = Category.objects.all().order_by('-id')
+        queryset = [node.category for node in sorted(category_tree.nodes(), key=lambda node: -node.id)]
         serializers = CategoryDetailSerializers(queryset, many=True,
                                               context={'request': request})
         return success_response(serializers.data)
@@ -58,9 +70,12 @@ class CategoryDetailView(APIView):
     @swagger_auto_schema(operation_description="Retrieve a category",
                          tags=['Categories'],
                          responses={200: CategoryListSerializers(many=True)})
+    @conditional_detail(Category, depends_on=[Category])
     def get(self, request, pk):
-        queryset = get_object_or_404(Category, pk=pk)
-        serializers = CategoryDetailSerializers(queryset, context={'request': request})
+        node = category_tree.get(pk)
+        if node is None:
+            raise Http404
+        serializers = CategoryDetailSerializers(node.category, context={'request': request})
         return success_response(serializers.data)
 
     """ Category Put View """
@@ -101,6 +116,8 @@ class CountryListView(APIView):
     @swagger_auto_schema(operation_description="Retrieve a list of country",
                          tags=['Country'],
                          responses={200: CountryListSerializers(many=True)})
+    @conditional_list(Country)
+    @cache_response(depends_on=[Country])
     def get(self, request):
         queryset = Country.objects.all().order_by('-id')
         serializers = CountryListSerializers(queryset, many=True,
@@ -133,6 +150,7 @@ class CountryDetailView(APIView):
     @swagger_auto_schema(operation_description="Retrieve a country",
                          tags=['Country'],
                          responses={200: CategoryListSerializers(many=True)})
+    @conditional_detail(Country)
     def get(self, request, pk):
         queryset = get_object_or_404(Country, pk=pk)
         serializers = CountryListSerializers(queryset, context={'request': request})
@@ -176,6 +194,8 @@ class CityListView(APIView):
     @swagger_auto_schema(operation_description="Retrieve a list of cities",
                          tags=['City'],
                          responses={200: CategoryListSerializers(many=True)})
+    @conditional_list(City, depends_on=[Country])
+    @cache_response(depends_on=[City, Country])
     def get(self, request):
         queryset = City.objects.all().order_by('-id')
         serializers = CitySerializer(queryset, many=True,
@@ -189,7 +209,7 @@ class CityListView(APIView):
                          tags=['City'],
                          responses={201: CountryListSerializers(many=False)})
     def post(self, request):
-        valid_fields = {'name'}
+        valid_fields = {'name', 'latitude', 'longitude'}
         unexpected_fields = check_required_key(request, valid_fields)
         if unexpected_fields:
             return bad_request_response(f"Unexpected fields: {', '.join(unexpected_fields)}")
@@ -201,6 +221,29 @@ class CityListView(APIView):
         return bad_request_response(serializers.errors)
 
 
+class CityAutocompleteView(APIView):
+    permission_classes = [AllowAny]
+    """ City autocomplete, served from the in-memory prefix index """
+
+    q_param = openapi.Parameter('q', openapi.IN_QUERY, description="Beginning of the city name or short name",
+                                type=openapi.TYPE_STRING)
+    country_param = openapi.Parameter('country', openapi.IN_QUERY, description="Country id",
+                                      type=openapi.TYPE_INTEGER)
+    limit_param = openapi.Parameter('limit', openapi.IN_QUERY, description="Number of cities, at most 50",
+                                    type=openapi.TYPE_INTEGER)
+
+    @swagger_auto_schema(manual_parameters=[q_param, country_param, limit_param],
+                         operation_description="Most popular cities starting with q",
+                         tags=['City'])
+    def get(self, request):
+        try:
+            country = int(request.query_params['country']) if request.query_params.get('country') else None
+            limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            return bad_request_response("country and limit must be integers")
+        return success_response(city_index.search(request.query_params.get('q', ''), country, limit))
+
+
 class CityDetailViews(APIView):
     permission_classes = [AllowAny]
     """ City Get View """
@@ -208,6 +251,7 @@ class CityDetailViews(APIView):
     @swagger_auto_schema(operation_description="Retrieve a city",
                          tags=['City'],
                          responses={200: CityListSerializers(many=True)})
+    @conditional_detail(City, depends_on=[Country])
     def get(self, request, pk):
         queryset = get_object_or_404(City, pk=pk)
         serializers = CitySerializer(queryset, context={'request': request})
@@ -220,7 +264,7 @@ class CityDetailViews(APIView):
                          tags=['City'],
                          responses={201: CityListSerializers(many=False)})
     def put(self, request, pk):
-        valid_fields = {'name'}
+        valid_fields = {'name', 'latitude', 'longitude'}
         unexpected_fields = check_required_key(request, valid_fields)
         if unexpected_fields:
             return bad_request_response(f"Unexpected fields: {', '.join(unexpected_fields)}")
@@ -251,8 +295,34 @@ class OptionalFieldListView(APIView):
     @swagger_auto_schema(operation_description="Retrieve a list of optional Field",
                          tags=['Optional Field'],
                          responses={200: OptionalFieldListSerializers(many=True)})
+    @cache_response(depends_on=[OptionalField])
     def get(self, request):
         queryset = OptionalField.objects.all().order_by('-id')
         serializers = OptionalFieldListSerializers(queryset, many=True,
                                               context={'request': request})
         return success_response(serializers.data)
+
+
+class ReferenceSnapshotView(APIView):
+    """
+    Categories, countries, cities and optional fields in one response, served from process memory.
+    Send the ETag back as If-None-Match: while nothing changed the answer is a 304
+    decided from the cache versions alone, without authentication or database access.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(operation_description="Retrieve all reference data with its version",
+                         tags=['Reference'])
+    def get(self, request):
+        version = reference_snapshot.version()
+        etag = f'"{version}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            version, data = reference_snapshot.get()
+            etag = f'"{version}"'
+            response = success_response(data)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
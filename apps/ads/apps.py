@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AdsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ads'
+
+    def ready(self):
+        from apps.ads import signals  # noqa: F401
@@ -0,0 +1,146 @@
+"""
+JobCard read model: the serialized feed item of every job, so the feed is one
+indexed read instead of a JOIN over six tables plus re-serialization.
+
+Cards are refreshed when the current transaction commits. A job change rebuilds
+its own card; a change of a card field of a Category, City, CustomUser or
+OptionalField patches that part of every card showing it, CARD_BATCH_SIZE cards at a time.
+"""
+import threading
+
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.ads.models import Job, JobCard, Category, City, OptionalField, OptionalFieldThrough
+from apps.auth_app.models import CustomUser
+from utils.cache import bump_model_version
+
+CARD_BATCH_SIZE = 500
+
+# model -> (fields shown on the card, condition selecting the cards showing the row with that pk)
+CARD_SOURCES = {
+    Category: (('name',), lambda pk: Q(job__category_id=pk)),
+    City: (('name', 'country'), lambda pk: Q(job__city_id=pk)),
+    CustomUser: (('email', 'phone', 'first_name', 'last_name', 'photo'), lambda pk: Q(job__user_id=pk)),
+    OptionalField: (
+        ('name', 'key', 'type', 'is_required', 'default', 'max_length', 'min_length', 'is_active'),
+        lambda pk: Q(job_id__in=OptionalFieldThrough.objects.filter(optional_field_id=pk).values('job_id'))
+    ),
+}
+
+_pending = threading.local()
+
+
+def refresh_job_cards(job_ids, using="default"):
+    """ Rebuild the cards of job_ids with a constant number of queries, returns them by job id """
+    # imported here, the serializers module imports this one
+    from apps.ads.api.serializers.serializers import JobDetailSerializers
+
+    job_ids = list(job_ids)
+    if not job_ids:
+        return {}
+    jobs = JobDetailSerializers.setup_eager_loading(Job.objects.using(using).filter(id__in=job_ids))
+    cards = [JobCard(job=job, payload=JobDetailSerializers(job).data) for job in jobs]
+    if cards:
+        JobCard.objects.using(using).bulk_create(
+            cards, update_conflicts=True, unique_fields=['job'], update_fields=['payload', 'date_update']
+        )
+        bump_model_version(JobCard)
+    return {card.job_id: card for card in cards}
+
+
+def card_patch(instance):
+    """ Function applying the new state of a Category, City, CustomUser or OptionalField to a card payload """
+    from apps.ads.api.serializers.serializers import JobDetailSerializers, OptionalFieldListSerializers
+
+    serializer = JobDetailSerializers()
+    if isinstance(instance, Category):
+        category = serializer.get_category(Job(category=instance))
+        return lambda payload: payload.update(category=category)
+    if isinstance(instance, City):
+        city = serializer.get_city(Job(city=instance))
+        return lambda payload: payload.update(city=city)
+    if isinstance(instance, CustomUser):
+        user = serializer.get_user(Job(user=instance))
+        return lambda payload: payload.update(user=user)
+
+    optional_field = dict(OptionalFieldListSerializers(instance).data)
+
+    def patch(payload):
+        for item in payload.get('optional_field') or []:
+            if (item.get('optional_field') or {}).get('id') == instance.pk:
+                item['optional_field'] = optional_field
+    return patch
+
+
+def patch_job_cards_where(patch, condition, using="default", batch_size=CARD_BATCH_SIZE):
+    """
+    Apply patch to every card matching condition without re-serializing the jobs.
+    batch_size cards per round, written with one executemany UPDATE: bulk_update's
+    CASE WHEN over hundreds of JSON documents costs more to build than to run.
+    """
+    queryset = JobCard.objects.using(using).filter(condition).order_by('job_id')
+    payload_field = JobCard._meta.get_field('payload')
+    connection = connections[using]
+    sql = f"UPDATE {JobCard._meta.db_table} SET payload = %s, date_update = %s WHERE job_id = %s"
+    last_id, patched = 0, 0
+    while True:
+        cards = list(queryset.filter(job_id__gt=last_id).values_list('job_id', 'payload')[:batch_size])
+        if not cards:
+            break
+        now = timezone.now()
+        rows = []
+        for job_id, payload in cards:
+            patch(payload)
+            rows.append((payload_field.get_db_prep_save(payload, connection), now, job_id))
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        patched += len(cards)
+        last_id = cards[-1][0]
+    if patched:
+        bump_model_version(JobCard)
+    return patched
+
+
+def card_fields_changed(instance, using="default", update_fields=None):
+    """ Whether saving instance changes what the cards show, compared with the stored row """
+    fields, _ = CARD_SOURCES[type(instance)]
+    if instance.pk is None:
+        return False
+    if update_fields is not None and not set(fields) & set(update_fields):
+        return False
+    attnames = [type(instance)._meta.get_field(field).attname for field in fields]
+    stored = type(instance)._base_manager.using(using).filter(pk=instance.pk).values_list(*attnames).first()
+    if stored is None:
+        return False
+    return tuple(stored) != tuple(_stored_value(getattr(instance, attname)) for attname in attnames)
+
+
+def _stored_value(value):
+    # FieldFile compares by name, values_list() returns the name
+    return getattr(value, 'name', value)
+
+
+def _pending_ids(using):
+    return _pending.__dict__.setdefault(using, set())
+
+
+def _flush(using):
+    job_ids = _pending_ids(using)
+    if job_ids:
+        _pending.__dict__[using] = set()
+        refresh_job_cards(job_ids, using)
+
+
+def schedule_refresh(job_ids, using="default"):
+    """ Refresh the cards once per transaction, however many rows of the jobs were written """
+    _pending_ids(using).update(job_ids)
+    transaction.on_commit(lambda: _flush(using), using=using)
+
+
+def schedule_patch(instance, using="default"):
+    """ Patch the cards showing instance once the current transaction commits """
+    _, condition = CARD_SOURCES[type(instance)]
+    patch = card_patch(instance)
+    transaction.on_commit(lambda: patch_job_cards_where(patch, condition(instance.pk), using), using=using)
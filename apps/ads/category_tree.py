@@ -0,0 +1,93 @@
+import threading
+
+from apps.ads.models import Category
+from utils.cache import get_model_version
+
+
+class CategoryNode:
+    """ One category of the tree. parent_id is Category.subcategory_id, ancestors are nearest first """
+    __slots__ = ('id', 'parent_id', 'category', 'ancestors', 'children', 'descendants', 'data')
+
+    def __init__(self, category):
+        self.id = category.id
+        self.parent_id = category.subcategory_id
+        self.category = category
+        self.ancestors = ()
+        self.children = []
+        self.descendants = frozenset()
+        # serialized form, filled on first use by the serializers
+        self.data = None
+
+
+class CategoryTree:
+    """
+    The whole Category table as a tree, loaded with one query.
+    Reloaded when the Category cache version moves, i.e. after a save/delete
+    in this or any other worker sharing the cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._nodes = {}
+
+    def _load(self):
+        nodes = {category.id: CategoryNode(category) for category in Category.objects.order_by('id')}
+        for node in nodes.values():
+            if node.parent_id not in nodes:
+                node.parent_id = None
+        # a self-FK can form a cycle, cut it where it is found
+        for node in nodes.values():
+            path = {node.id}
+            current = node
+            while current.parent_id is not None:
+                if current.parent_id in path:
+                    current.parent_id = None
+                    break
+                path.add(current.parent_id)
+                current = nodes[current.parent_id]
+        for node in nodes.values():
+            ancestors = []
+            parent_id = node.parent_id
+            while parent_id is not None:
+                ancestors.append(parent_id)
+                parent_id = nodes[parent_id].parent_id
+            node.ancestors = tuple(ancestors)
+            if node.parent_id is not None:
+                nodes[node.parent_id].children.append(node.id)
+        # deepest first, so the children's descendant sets are ready
+        for node in sorted(nodes.values(), key=lambda item: -len(item.ancestors)):
+            node.descendants = frozenset(
+                [node.id, *(pk for child in node.children for pk in nodes[child].descendants)]
+            )
+        return nodes
+
+    def _tree(self):
+        version = get_model_version(Category)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._nodes = self._load()
+                    self._version = version
+        return self._nodes
+
+    def get(self, pk):
+        return self._tree().get(pk)
+
+    def nodes(self):
+        return list(self._tree().values())
+
+    def ancestors(self, pk):
+        node = self.get(pk)
+        return node.ancestors if node else ()
+
+    def descendants(self, pk):
+        """ pk and every category below it """
+        node = self.get(pk)
+        return node.descendants if node else frozenset()
+
+    def clear(self):
+        self._version = None
+
+
+category_tree = CategoryTree()
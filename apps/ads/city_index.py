@@ -0,0 +1,184 @@
+"""
+In-memory prefix index for city autocomplete.
+
+Every city is indexed under its normalized name, each word of the name and its short_name,
+as (key, city id) tuples in one sorted list: a prefix is a bisect range.
+Results are ranked by popularity (number of ads in the city), refreshed every POPULARITY_TTL seconds.
+Short prefixes match a large part of the table, for those the cities are walked
+in popularity order until enough of them match instead.
+Changes made in this process are queued and applied to the index by the next search,
+changes made by other workers (a move of the City cache version not made by this process's
+own bumps) trigger a full reload.
+"""
+import bisect
+import heapq
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+
+from django.db.models import Count
+
+from apps.ads.models import City, Job
+from utils.cache import get_model_version, moved_locally
+
+POPULARITY_TTL = 10 * 60
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# more queued changes than this are cheaper to apply with a full reload
+MAX_PENDING = 1000
+# prefix ranges wider than this are answered by walking the cities in popularity order
+WIDE_RANGE = 2000
+PREFIX_END = chr(0x10FFFF)
+
+# entries: sorted (key, city id), cities: id -> payload, keys: id -> keys,
+# popularity: id -> ads, ranked: sorted (-ads, name, id)
+IndexState = namedtuple('IndexState', ['entries', 'cities', 'keys', 'popularity', 'ranked'])
+EMPTY_STATE = IndexState([], {}, {}, {}, [])
+
+
+def normalize(text):
+    """ 'São  Paulo' -> 'sao paulo' """
+    text = text or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.casefold().split())
+
+
+def city_keys(name, short_name):
+    name = normalize(name)
+    words = name.split(' ')
+    keys = {' '.join(words[index:]) for index in range(len(words))}
+    keys.add(normalize(short_name))
+    keys.discard('')
+    return keys
+
+
+class CityIndex:
+    """ Searches read one immutable IndexState, changes build a new one and swap it in """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._popularity_time = 0
+        self._state = EMPTY_STATE
+        # city id -> (id, name, short_name, country_id) of the saved city, or None when deleted
+        self._pending = {}
+
+    @staticmethod
+    def _rank_key(city, popularity):
+        return -popularity.get(city['id'], 0), city['name'] or '', city['id']
+
+    @staticmethod
+    def _index(row, cities, keys):
+        """ row is (id, name, short_name, country_id) """
+        city_id, name, short_name, country_id = row
+        cities[city_id] = {'id': city_id, 'name': name, 'short_name': short_name, 'country': country_id}
+        keys[city_id] = city_keys(name, short_name)
+        return [(key, city_id) for key in keys[city_id]]
+
+    @staticmethod
+    def _unindex(city_id, entries, cities, keys):
+        cities.pop(city_id, None)
+        for key in keys.pop(city_id, ()):
+            index = bisect.bisect_left(entries, (key, city_id))
+            if index < len(entries) and entries[index] == (key, city_id):
+                del entries[index]
+
+    def _load(self):
+        entries, cities, keys = [], {}, {}
+        for row in City.objects.values_list('id', 'name', 'short_name', 'country_id').iterator(chunk_size=10000):
+            entries.extend(self._index(row, cities, keys))
+        entries.sort()
+        return entries, cities, keys
+
+    def _ensure_fresh(self):
+        version = get_model_version(City)
+        now = time.monotonic()
+        if version == self._version and not self._pending and now - self._popularity_time < POPULARITY_TTL:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            state = self._state
+            entries, cities, keys, popularity, ranked = state
+            changed = rerank = False
+            # a version moved by another worker too means changes this process did not queue
+            if version != self._version and (
+                not pending or len(pending) > MAX_PENDING or not moved_locally(City, self._version, version)
+            ):
+                entries, cities, keys = self._load()
+                changed = rerank = True
+            elif pending:
+                entries, cities, keys, ranked = list(entries), dict(cities), dict(keys), list(ranked)
+                for city_id, row in pending.items():
+                    if city_id in cities:
+                        del ranked[bisect.bisect_left(ranked, self._rank_key(cities[city_id], popularity))]
+                    self._unindex(city_id, entries, cities, keys)
+                    if row is not None:
+                        for entry in self._index(row, cities, keys):
+                            bisect.insort(entries, entry)
+                        bisect.insort(ranked, self._rank_key(cities[city_id], popularity))
+                changed = True
+            if now - self._popularity_time >= POPULARITY_TTL:
+                popularity = dict(
+                    Job.objects.filter(city__isnull=False).order_by().values_list('city_id')
+                    .annotate(total=Count('id'))
+                )
+                self._popularity_time = now
+                changed = rerank = True
+            if rerank:
+                ranked = sorted(self._rank_key(city, popularity) for city in cities.values())
+            if changed:
+                self._state = IndexState(entries, cities, keys, popularity, ranked)
+            self._version = version
+
+    def update(self, city):
+        """ Queue a saved city, the next search re-indexes it """
+        self._queue(city.id, (city.id, city.name, city.short_name, city.country_id))
+
+    def remove(self, city_id):
+        self._queue(city_id, None)
+
+    def _queue(self, city_id, row):
+        with self._lock:
+            if self._version is not None:
+                self._pending[city_id] = row
+
+    def search(self, text, country=None, limit=DEFAULT_LIMIT):
+        """ The limit most popular cities with a name, word of the name or short_name starting with text """
+        self._ensure_fresh()
+        state = self._state
+        prefix = normalize(text)
+        limit = max(1, min(limit, MAX_LIMIT))
+        start = bisect.bisect_left(state.entries, (prefix,))
+        end = bisect.bisect_left(state.entries, (prefix + PREFIX_END,), start)
+
+        if end - start > WIDE_RANGE:
+            best = []
+            for _, _, city_id in state.ranked:
+                if country is not None and state.cities[city_id]['country'] != country:
+                    continue
+                if any(key.startswith(prefix) for key in state.keys[city_id]):
+                    best.append(city_id)
+                    if len(best) == limit:
+                        break
+        else:
+            city_ids = {city_id for _, city_id in state.entries[start:end]}
+            if country is not None:
+                city_ids = {city_id for city_id in city_ids if state.cities[city_id]['country'] == country}
+            best = heapq.nsmallest(
+                limit, city_ids, key=lambda city_id: self._rank_key(state.cities[city_id], state.popularity)
+            )
+        return [{**state.cities[city_id], 'ads': state.popularity.get(city_id, 0)} for city_id in best]
+
+    def clear(self):
+        """ Drop the index and the popularity, the next search reloads both """
+        with self._lock:
+            self._version = None
+            self._popularity_time = 0
+            self._state = EMPTY_STATE
+            self._pending = {}
+
+
+city_index = CityIndex()
@@ -1,41 +1,122 @@
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from apps.ads.category_tree import category_tree
+from apps.ads.geo import MAX_NEAR_CITIES, MAX_RADIUS_KM, city_geo_index
+from apps.ads.models import OptionalFieldThrough
+from apps.ads.registry import optional_fields
+from apps.ads.search import search_jobs
+from apps.ads.typed_values import parse_typed_value
+
+ATTRIBUTE_PREFIX = "attr."
+ATTRIBUTE_LOOKUPS = ("exact", "gt", "gte", "lt", "lte")
+
+
+def parse_ids(request, name):
+    """ ?name=1,2,3 as a list of ints, ValidationError (400) for anything else """
+    value = request.query_params.get(name, '')
+    if not value:
+        return []
+    try:
+        return [int(id_str) for id_str in value.split(",")]
+    except ValueError:
+        raise ValidationError({name: "Expected comma-separated ids"})
+
+
 def filter_by_title(queryset, request):
     title = request.query_params.get("title", '')
     if title:
         queryset = queryset.filter(
-            Q(company__title__icontains=title)
+            Q(title__icontains=title)
         )
     return queryset
 
 
+def filter_by_search(queryset, request):
+    """ full-text search on title and description, ordered by relevance """
+    text = request.query_params.get("q", '')
+    if text:
+        queryset = search_jobs(queryset, text)
+    return queryset
+
+
+def filter_by_attributes(queryset, request):
+    """
+    ?attr.<key>__<lookup>=<value> on the typed columns of OptionalFieldThrough,
+    e.g. ?attr.salary__gte=3000&attr.start__lt=2024-06-01. Without a lookup it is exact.
+    Each condition is a semi-join on the (optional_field, value_*, job) index.
+    """
+    for name, value in request.query_params.items():
+        if not name.startswith(ATTRIBUTE_PREFIX):
+            continue
+        key, _, lookup = name[len(ATTRIBUTE_PREFIX):].partition("__")
+        lookup = lookup or "exact"
+        if lookup not in ATTRIBUTE_LOOKUPS:
+            raise ValidationError({name: f"Unsupported lookup: {lookup}"})
+        optional_field = optional_fields.get_by_key(key)
+        if optional_field is None:
+            raise ValidationError({name: f"Unknown attribute: {key}"})
+        column, parsed = parse_typed_value(optional_field.type, value)
+        if column is None:
+            raise ValidationError({name: f"Attribute {key} of type {optional_field.type} can not be filtered"})
+        if parsed is None:
+            raise ValidationError({name: f"Invalid {optional_field.type} value: {value}"})
+        queryset = queryset.filter(id__in=OptionalFieldThrough.objects.filter(
+            optional_field_id=optional_field.id, **{f"{column}__{lookup}": parsed}
+        ).values("job_id"))
+    return queryset
+
+
 def filter_by_category(queryset, request):
-    category = request.query_params.get("category", [])
-    if category:
-        ids_category = [int(id_str) for id_str in category.split(",")]
-        queryset = queryset.filter(Q(job_category__in=ids_category))
+    ids_category = parse_ids(request, "category")
+    if ids_category:
+        queryset = queryset.filter(Q(category__in=ids_category))
+    return queryset
+
+
+def filter_by_category_tree(queryset, request):
+    """ ?categoryTree=1,2: jobs in these categories or in any category below them """
+    ids = parse_ids(request, "categoryTree")
+    if ids:
+        ids_category = set()
+        for category_id in ids:
+            ids_category |= category_tree.descendants(category_id)
+        queryset = queryset.filter(Q(category__in=ids_category))
     return queryset
 
 
 def filter_by_city(queryset, request):
-    city = request.query_params.get("city", [])
-    if city:
-        ids_city = [int(id_str) for id_str in city.split(",")]
-        queryset = queryset.filter(Q(job_city__in=ids_city))
+    ids_city = parse_ids(request, "city")
+    if ids_city:
+        queryset = queryset.filter(Q(city__in=ids_city))
     return queryset
 
 
+def filter_by_near(queryset, request):
+    """ ?near=41.31,69.24&radius_km=30: jobs in the cities at most radius_km (default 10) from the point """
+    near = request.query_params.get("near", '')
+    if not near:
+        return queryset
+    try:
+        latitude, longitude = (float(part) for part in near.split(","))
+        radius_km = float(request.query_params.get("radius_km", 10))
+    except ValueError:
+        raise ValidationError({"near": "Expected near=<latitude>,<longitude> and a numeric radius_km"})
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValidationError({"near": "Latitude must be in [-90, 90] and longitude in [-180, 180]"})
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        raise ValidationError({"radius_km": f"Must be greater than 0 and at most {MAX_RADIUS_KM}"})
+    city_ids = city_geo_index.near(latitude, longitude, radius_km)
+    if len(city_ids) > MAX_NEAR_CITIES:
+        raise ValidationError({"radius_km": "Too many cities in this radius, use a smaller one"})
+    return queryset.filter(Q(city__in=city_ids.tolist()))
+
+
 def filter_is_top_ads(queryset, request):
     is_top = request.query_params.get('isTop', 'False').lower() == 'true'
     action_map = {
-        True: lambda qs: qs.filter(is_pop=True),
+        True: lambda qs: qs.filter(is_top=True),
         False: lambda qs: qs
     }
     return action_map[is_top](queryset)
 
-
-def filter_is_pop_ads(queryset, request):
-    is_pop = request.query_params.get('isPop', 'False').lower() == 'true'
-    action_map = {
-        True: lambda qs: qs.filter(is_pop=True),
-        False: lambda qs: qs
-    }
-    return action_map[is_pop](queryset)
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Nearby search over City coordinates.
+
+The coordinates of every city live in NumPy arrays sorted by latitude: the bounding box
+of a circle is a searchsorted range on latitude plus a longitude mask, and the exact
+haversine distance is computed for the candidates in one vectorized pass.
+"""
+import math
+import threading
+
+import numpy as np
+
+from apps.ads.models import City
+from utils.cache import get_model_version
+
+EARTH_RADIUS_KM = 6371.0088
+MAX_RADIUS_KM = 500
+# more cities than this in the radius would make a too long IN (...) for the jobs query
+MAX_NEAR_CITIES = 10000
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """ Distance in km from one point to arrays of points, all in degrees """
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class CityGeoIndex:
+    """ Coordinates of the cities that have them, reloaded when the City cache version moves """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        # (ids, latitudes, longitudes), sorted by latitude
+        self._arrays = (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+
+    def _load(self):
+        rows = City.objects.filter(latitude__isnull=False, longitude__isnull=False).values_list(
+            'id', 'latitude', 'longitude'
+        )
+        data = np.array(list(rows), dtype=np.float64).reshape(-1, 3)
+        order = np.argsort(data[:, 1], kind='stable')
+        data = data[order]
+        return data[:, 0].astype(np.int64), np.ascontiguousarray(data[:, 1]), np.ascontiguousarray(data[:, 2])
+
+    def _get_arrays(self):
+        version = get_model_version(City)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._arrays = self._load()
+                    self._version = version
+        return self._arrays
+
+    def near(self, latitude, longitude, radius_km):
+        """ Ids of the cities at most radius_km from the point, nearest first """
+        ids, latitudes, longitudes = self._get_arrays()
+        delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        start = np.searchsorted(latitudes, latitude - delta_lat, side='left')
+        end = np.searchsorted(latitudes, latitude + delta_lat, side='right')
+        candidates = slice(start, end)
+        lats, lons, city_ids = latitudes[candidates], longitudes[candidates], ids[candidates]
+
+        # longitude degrees shrink with latitude, near the poles every longitude is a candidate
+        cos_lat = math.cos(math.radians(min(abs(latitude) + delta_lat, 90.0)))
+        if cos_lat > 1e-6:
+            delta_lon = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+            if delta_lon < 180:
+                offset = np.abs((lons - longitude + 180.0) % 360.0 - 180.0)
+                in_box = offset <= delta_lon
+                lats, lons, city_ids = lats[in_box], lons[in_box], city_ids[in_box]
+
+        distances = haversine_km(latitude, longitude, lats, lons)
+        inside = distances <= radius_km
+        city_ids, distances = city_ids[inside], distances[inside]
+        return city_ids[np.argsort(distances, kind='stable')]
+
+    def clear(self):
+        self._version = None
+
+
+city_geo_index = CityGeoIndex()
@@ -0,0 +1,87 @@
+import random
+import time
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+
+from apps.ads.models import Job, Category, City
+from utils.pagination import CursorResultsSetPagination, StandardResultsSetPagination
+
+PAGE_SIZE = 10
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a /ads/ page at growing depths on a seeded table (rolled back at the end): "
+        "?page= (COUNT + OFFSET) against ?cursor= (seek on -id)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jobs", type=int, default=200000)
+        parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000, 5000, 10000])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        with transaction.atomic():
+            self.seed(options["jobs"])
+            self.run(options["pages"], options["repeat"])
+            transaction.set_rollback(True)
+
+    def seed(self, job_count):
+        start = time.perf_counter()
+        categories = [
+            category.id for category in Category.objects.bulk_create([Category(name=f"bench {i}") for i in range(50)])
+        ]
+        cities = [city.id for city in City.objects.bulk_create([City(name=f"bench {i}") for i in range(200)])]
+        batch_size = 10000
+        for offset in range(0, job_count, batch_size):
+            Job.objects.bulk_create([
+                Job(title=f"bench {i}", city_id=random.choice(cities), category_id=random.choice(categories))
+                for i in range(offset, min(offset + batch_size, job_count))
+            ], batch_size=batch_size)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.stdout.write(f"seeded {job_count} jobs in {time.perf_counter() - start:.1f}s")
+
+    @staticmethod
+    def queryset():
+        # the JobListView feed
+        return Job.objects.select_related("card").order_by("-id")
+
+    def cursor_at(self, page):
+        """ The ?cursor= token of page, as a client walking the next links would send it """
+        if page == 1:
+            return ""
+        position = self.queryset().values_list("id", flat=True)[(page - 1) * PAGE_SIZE - 1]
+        paginator = CursorResultsSetPagination()
+        paginator.base_url = "/ads/"
+        url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(position)))
+        return parse_qs(urlparse(url).query)["cursor"][0]
+
+    def time_page(self, pagination_class, params, repeat):
+        request = Request(RequestFactory().get("/ads/", {**params, "limit": PAGE_SIZE}))
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            page = list(pagination_class().paginate_queryset(self.queryset(), request))
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        return timings[len(timings) // 2], [job.id for job in page]
+
+    def run(self, pages, repeat):
+        last_page = Job.objects.count() // PAGE_SIZE
+        self.stdout.write(f"{'page':>8} {'?page=':>12} {'?cursor=':>12}")
+        for page in pages:
+            if page > last_page:
+                self.stdout.write(f"{page:>8} skipped, the table has {last_page} pages")
+                continue
+            offset, offset_ids = self.time_page(StandardResultsSetPagination, {"page": page}, repeat)
+            cursor, cursor_ids = self.time_page(CursorResultsSetPagination, {"cursor": self.cursor_at(page)}, repeat)
+            if offset_ids != cursor_ids:
+                self.stderr.write(f"page {page}: ?page= and ?cursor= returned different jobs")
+            self.stdout.write(f"{page:>8} {offset * 1000:>9.2f} ms {cursor * 1000:>9.2f} ms")
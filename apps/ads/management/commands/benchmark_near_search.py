@@ -0,0 +1,90 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from apps.ads.filter import filter_by_near, filter_by_category
+from apps.ads.geo import city_geo_index
+from apps.ads.models import Job, Category, City
+
+
+class Command(BaseCommand):
+    help = "Time ?near= on a seeded table (rolled back at the end): city pre-selection, count and first page"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cities", type=int, default=200000)
+        parser.add_argument("--jobs", type=int, default=1000000)
+        parser.add_argument("--radius", type=float, default=30)
+        parser.add_argument("--queries", type=int, default=50)
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        with transaction.atomic():
+            categories = self.seed(options["cities"], options["jobs"])
+            self.run(options["radius"], options["queries"], categories)
+            transaction.set_rollback(True)
+        city_geo_index.clear()
+
+    def seed(self, city_count, job_count):
+        """ Cities spread over land-like latitudes, ads spread over the cities """
+        start = time.perf_counter()
+        City.objects.bulk_create([
+            City(name=f"bench {i}", latitude=random.uniform(-55, 70), longitude=random.uniform(-180, 180))
+            for i in range(city_count)
+        ], batch_size=5000)
+        city_ids = list(City.objects.filter(name__startswith="bench ").values_list("id", flat=True))
+        categories = [
+            category.id for category in Category.objects.bulk_create([Category(name=f"bench {i}") for i in range(50)])
+        ]
+        batch_size = 10000
+        for offset in range(0, job_count, batch_size):
+            Job.objects.bulk_create([
+                Job(title=f"bench {i}", city_id=random.choice(city_ids), category_id=random.choice(categories))
+                for i in range(offset, min(offset + batch_size, job_count))
+            ], batch_size=batch_size)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.stdout.write(f"seeded {city_count} cities, {job_count} jobs in {time.perf_counter() - start:.1f}s")
+        return categories
+
+    def run(self, radius, queries, categories):
+        city_geo_index.clear()
+        start = time.perf_counter()
+        city_geo_index.near(0, 0, 1)
+        self.stdout.write(f"index load: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        factory = RequestFactory()
+        timings = {"near()": [], "count": [], "page": [], "page + category": []}
+        found = []
+        for _ in range(queries):
+            latitude, longitude = random.uniform(-50, 65), random.uniform(-180, 180)
+            params = {"near": f"{latitude},{longitude}", "radius_km": radius}
+
+            start = time.perf_counter()
+            found.append(len(city_geo_index.near(latitude, longitude, radius)))
+            timings["near()"].append(time.perf_counter() - start)
+
+            queryset = filter_by_near(Job.objects.order_by("-id"), Request(factory.get("/ads/", params)))
+            start = time.perf_counter()
+            queryset.count()
+            timings["count"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            list(queryset[:10])
+            timings["page"].append(time.perf_counter() - start)
+
+            request = Request(factory.get("/ads/", {**params, "category": random.choice(categories)}))
+            queryset = filter_by_category(filter_by_near(Job.objects.order_by("-id"), request), request)
+            start = time.perf_counter()
+            list(queryset[:10])
+            timings["page + category"].append(time.perf_counter() - start)
+
+        self.stdout.write(f"radius {radius} km: {sum(found) / len(found):.1f} cities on average")
+        for name, values in timings.items():
+            values.sort()
+            self.stdout.write(
+                f"{name:>16}: median {values[len(values) // 2] * 1000:.2f} ms, "
+                f"p95 {values[int(len(values) * 0.95)] * 1000:.2f} ms"
+            )
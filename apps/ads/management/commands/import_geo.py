@@ -0,0 +1,164 @@
+import csv
+import gzip
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.ads import cards
+from apps.ads.models import Country, City
+from utils.cache import bump_model_version
+
+# GeoNames cities*.txt / allCountries.txt columns
+GEONAMES_ID, GEONAMES_NAME, GEONAMES_LATITUDE, GEONAMES_LONGITUDE, GEONAMES_COUNTRY = 0, 1, 4, 5, 8
+# GeoNames countryInfo.txt columns
+COUNTRY_CODE, COUNTRY_NAME = 0, 4
+
+CSV_COLUMNS = ("geoname_id", "name", "latitude", "longitude", "country")
+CITY_COLUMNS = ("geoname_id", "name", "latitude", "longitude", "country_id", "date_create", "date_update")
+CITY_UPDATE_COLUMNS = ("name", "latitude", "longitude", "country_id", "date_update")
+
+
+def open_text(path):
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a GeoNames cities TSV (or a CSV with the header geoname_id,name,latitude,longitude,country) "
+        "into City, upserting on geoname_id in batches. Optionally load countryInfo.txt into Country first. "
+        "Country codes are resolved with Country.short_name."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("cities", help="path of the file, .gz is read compressed, - reads stdin")
+        parser.add_argument("--countries", help="GeoNames countryInfo.txt, upserted on Country.short_name")
+        parser.add_argument("--format", choices=["geonames", "csv"],
+                            help="default: csv for .csv / .csv.gz files, geonames otherwise")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        csv.field_size_limit(sys.maxsize)
+        if options["countries"]:
+            self.import_countries(options["countries"])
+        countries = {
+            short_name.upper(): pk
+            for pk, short_name in Country.objects.filter(short_name__isnull=False).values_list("id", "short_name")
+        }
+        file_format = options["format"] or ("csv" if ".csv" in options["cities"] else "geonames")
+        self.import_cities(options["cities"], file_format, countries, options["batch_size"])
+
+    def import_countries(self, path):
+        with open_text(path) as file:
+            rows = [
+                row for row in csv.reader(file, delimiter="\t", quoting=csv.QUOTE_NONE)
+                if row and not row[0].startswith("#") and len(row) > COUNTRY_NAME
+            ]
+        Country.objects.bulk_create(
+            [Country(short_name=row[COUNTRY_CODE].upper(), name=row[COUNTRY_NAME]) for row in rows],
+            update_conflicts=True, unique_fields=["short_name"], update_fields=["name", "date_update"],
+        )
+        bump_model_version(Country)
+        self.stdout.write(f"{len(rows)} countries")
+
+    def read_cities(self, file, file_format):
+        """ (geoname_id, name, latitude, longitude, country code) per row """
+        if file_format == "csv":
+            reader = csv.DictReader(file)
+            missing = set(CSV_COLUMNS) - set(reader.fieldnames or ())
+            if missing:
+                raise CommandError(f"Missing CSV columns: {', '.join(sorted(missing))}")
+            for row in reader:
+                yield tuple(row[column] for column in CSV_COLUMNS)
+        else:
+            for row in csv.reader(file, delimiter="\t", quoting=csv.QUOTE_NONE):
+                if len(row) > GEONAMES_COUNTRY:
+                    yield (row[GEONAMES_ID], row[GEONAMES_NAME], row[GEONAMES_LATITUDE],
+                           row[GEONAMES_LONGITUDE], row[GEONAMES_COUNTRY])
+
+    def import_cities(self, path, file_format, countries, batch_size):
+        start = time.perf_counter()
+        total, skipped, unknown_countries = 0, 0, set()
+        renamed = []
+        # geoname_id -> row, a repeated id in one batch would hit the same row twice in one upsert
+        batch = {}
+        with open_text(path) as file:
+            for geoname_id, name, latitude, longitude, country_code in self.read_cities(file, file_format):
+                try:
+                    row = (int(geoname_id), name[:200], float(latitude), float(longitude),
+                           countries.get(country_code.upper()))
+                except ValueError:
+                    skipped += 1
+                    continue
+                if row[4] is None and country_code:
+                    unknown_countries.add(country_code)
+                batch[row[0]] = row
+                if len(batch) == batch_size:
+                    renamed.extend(self.write_batch(list(batch.values())))
+                    total += len(batch)
+                    batch = {}
+                    if total % (batch_size * 10) == 0:
+                        self.report(total, start)
+            if batch:
+                renamed.extend(self.write_batch(list(batch.values())))
+                total += len(batch)
+
+        bump_model_version(City)
+        for city in renamed:
+            cards.patch_job_cards_where(cards.card_patch(city), cards.CARD_SOURCES[City][1](city.pk))
+
+        self.report(total, start)
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"{skipped} rows skipped: invalid id or coordinates"))
+        if unknown_countries:
+            self.stdout.write(self.style.WARNING(
+                f"Unknown country codes, imported without country: {', '.join(sorted(unknown_countries))}"
+            ))
+        self.stdout.write(self.style.SUCCESS(f"Imported {total} cities, {len(renamed)} renamed"))
+
+    @staticmethod
+    def upsert_sql():
+        """
+        The statement bulk_create(update_conflicts=True, unique_fields=["geoname_id"]) generates,
+        run with executemany: building it through the ORM costs several times more than executing it.
+        """
+        quote = connection.ops.quote_name
+        return (
+            f"INSERT INTO {quote(City._meta.db_table)} ({', '.join(quote(column) for column in CITY_COLUMNS)}) "
+            f"VALUES ({', '.join(['%s'] * len(CITY_COLUMNS))}) "
+            f"ON CONFLICT ({quote('geoname_id')}) DO UPDATE SET "
+            + ", ".join(f"{quote(column)} = EXCLUDED.{quote(column)}" for column in CITY_UPDATE_COLUMNS)
+        )
+
+    @transaction.atomic
+    def write_batch(self, batch):
+        """
+        Upsert one batch of (geoname_id, name, latitude, longitude, country_id),
+        returns the already existing cities whose card fields changed
+        """
+        existing = {
+            geoname_id: (pk, name, country_id)
+            for pk, geoname_id, name, country_id in City.objects.filter(
+                geoname_id__in=[row[0] for row in batch]
+            ).values_list("id", "geoname_id", "name", "country_id")
+        }
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.executemany(self.upsert_sql(), [(*row, now, now) for row in batch])
+        renamed = []
+        for geoname_id, name, _, _, country_id in batch:
+            if geoname_id in existing:
+                pk, old_name, old_country_id = existing[geoname_id]
+                if (old_name, old_country_id) != (name, country_id):
+                    renamed.append(City(pk=pk, geoname_id=geoname_id, name=name, country_id=country_id))
+        return renamed
+
+    def report(self, total, start):
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{total} cities, {elapsed:.1f}s, {total / elapsed if elapsed else 0:.0f} rows/s")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from apps.ads.cards import CARD_BATCH_SIZE, refresh_job_cards
+from apps.ads.models import Job
+
+
+class Command(BaseCommand):
+    help = "Rebuild the JobCard of every job (or only of the jobs without one), in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=CARD_BATCH_SIZE)
+        parser.add_argument("--missing", action="store_true", help="only build the cards that do not exist yet")
+
+    def handle(self, *args, **options):
+        queryset = Job.objects.order_by("id").values_list("id", flat=True)
+        if options["missing"]:
+            queryset = queryset.filter(card__isnull=True)
+        batch_size = options["batch_size"]
+        last_id, total = 0, 0
+        while True:
+            job_ids = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not job_ids:
+                break
+            total += len(refresh_job_cards(job_ids))
+            last_id = job_ids[-1]
+            self.stdout.write(f"{total} cards")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} job cards"))
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS ads_job_fts USING fts5(title, description, tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO ads_job_fts (rowid, title, description) SELECT id, title, description FROM ads_job",
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS ads_job_fts",
+]
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE ads_job ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')) STORED",
+    "CREATE INDEX ads_job_search_vector_idx ON ads_job USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS ads_job_search_vector_idx",
+    "ALTER TABLE ads_job DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_for_vendor(sqlite_statements, postgres_statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        statements = {"sqlite": sqlite_statements, "postgresql": postgres_statements}.get(vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0003_alter_job_optional_field'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(SQLITE_FORWARD, POSTGRES_FORWARD),
+            run_for_vendor(SQLITE_BACKWARD, POSTGRES_BACKWARD),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-18 11:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0004_job_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['category', '-id'], name='ads_job_category_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['city', '-id'], name='ads_job_city_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['user', '-id'], name='ads_job_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('is_top', True)), fields=['-id'], name='ads_job_top_id_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.0.1 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+from apps.ads.typed_values import TYPED_COLUMNS, TYPED_VALUE_FIELDS, typed_values
+
+BATCH_SIZE = 1000
+
+
+def fill_typed_values(apps, schema_editor):
+    OptionalFieldThrough = apps.get_model('ads', 'OptionalFieldThrough')
+    rows = (
+        OptionalFieldThrough.objects.using(schema_editor.connection.alias)
+        .filter(optional_field__type__in=list(TYPED_COLUMNS), value__isnull=False)
+        .select_related('optional_field')
+        .order_by('id')
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        for column, value in typed_values(row.optional_field.type, row.value).items():
+            setattr(row, column, value)
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            OptionalFieldThrough.objects.bulk_update(batch, TYPED_VALUE_FIELDS)
+            batch = []
+    if batch:
+        OptionalFieldThrough.objects.bulk_update(batch, TYPED_VALUE_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0005_job_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='optionalfieldthrough',
+            name='value_bool',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='optionalfieldthrough',
+            name='value_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='optionalfieldthrough',
+            name='value_number',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='optionalfieldthrough',
+            index=models.Index(fields=['optional_field', 'value_number', 'job'], name='ads_oft_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='optionalfieldthrough',
+            index=models.Index(fields=['optional_field', 'value_date', 'job'], name='ads_oft_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='optionalfieldthrough',
+            index=models.Index(fields=['optional_field', 'value_bool', 'job'], name='ads_oft_bool_idx'),
+        ),
+        migrations.RunPython(fill_typed_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-18 11:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0006_optionalfieldthrough_typed_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCard',
+            fields=[
+                ('job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='ads.job')),
+                ('payload', models.JSONField()),
+                ('date_update', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
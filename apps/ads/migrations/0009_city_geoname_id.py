@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0008_city_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='geoname_id',
+            field=models.PositiveIntegerField(blank=True, null=True, unique=True),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from apps.auth_app.models import CustomUser
+from apps.ads.typed_values import TYPED_VALUE_FIELDS, typed_values
 
 
 class Category(models.Model):
@@ -28,6 +29,10 @@ class City(models.Model):
     name = models.CharField(max_length=200, null=True, blank=True)
     country = models.ForeignKey(Country, on_delete=models.CASCADE, null=True, blank=True)
     short_name = models.CharField(max_length=30, null=True, blank=True)
+    # GeoNames id, the upsert key of the import_geo command
+    geoname_id = models.PositiveIntegerField(unique=True, null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     date_create = models.DateTimeField(auto_now_add=True)
     date_update = models.DateTimeField(auto_now=True)
 
@@ -68,10 +73,33 @@ class OptionalFieldThrough(models.Model):
     value = models.TextField(null=True, blank=True)
     image = models.ImageField(null=True, blank=True, upload_to="path/")
     file = models.FileField(null=True, blank=True, upload_to="path/")
+    # value parsed according to optional_field.type, see apps.ads.typed_values
+    value_number = models.FloatField(null=True, blank=True)
+    value_date = models.DateField(null=True, blank=True)
+    value_bool = models.BooleanField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['optional_field', 'value_number', 'job'], name='ads_oft_number_idx'),
+            models.Index(fields=['optional_field', 'value_date', 'job'], name='ads_oft_date_idx'),
+            models.Index(fields=['optional_field', 'value_bool', 'job'], name='ads_oft_bool_idx'),
+        ]
 
     def __str__(self):
         return self.value
 
+    def fill_typed_values(self, field_type):
+        """ save() does this itself, bulk_create / bulk_update callers pass the type they already know """
+        for column, value in typed_values(field_type, self.value).items():
+            setattr(self, column, value)
+
+    def save(self, *args, **kwargs):
+        self.fill_typed_values(self.optional_field.type if self.optional_field_id else None)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'value' in update_fields:
+            kwargs['update_fields'] = {*update_fields, *TYPED_VALUE_FIELDS}
+        super().save(*args, **kwargs)
+
 
 class JobStatusChoices(models.TextChoices):
     published = "published", "Published"
@@ -107,4 +135,18 @@ class Job(models.Model):
         through_fields=('job', 'optional_field'), null=True, blank=True
     )
 
+    class Meta:
+        # the feed is always ordered by -id and filtered by one of these columns
+        indexes = [
+            models.Index(fields=['category', '-id'], name='ads_job_category_id_idx'),
+            models.Index(fields=['city', '-id'], name='ads_job_city_id_idx'),
+            models.Index(fields=['user', '-id'], name='ads_job_user_id_idx'),
+            models.Index(fields=['-id'], name='ads_job_top_id_idx', condition=models.Q(is_top=True)),
+        ]
 
+
+class JobCard(models.Model):
+    """ Feed payload of one job (JobDetailSerializers without request), kept in sync by apps.ads.cards """
+    job = models.OneToOneField(Job, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    payload = models.JSONField()
+    date_update = models.DateTimeField(auto_now=True)
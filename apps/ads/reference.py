@@ -0,0 +1,51 @@
+import threading
+
+from apps.ads.api.serializers.serializers import (
+    CategoryDetailSerializers, CountryListSerializers, CitySerializer, OptionalFieldListSerializers
+)
+from apps.ads.category_tree import category_tree
+from apps.ads.models import Category, Country, City, OptionalField
+from utils.cache import get_model_versions
+
+REFERENCE_MODELS = (Category, Country, City, OptionalField)
+
+
+class ReferenceSnapshot:
+    """
+    Categories, countries, cities and optional fields serialized once per process.
+    The version is the sum of the model cache versions: every save/delete bumps one of them,
+    so it only grows, and reading it is one cache round-trip, no query.
+    Urls are relative, the snapshot is shared by every request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = (None, None)
+
+    def version(self):
+        return sum(get_model_versions(REFERENCE_MODELS))
+
+    def get(self):
+        """ (version, data), rebuilt only when the version moved """
+        version = self.version()
+        if version != self._snapshot[0]:
+            with self._lock:
+                if version != self._snapshot[0]:
+                    self._snapshot = (version, self._build(version))
+        return self._snapshot
+
+    def _build(self, version):
+        categories = [node.category for node in sorted(category_tree.nodes(), key=lambda node: -node.id)]
+        return {
+            'version': version,
+            'categories': CategoryDetailSerializers(categories, many=True).data,
+            'countries': CountryListSerializers(Country.objects.order_by('-id'), many=True).data,
+            'cities': CitySerializer(City.objects.select_related('country').order_by('-id'), many=True).data,
+            'optional_fields': OptionalFieldListSerializers(OptionalField.objects.order_by('-id'), many=True).data,
+        }
+
+    def clear(self):
+        self._snapshot = (None, None)
+
+
+reference_snapshot = ReferenceSnapshot()
@@ -0,0 +1,45 @@
+import threading
+
+from apps.ads.models import OptionalField
+from utils.cache import get_model_version
+
+
+class OptionalFieldRegistry:
+    """
+    Every OptionalField of the process, by id and by key.
+    Reloaded with one query when the OptionalField cache version moves,
+    i.e. after a save/delete in this or any other worker sharing the cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._by_id = {}
+        self._by_key = {}
+
+    def _fields(self):
+        version = get_model_version(OptionalField)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    fields = list(OptionalField.objects.all())
+                    self._by_id = {field.id: field for field in fields}
+                    self._by_key = {field.key: field for field in fields if field.key}
+                    self._version = version
+        return self._by_id
+
+    def get(self, pk):
+        return self._fields().get(pk)
+
+    def get_by_key(self, key):
+        self._fields()
+        return self._by_key.get(key)
+
+    def ids(self):
+        return set(self._fields())
+
+    def clear(self):
+        self._version = None
+
+
+optional_fields = OptionalFieldRegistry()
@@ -0,0 +1,122 @@
+"""
+Full-text search over Job.title / Job.description.
+
+SQLite: FTS5 table ads_job_fts (rowid = job id), kept in sync by the Job signals.
+The matches are read from it first, the jobs query gets their ids and relevance.
+PostgreSQL: generated tsvector column ads_job.search_vector with a GIN index,
+maintained by the database itself.
+Both are created by migration 0004_job_search_index.
+
+Only the SEARCH_WINDOW newest matches are ranked: ranking, sorting and counting every
+match of a broad word costs as much as the number of ads, the newest matches are one
+descending walk of the index. Narrower words with fewer matches are ranked in full.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from apps.ads.models import Job
+
+FTS_TABLE = "ads_job_fts"
+
+# title matches weigh more than description matches
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# relevance + RECENCY_WEIGHT / (1 + age_in_days / RECENCY_DAYS)
+RECENCY_WEIGHT = 1.0
+RECENCY_DAYS = 30.0
+
+# newest matches ranked by a search, the results are capped at this many
+SEARCH_WINDOW = 500
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())[:10]
+
+
+def is_indexed(using="default"):
+    """ SQLite needs the FTS table to be kept in sync from python, PostgreSQL does not """
+    return connections[using].vendor == "sqlite"
+
+
+def index_jobs(jobs, using="default"):
+    """ Insert or replace the FTS rows of the given jobs """
+    if not is_indexed(using) or not jobs:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(job.pk,) for job in jobs]
+        )
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)",
+            [(job.pk, job.title, job.description) for job in jobs]
+        )
+
+
+def unindex_jobs(job_ids, using="default"):
+    if not is_indexed(using) or not job_ids:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in job_ids])
+
+
+def newest_matches(tokens, using="default"):
+    """ (job id, relevance) of the SEARCH_WINDOW newest jobs of the FTS table matching every token """
+    match = " ".join(f'"{token}"*' for token in tokens)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, -bm25({FTS_TABLE}, %s, %s) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY rowid DESC LIMIT %s",
+            [TITLE_WEIGHT, DESCRIPTION_WEIGHT, match, SEARCH_WINDOW]
+        )
+        return cursor.fetchall()
+
+
+def search_jobs(queryset, text):
+    """
+    Filter queryset to the SEARCH_WINDOW newest jobs matching every word of text (prefix match)
+    and order them by relevance with a recency boost. Annotates search_rank.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    table = Job._meta.db_table
+    if vendor == "postgresql":
+        ts_query = " & ".join(f"{token}:*" for token in tokens)
+        queryset = queryset.extra(
+            where=[
+                f"{table}.search_vector @@ to_tsquery('simple', %s)",
+                # id of the SEARCH_WINDOW-th newest match, 0 when there are fewer
+                f"{table}.id >= COALESCE((SELECT id FROM {table} WHERE search_vector @@ to_tsquery('simple', %s) "
+                f"ORDER BY id DESC LIMIT 1 OFFSET %s), 0)",
+            ],
+            params=[ts_query, ts_query, SEARCH_WINDOW - 1],
+            select={
+                "search_rank": f"ts_rank({table}.search_vector, to_tsquery('simple', %s)) + "
+                               f"COALESCE(%s / (1 + EXTRACT(EPOCH FROM (now() - {table}.date_create)) / 86400 / %s), 0)"
+            },
+            select_params=[ts_query, RECENCY_WEIGHT, RECENCY_DAYS],
+        )
+    elif vendor == "sqlite":
+        hits = newest_matches(tokens, queryset.db)
+        if not hits:
+            return queryset.none()
+        # the window is ranked apart from the other filters: joined to ads_job, the planner
+        # may drive the join from an ads_job index and probe the FTS table once per job
+        queryset = queryset.filter(id__in=[pk for pk, _ in hits]).extra(
+            select={
+                "search_rank": f"CASE {table}.id {' '.join(['WHEN %s THEN %s'] * len(hits))} END + "
+                               f"COALESCE(%s / (1 + (julianday('now') - julianday({table}.date_create)) / %s), 0)"
+            },
+            select_params=[*(value for hit in hits for value in hit), RECENCY_WEIGHT, RECENCY_DAYS],
+        )
+    else:
+        for token in tokens:
+            queryset = queryset.filter(Q(title__icontains=token) | Q(description__icontains=token))
+        return queryset
+    return queryset.order_by("-search_rank", "-id")
@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.ads import cards, search
+from apps.ads.models import Job, OptionalField, OptionalFieldThrough, Category, Country, City
+from apps.ads.city_index import city_index
+from apps.ads.registry import optional_fields
+from apps.auth_app.models import CustomUser
+from utils.cache import watch_model
+
+
+@receiver(post_save, sender=Job)
+def job_saved(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is None or {'title', 'description'} & set(update_fields):
+        search.index_jobs([instance], using=using)
+    cards.schedule_refresh([instance.pk], using=using)
+
+
+@receiver([post_save, post_delete], sender=OptionalFieldThrough)
+def job_optional_field_changed(sender, instance, using, **kwargs):
+    if instance.job_id is not None:
+        cards.schedule_refresh([instance.job_id], using=using)
+
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=City)
+@receiver(pre_save, sender=CustomUser)
+@receiver(pre_save, sender=OptionalField)
+def card_source_saving(sender, instance, using, update_fields=None, **kwargs):
+    instance._card_fields_changed = cards.card_fields_changed(instance, using, update_fields)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=City)
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=OptionalField)
+def card_source_saved(sender, instance, using, **kwargs):
+    if getattr(instance, '_card_fields_changed', False):
+        cards.schedule_patch(instance, using)
+
+
+@receiver(post_delete, sender=Job)
+def job_deleted(sender, instance, using, **kwargs):
+    search.unindex_jobs([instance.pk], using=using)
+
+
+@receiver([post_save, post_delete], sender=OptionalField)
+def optional_field_changed(sender, **kwargs):
+    optional_fields.clear()
+
+
+@receiver(post_save, sender=City)
+def city_saved(sender, instance, using, **kwargs):
+    transaction.on_commit(lambda: city_index.update(instance), using=using)
+
+
+@receiver(post_delete, sender=City)
+def city_deleted(sender, instance, using, **kwargs):
+    # delete() sets instance.pk to None before the transaction commits
+    city_id = instance.pk
+    transaction.on_commit(lambda: city_index.remove(city_id), using=using)
+
+
+watch_model(Job)
+watch_model(Category)
+watch_model(Country)
+watch_model(City)
+watch_model(OptionalField)
@@ -0,0 +1,738 @@
+import json
+import random
+import re
+import threading
+import time
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.ads import cards, search
+from apps.ads.city_index import city_index
+from apps.ads.geo import city_geo_index
+from apps.ads.api.services.services import JobBulkService
+from apps.ads.models import Category, Country, City, Job, JobCard, OptionalField, OptionalFieldThrough
+from apps.auth_app.models import CustomUser
+from utils.cache import MODEL_VERSION_KEY, bump_model_version, get_model_version
+from utils.token import get_token_for_user
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests"},
+    "throttle": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-throttle"},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class JobQueryBudgetTests(TestCase):
+    """ Every read path costs the same number of queries for a page of 2 jobs and for a page of 10 """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone="+998900000001", email="budget@example.com", password="x")
+        cls.category = Category.objects.create(name="IT")
+        cls.city = City.objects.create(name="Tashkent", country=Country.objects.create(name="Uzbekistan"))
+        cls.optional_field = OptionalField.objects.create(name="Remote", key="remote", type="boolean")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_token_for_user(self.user)['access']}")
+
+    def create_jobs(self, count):
+        # the cards are built when the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(count):
+                job = Job.objects.create(
+                    title=f"job {index}", category=self.category, city=self.city, user=self.user
+                )
+                OptionalFieldThrough.objects.create(job=job, optional_field=self.optional_field, value="true")
+        return job
+
+    def assertQueryBudget(self, url, queries, pages=(2, 10)):
+        created = 0
+        for count in pages:
+            self.create_jobs(count - created)
+            created = count
+            cache.clear()
+            with self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_job_list(self):
+        # page + COUNT(*) on jobs joined with their cards
+        self.assertQueryBudget("/ads/", 2)
+
+    def test_job_list_cursor(self):
+        # one keyset seek, no COUNT(*)
+        self.assertQueryBudget("/ads/?cursor=", 1)
+
+    def test_my_ads(self):
+        self.assertQueryBudget("/myads/", 2)
+
+    def test_job_detail(self):
+        job = self.create_jobs(1)
+        OptionalFieldThrough.objects.bulk_create([
+            OptionalFieldThrough(job=job, optional_field=self.optional_field, value="false") for _ in range(5)
+        ])
+        cache.clear()
+        # validator row, job with category, city and user, optional fields with their definition
+        with self.assertNumQueries(3):
+            response = self.client.get(f"/ads/{job.pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["message"]["optional_field"]), 6)
+
+    def test_job_list_cached(self):
+        self.create_jobs(3)
+        self.client.get("/ads/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/ads/")
+        self.assertEqual(response["X-Cache"], "HIT")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class JobSearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(phone="+1", email="search@example.com"))
+
+    def search(self, text):
+        return list(search.search_jobs(Job.objects.order_by('-id'), text).values_list('id', flat=True))
+
+    def test_title_match_ranks_above_description_match(self):
+        in_description = Job.objects.create(title="cook", description="python wanted")
+        in_title = Job.objects.create(title="python developer", description="office")
+        Job.objects.create(title="driver", description="night shift")
+        self.assertEqual(self.search("python"), [in_title.pk, in_description.pk])
+
+    def test_every_word_prefix_matched(self):
+        both = Job.objects.create(title="senior python developer")
+        Job.objects.create(title="python developer")
+        self.assertEqual(self.search("pyth SEN"), [both.pk])
+        self.assertEqual(self.search("kotlin"), [])
+
+    def test_ranked_window_is_the_newest_matches(self):
+        jobs = [Job.objects.create(title=f"python {index}") for index in range(5)]
+        with mock.patch.object(search, "SEARCH_WINDOW", 3):
+            self.assertEqual(sorted(self.search("python")), sorted(job.pk for job in jobs[2:]))
+
+    def test_index_follows_job_save_and_delete(self):
+        job = Job.objects.create(title="kiwi picker")
+        self.assertEqual(self.search("kiwi"), [job.pk])
+        job.title = "mango picker"
+        job.save()
+        self.assertEqual(self.search("kiwi"), [])
+        self.assertEqual(self.search("mango"), [job.pk])
+        # a save that leaves title and description alone keeps the row
+        job.save(update_fields=["is_top"])
+        self.assertEqual(self.search("mango"), [job.pk])
+        job.delete()
+        self.assertEqual(self.search("mango"), [])
+
+    def test_job_list_ordered_by_relevance(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            in_description = Job.objects.create(title="cook", description="python wanted")
+            in_title = Job.objects.create(title="python developer")
+        response = self.client.get("/ads/", {"q": "python"})
+        self.assertEqual(response.status_code, 200)
+        message = response.data["message"]
+        self.assertEqual(message["count"], 2)
+        self.assertEqual([job["id"] for job in message["results"]], [in_title.pk, in_description.pk])
+
+    def test_search_refuses_cursor(self):
+        response = self.client.get("/ads/", {"q": "python", "cursor": ""})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class JobFilterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone="+1", email="filter@example.com")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertBadRequest(self, params, urls=("/ads/", "/ads/facets/", "/myads/")):
+        for url in urls:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400, f"{url} {params}")
+
+    def test_invalid_ids(self):
+        for name in ("category", "city"):
+            self.assertBadRequest({name: "abc"})
+            self.assertBadRequest({name: "1,,2"})
+        # /myads/ has no categoryTree filter
+        self.assertBadRequest({"categoryTree": "abc"}, urls=("/ads/", "/ads/facets/"))
+        self.assertBadRequest({"categoryTree": "1,,2"}, urls=("/ads/", "/ads/facets/"))
+
+    def test_id_lists(self):
+        category = Category.objects.create(name="IT")
+        city = City.objects.create(name="Tashkent")
+        Job.objects.create(title="job", category=category, city=city)
+        Job.objects.create(title="other", category=Category.objects.create(name="Food"))
+        for params in ({"category": f"{category.pk},0"}, {"city": f"0, {city.pk}"}):
+            response = self.client.get("/ads/facets/", params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["message"]["total"], 1)
+            self.assertEqual(response.data["message"]["category"], [{"id": category.pk, "count": 1}])
+
+    def test_facets_follow_attribute_filters(self):
+        category = Category.objects.create(name="IT")
+        salary = OptionalField.objects.create(name="Salary", key="salary", type="integer")
+        with self.captureOnCommitCallbacks(execute=True):
+            for value in (1000, 3000, 5000):
+                job = Job.objects.create(title="job", category=category)
+                OptionalFieldThrough.objects.create(job=job, optional_field=salary, value=str(value))
+            Job.objects.create(title="no salary", category=category)
+        for params, total in (({}, 4), ({"attr.salary__gte": "3000"}, 2), ({"attr.salary": "1000"}, 1)):
+            facets = self.client.get("/ads/facets/", params).data["message"]
+            jobs = self.client.get("/ads/", params).data["message"]
+            self.assertEqual((facets["total"], jobs["count"]), (total, total), params)
+            self.assertEqual(facets["category"], [{"id": category.pk, "count": total}])
+        self.assertBadRequest({"attr.salary__gte": "a lot"}, urls=("/ads/", "/ads/facets/"))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ModelVersionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_bumps_get_distinct_versions(self):
+        versions = []
+
+        def bump():
+            for _ in range(50):
+                versions.append(bump_model_version(Job))
+
+        threads = [threading.Thread(target=bump) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(versions)), 400)
+        self.assertEqual(get_model_version(Job), max(versions))
+
+    def test_bump_catches_up_with_the_clock(self):
+        cache.set(MODEL_VERSION_KEY.format(Job._meta.label_lower), 1000, timeout=None)
+        now = int(time.time() * 1000)
+        self.assertGreaterEqual(bump_model_version(Job), now)
+        cache.clear()
+        now = int(time.time() * 1000)
+        self.assertGreaterEqual(bump_model_version(Job), now)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResponseCacheInvalidationTests(TestCase):
+    """ Every cached view misses again after a write of each model it depends on """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone="+1", email="cache@example.com")
+        cls.country = Country.objects.create(name="Uzbekistan", short_name="UZ")
+        cls.city = City.objects.create(name="Tashkent", country=cls.country)
+        cls.category = Category.objects.create(name="IT")
+        cls.optional_field = OptionalField.objects.create(name="Remote", key="remote", type="boolean")
+        cls.job = Job.objects.create(title="python", category=cls.category, city=cls.city)
+        cards.refresh_job_cards([cls.job.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertInvalidatedBy(self, url, *writes):
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        for write in writes:
+            self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+            write()
+            self.assertEqual(self.client.get(url)["X-Cache"], "MISS", f"{url} after {write}")
+
+    def test_job_list(self):
+        self.assertInvalidatedBy(
+            "/ads/", self.job.save, self.category.save, self.city.save,
+            lambda: cards.refresh_job_cards([self.job.pk]),
+        )
+
+    def test_job_facets(self):
+        self.assertInvalidatedBy("/ads/facets/", self.job.save, self.category.save, self.city.save)
+
+    def test_reference_lists(self):
+        self.assertInvalidatedBy("/categories/", self.category.save)
+        self.assertInvalidatedBy("/countries/", self.country.save)
+        self.assertInvalidatedBy("/cities/", self.city.save, self.country.save)
+        self.assertInvalidatedBy("/ads/optional/field/", self.optional_field.save)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN of every query the feed views issue for each filter, none may scan the whole ads_job table.
+    The unfiltered feed is left out: walking the primary key is its best plan.
+    """
+    FULL_SCAN = {
+        "sqlite": re.compile(r"\bSCAN (\S+ AS )?ads_job\b(?! USING)"),
+        "postgresql": re.compile(r"Seq Scan on ads_job\b"),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Realistic selectivity: many categories, cities and users, few top ads """
+        random.seed(0)
+        parents = Category.objects.bulk_create([Category(name=f"plan {index}") for index in range(10)])
+        categories = parents + Category.objects.bulk_create([
+            Category(name=f"plan {index}", subcategory=parents[index % 10]) for index in range(40)
+        ])
+        cities = City.objects.bulk_create([
+            City(name=f"plan {index}", latitude=random.uniform(-50, 60), longitude=random.uniform(-180, 180))
+            for index in range(200)
+        ])
+        users = CustomUser.objects.bulk_create([
+            CustomUser(phone=f"plan-{index}", email=f"plan-{index}@example.com") for index in range(50)
+        ])
+        cls.salary = OptionalField.objects.create(name="Salary", key="salary", type="integer")
+        jobs = Job.objects.bulk_create([
+            Job(title=f"job {index}", category=random.choice(categories), city=random.choice(cities),
+                user=random.choice(users), is_top=random.random() < 0.05)
+            for index in range(5000)
+        ])
+        JobCard.objects.bulk_create([JobCard(job=job, payload={"id": job.pk}) for job in jobs])
+        OptionalFieldThrough.objects.bulk_create([
+            OptionalFieldThrough(job=job, optional_field=cls.salary, value=str(job.pk), value_number=job.pk)
+            for job in jobs[::10]
+        ])
+        cls.user, cls.category, cls.parent, cls.city = users[0], categories[-1], parents[0], cities[0]
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                return "\n".join(row[-1] for row in cursor.fetchall())
+            cursor.execute(f"EXPLAIN {sql}")
+            return "\n".join(row[0] for row in cursor.fetchall())
+
+    def assertNoFullScan(self, url, params):
+        pattern = self.FULL_SCAN.get(connection.vendor)
+        if pattern is None:
+            self.skipTest(f"No plan check for {connection.vendor}")
+        # page and COUNT of the page mode, keyset seek of the cursor mode
+        for mode in ({}, {"cursor": ""}):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, {**params, **mode})
+            self.assertEqual(response.status_code, 200)
+            queries = [query["sql"] for query in context.captured_queries if "ads_job" in query["sql"]]
+            self.assertTrue(queries)
+            for sql in queries:
+                plan = self.explain(sql)
+                self.assertIsNone(pattern.search(plan), f"{url} {params} {mode}: full scan\n{sql}\n{plan}")
+
+    def test_job_list(self):
+        point = f"{self.city.latitude},{self.city.longitude}"
+        for params in (
+            {"category": self.category.pk},
+            {"city": self.city.pk},
+            {"category": self.category.pk, "city": self.city.pk},
+            {"isTop": "true"},
+            {"category": self.category.pk, "isTop": "true"},
+            {"categoryTree": self.parent.pk},
+            {"attr.salary__gte": 4000},
+            {"near": point, "radius_km": 50},
+            {"near": point, "category": self.category.pk},
+        ):
+            self.assertNoFullScan("/ads/", params)
+
+    def test_my_ads(self):
+        for params in ({}, {"category": self.category.pk}, {"city": self.city.pk}, {"isTop": "true"}):
+            self.assertNoFullScan("/myads/", params)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class JobCardTests(TestCase):
+    """ Cards follow their job on commit, renames of what they show are patched into every card """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone="+1", email="card@example.com", first_name="Ann")
+        cls.category = Category.objects.create(name="IT")
+        cls.city = City.objects.create(name="Tashkent")
+        cls.optional_field = OptionalField.objects.create(name="Remote", key="remote", type="boolean")
+
+    def create_job(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = Job.objects.create(
+                **{"title": "python", "category": self.category, "city": self.city, "user": self.user, **fields}
+            )
+            OptionalFieldThrough.objects.create(job=job, optional_field=self.optional_field, value="true")
+        return job
+
+    def payload(self, job):
+        return JobCard.objects.get(job=job).payload
+
+    def test_built_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = Job.objects.create(title="python", category=self.category, city=self.city, user=self.user)
+            self.assertFalse(JobCard.objects.filter(job=job).exists())
+        payload = self.payload(job)
+        self.assertEqual((payload["id"], payload["title"], payload["category"]), (job.pk, "python", "IT"))
+        self.assertEqual(payload["user"]["first_name"], "Ann")
+
+    def test_rebuilt_on_update(self):
+        job = self.create_job()
+        self.assertEqual(len(self.payload(job)["optional_field"]), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            job.title = "django"
+            job.save()
+            OptionalFieldThrough.objects.filter(job=job).delete()
+        payload = self.payload(job)
+        self.assertEqual((payload["title"], payload["optional_field"]), ("django", []))
+
+    def assertFannedOut(self, instance, field, value, read):
+        jobs = [self.create_job() for _ in range(3)]
+        other = self.create_job(category=Category.objects.create(name="Food"), city=City.objects.create(name="Paris"),
+                                user=CustomUser.objects.create_user(phone="+2", email="other@example.com"))
+        OptionalFieldThrough.objects.filter(job=other).delete()
+        before = JobCard.objects.get(job=other).date_update
+        setattr(instance, field, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.save()
+        for job in jobs:
+            self.assertEqual(read(self.payload(job)), value)
+        self.assertEqual(JobCard.objects.get(job=other).date_update, before)
+
+    def test_category_rename(self):
+        self.assertFannedOut(self.category, "name", "Software", lambda payload: payload["category"])
+
+    def test_city_rename(self):
+        self.assertFannedOut(self.city, "name", "Toshkent", lambda payload: payload["city"]["name"])
+
+    def test_user_rename(self):
+        self.assertFannedOut(self.user, "first_name", "Anna", lambda payload: payload["user"]["first_name"])
+
+    def test_optional_field_rename(self):
+        self.assertFannedOut(
+            self.optional_field, "name", "Remote work",
+            lambda payload: payload["optional_field"][0]["optional_field"]["name"],
+        )
+
+    def test_save_without_card_change_patches_nothing(self):
+        job = self.create_job()
+        before = JobCard.objects.get(job=job).date_update
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.category.save()
+            self.user.save(update_fields=["last_login"])
+        self.assertEqual(callbacks, [])
+        self.assertEqual(JobCard.objects.get(job=job).date_update, before)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class JobAttributeWriteTests(TestCase):
+    """ Creating or updating a job costs the same number of queries however many attributes it sends """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone="+998900000002", email="writer@example.com", password="x")
+        cls.category = Category.objects.create(name="IT")
+        cls.city = City.objects.create(name="Tashkent")
+        cls.optional_fields = [
+            OptionalField.objects.create(name=f"Field {index}", key=f"field_{index}", type="integer")
+            for index in range(8)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def additionally(self, count):
+        return [{"optionalFieldID": field.pk, "value": str(index)}
+                for index, field in enumerate(self.optional_fields[:count])]
+
+    def create(self, count):
+        response = self.client.post("/ads/create/", {
+            "title": "python", "category": self.category.pk, "city": self.city.pk,
+            "additionally": self.additionally(count),
+        }, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["message"]["id"]
+
+    def test_create(self):
+        self.create(1)  # loads the optional field registry
+        for count in (2, 8):
+            with self.assertNumQueries(8):
+                pk = self.create(count)
+            values = Job.objects.get(pk=pk).optionalfieldthrough_set.values_list("value_number", flat=True)
+            self.assertEqual(sorted(values), list(range(count)))
+
+    def test_update(self):
+        for count in (2, 8):
+            job = Job.objects.get(pk=self.create(count))
+            rows = list(job.optionalfieldthrough_set.order_by("id"))
+            kept = rows[:count // 2]
+            additionally = [{"id": row.pk, "value": "42"} for row in kept] + self.additionally(count // 2)
+            # the DELETE of the dropped rows is preceded by the collector's SELECT
+            with self.assertNumQueries(13):
+                response = self.client.put(f"/ads/{job.pk}/", {
+                    "title": "django", "category": self.category.pk, "city": self.city.pk,
+                    "additionally": additionally,
+                }, format="json")
+            self.assertEqual(response.status_code, 200, response.content)
+            values = list(job.optionalfieldthrough_set.order_by("id").values_list("id", "value_number"))
+            self.assertEqual(len(values), count)
+            self.assertEqual(values[:len(kept)], [(row.pk, 42) for row in kept])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class JobBulkCreateTests(TestCase):
+    """ /ads/bulk/ answers one result per item and writes the valid items only """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone="+998900000003", email="bulk@example.com", password="x")
+        cls.category = Category.objects.create(name="IT")
+        cls.city = City.objects.create(name="Tashkent")
+        cls.salary = OptionalField.objects.create(name="Salary", key="salary", type="integer")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def item(self, title, **fields):
+        return {"title": title, "category": self.category.pk, "city": self.city.pk,
+                "additionally": [{"optionalFieldID": self.salary.pk, "value": "3000"}], **fields}
+
+    def test_json(self):
+        response = self.client.post("/ads/bulk/", [self.item("python"), self.item("django")], format="json")
+        self.assertEqual(response.status_code, 200)
+        results = response.data["message"]
+        self.assertEqual([(result["index"], result["status"]) for result in results], [(0, "created"), (1, "created")])
+        jobs = Job.objects.filter(pk__in=[result["id"] for result in results])
+        self.assertEqual(sorted(job.title for job in jobs), ["django", "python"])
+        self.assertEqual(JobCard.objects.filter(job__in=jobs).count(), 2)
+        self.assertEqual(
+            list(OptionalFieldThrough.objects.filter(job__in=jobs).values_list("value_number", flat=True)),
+            [3000, 3000],
+        )
+
+    def test_ndjson(self):
+        body = "\n".join(json.dumps(item) for item in (self.item("python"), self.item("django"))) + "\n\n"
+        response = self.client.post("/ads/bulk/", body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result["status"] for result in response.data["message"]], ["created", "created"])
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_partial_failure(self):
+        items = [
+            self.item("python"),
+            self.item("bad category", category=0),
+            self.item("bad city", city="abc"),
+            self.item("bad field", additionally=[{"optionalFieldID": 0, "value": "1"}]),
+            self.item("django"),
+        ]
+        results = JobBulkService(self.user, chunk_size=1).create(items)
+        self.assertEqual([(result["index"], result["status"]) for result in results],
+                         [(0, "created"), (1, "invalid"), (2, "invalid"), (3, "invalid"), (4, "created")])
+        self.assertIn("category", results[1]["errors"])
+        self.assertIn("city", results[2]["errors"])
+        self.assertEqual(sorted(Job.objects.values_list("title", flat=True)), ["django", "python"])
+
+    def test_not_a_list(self):
+        for body, content_type in ((json.dumps(self.item("python")), "application/json"),
+                                   ("{not json\n", "application/x-ndjson")):
+            response = self.client.post("/ads/bulk/", body, content_type=content_type)
+            self.assertEqual(response.status_code, 400, body)
+        self.assertFalse(Job.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CityAutocompleteTests(TestCase):
+    """ /cities/autocomplete/ matches prefixes of the name, its words and the short_name, most ads first """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uzbekistan = Country.objects.create(name="Uzbekistan")
+        cls.france = Country.objects.create(name="France")
+        cls.tashkent = City.objects.create(name="Tashkent", short_name="TAS", country=cls.uzbekistan)
+        cls.termez = City.objects.create(name="Termez", country=cls.uzbekistan)
+        cls.paris = City.objects.create(name="Paris", short_name="PAR", country=cls.france)
+        cls.sao_paulo = City.objects.create(name="São Paulo", short_name="SP")
+        for city, ads in ((cls.termez, 3), (cls.tashkent, 1)):
+            for _ in range(ads):
+                Job.objects.create(title="job", city=city)
+
+    def setUp(self):
+        cache.clear()
+        city_index.clear()
+        self.client = APIClient()
+
+    def names(self, **params):
+        response = self.client.get("/cities/autocomplete/", params)
+        self.assertEqual(response.status_code, 200)
+        return [city["name"] for city in response.data["message"]]
+
+    def test_prefix(self):
+        self.assertEqual(self.names(q="t"), ["Termez", "Tashkent"])
+        self.assertEqual(self.names(q="TASH"), ["Tashkent"])
+        self.assertEqual(self.names(q="pa"), ["Paris", "São Paulo"])
+        self.assertEqual(self.names(q="sao p"), ["São Paulo"])
+        self.assertEqual(self.names(q="tas"), ["Tashkent"])
+        self.assertEqual(self.names(q="x"), [])
+
+    def test_ads_count(self):
+        response = self.client.get("/cities/autocomplete/", {"q": "ter"})
+        self.assertEqual(response.data["message"], [
+            {"id": self.termez.pk, "name": "Termez", "short_name": None, "country": self.uzbekistan.pk, "ads": 3},
+        ])
+
+    def test_limit_and_country(self):
+        self.assertEqual(self.names(q="", limit=2), ["Termez", "Tashkent"])
+        self.assertEqual(self.names(q="", country=self.france.pk), ["Paris"])
+        self.assertEqual(self.names(q="pa", country=self.uzbekistan.pk), [])
+        for params in ({"limit": "ten"}, {"country": "France"}):
+            self.assertEqual(self.client.get("/cities/autocomplete/", params).status_code, 400)
+
+    def test_incremental_update(self):
+        self.assertEqual(self.names(q="samar"), [])
+        with mock.patch.object(city_index, "_load", wraps=city_index._load) as load:
+            with self.captureOnCommitCallbacks(execute=True):
+                samarkand = City.objects.create(name="Samarkand", country=self.uzbekistan)
+            self.assertEqual(self.names(q="samar"), ["Samarkand"])
+            with self.captureOnCommitCallbacks(execute=True):
+                self.paris.name, self.paris.short_name = "Lyon", "LYS"
+                self.paris.save()
+            self.assertEqual(self.names(q="pa"), ["São Paulo"])
+            self.assertEqual(self.names(q="ly"), ["Lyon"])
+            with self.captureOnCommitCallbacks(execute=True):
+                samarkand.delete()
+            self.assertEqual(self.names(q="samar"), [])
+        load.assert_not_called()
+
+    def test_reload_on_foreign_version(self):
+        self.assertEqual(self.names(q="nuk"), [])
+        # a City saved by another worker: the version moves without a local update
+        City.objects.bulk_create([City(name="Nukus", country=self.uzbekistan)])
+        cache.incr(MODEL_VERSION_KEY.format(City._meta.label_lower))
+        self.assertEqual(self.names(q="nuk"), ["Nukus"])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class NearSearchTests(TestCase):
+    """ ?near= keeps the jobs of the cities within radius_km of the point """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone="+998900000004", email="near@example.com")
+        # distances from Tashkent: Chirchiq ~33 km, Samarkand ~270 km, Paris ~5000 km
+        cls.tashkent = City.objects.create(name="Tashkent", latitude=41.3111, longitude=69.2797)
+        cls.chirchiq = City.objects.create(name="Chirchiq", latitude=41.4689, longitude=69.5822)
+        cls.samarkand = City.objects.create(name="Samarkand", latitude=39.6542, longitude=66.9597)
+        cls.paris = City.objects.create(name="Paris", latitude=48.8566, longitude=2.3522)
+        cls.nowhere = City.objects.create(name="Nowhere")
+        cls.category = Category.objects.create(name="IT")
+        with cls.captureOnCommitCallbacks(execute=True):
+            for city in (cls.tashkent, cls.chirchiq, cls.samarkand, cls.paris, cls.nowhere):
+                Job.objects.create(title="job", city=city, category=cls.category, user=cls.user)
+            Job.objects.create(title="other", city=cls.chirchiq, user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        city_geo_index.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def cities(self, **params):
+        response = self.client.get("/ads/", {"near": "41.3111,69.2797", **params})
+        self.assertEqual(response.status_code, 200)
+        return sorted(job["city"]["name"] for job in response.data["message"]["results"])
+
+    def test_radius(self):
+        self.assertEqual(self.cities(), ["Tashkent"])
+        self.assertEqual(self.cities(radius_km=50, category=self.category.pk), ["Chirchiq", "Tashkent"])
+        self.assertEqual(self.cities(radius_km=300, category=self.category.pk), ["Chirchiq", "Samarkand", "Tashkent"])
+        response = self.client.get("/ads/facets/", {"near": "41.3111,69.2797", "radius_km": 50})
+        self.assertEqual(response.data["message"]["total"], 3)
+
+    def test_nearest_first(self):
+        self.assertEqual(
+            city_geo_index.near(41.0, 68.0, 400).tolist(),
+            [self.tashkent.pk, self.chirchiq.pk, self.samarkand.pk],
+        )
+        self.assertEqual(city_geo_index.near(48.8566, 2.3522, 1).tolist(), [self.paris.pk])
+
+    def test_moved_city(self):
+        self.assertEqual(self.cities(radius_km=50, category=self.category.pk), ["Chirchiq", "Tashkent"])
+        self.samarkand.latitude, self.samarkand.longitude = 41.35, 69.30
+        self.samarkand.save()
+        self.assertEqual(self.cities(radius_km=50, category=self.category.pk), ["Chirchiq", "Samarkand", "Tashkent"])
+
+    def test_invalid(self):
+        for params in (
+            {"near": "41.3"}, {"near": "north,east"}, {"near": "91,0"}, {"near": "0,181"},
+            {"near": "41.3,69.2", "radius_km": "far"}, {"near": "41.3,69.2", "radius_km": 0},
+            {"near": "41.3,69.2", "radius_km": 501},
+        ):
+            for url in ("/ads/", "/ads/facets/"):
+                self.assertEqual(self.client.get(url, params).status_code, 400, f"{url} {params}")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CursorPaginationTests(TestCase):
+    """ ?cursor= seeks on -id: no COUNT, and rows inserted while paging neither repeat nor shift a page """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone="+998900000005", email="cursor@example.com")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_jobs(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [Job.objects.create(title=f"job {index}", user=self.user).pk for index in range(count)]
+
+    def get_page(self, cursor=""):
+        response = self.client.get("/ads/", {"cursor": cursor, "limit": 10})
+        self.assertEqual(response.status_code, 200)
+        message = response.data["message"]
+        next_cursor = parse_qs(urlparse(message["next"]).query)["cursor"][0] if message["next"] else None
+        return [job["id"] for job in message["results"]], next_cursor
+
+    def test_no_count(self):
+        self.create_jobs(25)
+        cursor = ""
+        while cursor is not None:
+            with CaptureQueriesContext(connection) as queries:
+                _, cursor = self.get_page(cursor)
+            self.assertFalse([query["sql"] for query in queries if "COUNT(" in query["sql"]])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/ads/", {"page": 2})
+        self.assertTrue([query["sql"] for query in queries if "COUNT(" in query["sql"]])
+
+    def test_stable_under_inserts(self):
+        existing = sorted(self.create_jobs(25), reverse=True)
+        seen, cursor = self.get_page()
+        while cursor is not None:
+            # new ads land before the first page, the pages being walked do not move
+            self.create_jobs(3)
+            ids, cursor = self.get_page(cursor)
+            seen += ids
+        self.assertEqual(seen, existing)
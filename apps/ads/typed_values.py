@@ -0,0 +1,71 @@
+"""
+OptionalFieldThrough.value is free text. The typed shadow columns hold the same value
+parsed according to OptionalField.type so that it can be compared and indexed.
+"""
+import math
+
+from django.utils.dateparse import parse_date, parse_datetime
+
+# OptionalField.type -> column
+TYPED_COLUMNS = {
+    "integer": "value_number",
+    "float": "value_number",
+    "date": "value_date",
+    "datetime": "value_date",
+    "boolean": "value_bool",
+}
+
+TRUE_VALUES = {"true", "1", "yes", "on"}
+FALSE_VALUES = {"false", "0", "no", "off"}
+
+
+def parse_number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def parse_day(value):
+    try:
+        moment = parse_datetime(value)
+        if moment is not None:
+            return moment.date()
+        return parse_date(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_bool(value):
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    return None
+
+
+PARSERS = {
+    "value_number": parse_number,
+    "value_date": parse_day,
+    "value_bool": parse_bool,
+}
+TYPED_VALUE_FIELDS = tuple(PARSERS)
+
+
+def parse_typed_value(field_type, value):
+    """ (column, parsed value) for field_type, column is None for untyped fields """
+    column = TYPED_COLUMNS.get(field_type)
+    if column is None or value is None:
+        return column, None
+    return column, PARSERS[column](str(value).strip())
+
+
+def typed_values(field_type, value):
+    """ Values of all typed columns for one OptionalFieldThrough row """
+    values = dict.fromkeys(PARSERS)
+    column, parsed = parse_typed_value(field_type, value)
+    if column is not None:
+        values[column] = parsed
+    return values
@@ -4,7 +4,9 @@ from apps.ads.api.views import views
 
 urlpatterns = [
     path('', job_views.JobListView.as_view()),
+    path('facets/', job_views.JobFacetsView.as_view()),
     path('create/', job_views.AdsCreateView.as_view()),
+    path('bulk/', job_views.AdsBulkCreateView.as_view()),
     path('<int:pk>/', job_views.AdsDetailView.as_view()),
     path('optional/field/', views.OptionalFieldListView.as_view())
 ]
\ No newline at end of file
@@ -5,7 +5,8 @@ from import_export.admin import ImportExportModelAdmin
 from apps.auth_app.models import (
     SocialMedia,
     SocialThrough,
-    CustomUser
+    CustomUser,
+    OutgoingEmail,
 )
 
 
@@ -44,6 +45,14 @@ class SocialThroughAdmin(ImportExportModelAdmin, admin.ModelAdmin):
     list_display = ['id', 'user', 'social', 'url', 'date_update', 'date_create']
 
 
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ['id', 'to_email', 'subject', 'status', 'attempts', 'next_attempt_at', 'date_sent', 'date_create']
+    list_filter = ['status']
+    search_fields = ['to_email']
+    exclude = ['body']
+
+
 admin.site.register(CustomUser, NewUser)
 admin.site.register(SocialMedia, SocialMediaAdmin)
 admin.site.register(SocialThrough, SocialThroughAdmin)
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
@@ -21,3 +21,7 @@ container = DIContainer()
 
 # OAuth providers
 container.register("google_auth", oauth_adapters.GoogleAuth)
+
+# OAuth providers of the async login view
+async_container = DIContainer()
+async_container.register("google_auth", oauth_adapters.AsyncGoogleAuth)
@@ -0,0 +1,167 @@
+"""
+Shared HTTP client of the OAuth adapters.
+
+One requests.Session per provider, created on first use and shared by the threads of the process:
+connections are kept alive and reused across logins. Every request has connect/read timeouts,
+failed connections and (for GET) 429/5xx answers are retried a bounded number of times with
+jittered exponential backoff, and the latency of every request is recorded per provider.
+POSTs are only retried when the connection failed: an authorization code must not be sent twice.
+async_request does the same with one httpx.AsyncClient per provider and event loop.
+"""
+import asyncio
+import random
+import threading
+import time
+import weakref
+from collections import defaultdict, deque
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from apps.auth_app.api.adapets import oauth_settings
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+BACKOFF_FACTOR = 0.2
+BACKOFF_JITTER = 0.2
+LATENCY_SAMPLES = 1000
+
+
+class LatencyStats:
+    """ Per-provider request count, errors and latency percentiles over the last LATENCY_SAMPLES requests """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: {'requests': 0, 'errors': 0})
+        self._samples = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+
+    def record(self, provider, seconds, ok):
+        with self._lock:
+            counts = self._counts[provider]
+            counts['requests'] += 1
+            counts['errors'] += not ok
+            self._samples[provider].append(seconds)
+
+    def snapshot(self):
+        """ {provider: {'requests', 'errors', 'p50_ms', 'p95_ms', 'max_ms'}} """
+        with self._lock:
+            result = {}
+            for provider, counts in self._counts.items():
+                samples = sorted(self._samples[provider])
+                result[provider] = {
+                    **counts,
+                    'p50_ms': samples[len(samples) // 2] * 1000,
+                    'p95_ms': samples[int(len(samples) * 0.95)] * 1000,
+                    'max_ms': samples[-1] * 1000,
+                }
+            return result
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self._samples.clear()
+
+
+oauth_http_stats = LatencyStats()
+
+
+class ProviderSession(requests.Session):
+    """ requests.Session with default timeouts and latency recording """
+
+    def __init__(self, provider):
+        super().__init__()
+        self.provider = provider
+        self.trust_env = False
+        retry = Retry(
+            total=oauth_settings.HTTP_RETRIES,
+            allowed_methods=frozenset({'GET'}),
+            status_forcelist=RETRY_STATUSES,
+            backoff_factor=BACKOFF_FACTOR,
+            backoff_jitter=BACKOFF_JITTER,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=oauth_settings.HTTP_POOL_SIZE, max_retries=retry, pool_block=False
+        )
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', (oauth_settings.HTTP_CONNECT_TIMEOUT, oauth_settings.HTTP_READ_TIMEOUT))
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = super().request(method, url, **kwargs)
+            ok = response.status_code < 500
+            return response
+        finally:
+            oauth_http_stats.record(self.provider, time.perf_counter() - start, ok)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(provider):
+    session = _sessions.get(provider)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(provider)
+            if session is None:
+                session = _sessions[provider] = ProviderSession(provider)
+    return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+# event loop -> {provider: httpx.AsyncClient}, a client cannot be used from another loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client(provider):
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(provider)
+    if client is None:
+        # the transport retries failed connections only
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=oauth_settings.ASYNC_HTTP_POOL_SIZE,
+                max_keepalive_connections=oauth_settings.ASYNC_HTTP_POOL_SIZE,
+            ),
+            retries=oauth_settings.HTTP_RETRIES,
+            trust_env=False,
+        )
+        client = clients[provider] = httpx.AsyncClient(
+            timeout=httpx.Timeout(oauth_settings.HTTP_READ_TIMEOUT, connect=oauth_settings.HTTP_CONNECT_TIMEOUT),
+            transport=transport,
+            trust_env=False,
+        )
+    return client
+
+
+async def async_request(provider, method, url, **kwargs):
+    """ httpx request with the retry policy and latency recording of ProviderSession """
+    client = get_async_client(provider)
+    for attempt in range(oauth_settings.HTTP_RETRIES + 1):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            oauth_http_stats.record(provider, time.perf_counter() - start, False)
+            raise
+        oauth_http_stats.record(provider, time.perf_counter() - start, response.status_code < 500)
+        if method != 'GET' or response.status_code not in RETRY_STATUSES or attempt == oauth_settings.HTTP_RETRIES:
+            return response
+        await asyncio.sleep(BACKOFF_FACTOR * 2 ** attempt + random.uniform(0, BACKOFF_JITTER))
+
+
+async def aclose_async_clients():
+    """ Close the clients of the running event loop """
+    for client in _async_clients.pop(asyncio.get_running_loop(), {}).values():
+        await client.aclose()
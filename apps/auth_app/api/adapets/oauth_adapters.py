@@ -1,47 +1,86 @@
-from base64 import b64encode
-
+import httpx
 import requests
 from apps.auth_app.api.adapets import oauth_settings
 
-from apps.auth_app.api.adapets.oauth_interfaces import SocialAuthAbstract
-from apps.auth_app.models import CustomUser
+from apps.auth_app.api.adapets.oauth_interfaces import SocialAuthAbstract, AsyncSocialAuthAbstract
 
 
-class GoogleAuth(SocialAuthAbstract):
-    """Authorization via Google"""
+class GoogleRequests:
+    """Requests and answers of the Google OAuth2 flow, shared by the sync and async adapters"""
+
+    provider = "google"
 
     def __init__(self, code: str) -> None:
         super().__init__(code, oauth_settings.GOOGLE_CLIENT_ID, oauth_settings.GOOGLE_CLIENT_SECRET)
 
-    def get_access_token(self) -> str:
-        """Obtains the Google OAuth2 access token"""
-        proxies = {"http": None, "https": None}
-        url = "https://oauth2.googleapis.com/token"
-        data = {
-            "client_id": self.client_id,
-            "client_secret": self.client_secret,
-            "code": self.code,
-            "grant_type": "authorization_code",
-            "redirect_uri": oauth_settings.REDIRECT_URL,
+    def token_request(self) -> dict:
+        return {
+            "url": oauth_settings.GOOGLE_TOKEN_URL,
+            "data": {
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "code": self.code,
+                "grant_type": "authorization_code",
+                "redirect_uri": oauth_settings.REDIRECT_URL,
+            },
+            "headers": {"Content-Type": "application/x-www-form-urlencoded"},
         }
-        headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        response = requests.post(url, data=data, headers=headers, proxies=proxies)
+
+    def read_access_token(self, response) -> str:
         if response.status_code == 200:
             return response.json()["access_token"]
         else:
             # Log or print the actual error message for better debugging
-            error_message = response.json().get('error_description', 'Unknown error')
-            raise ValueError(f"Failed to obtain access token: {error_message}")
+            raise ValueError(f"Failed to obtain access token: {self.error_message(response)}")
 
-    def get_user_info(self, access_token: str) -> (str, str):
-        """Fetches the user's Google ID and email"""
-        url = "https://www.googleapis.com/oauth2/v2/userinfo"
-        headers = {"Authorization": f"Bearer {access_token}"}
-        response = requests.get(url, headers=headers)
+    @staticmethod
+    def user_info_request(access_token: str) -> dict:
+        return {
+            "url": oauth_settings.GOOGLE_USERINFO_URL,
+            "headers": {"Authorization": f"Bearer {access_token}"},
+        }
+
+    def read_user_info(self, response) -> (str, str):
         if response.status_code == 200:
             user_info = response.json()
             return user_info.get("id"), user_info.get("email")
         else:
-            error_message = response.json().get('error_description', 'Unknown error')
-            raise ValueError(f"Failed to fetch user info: {error_message}")
+            raise ValueError(f"Failed to fetch user info: {self.error_message(response)}")
+
+
+class GoogleAuth(GoogleRequests, SocialAuthAbstract):
+    """Authorization via Google"""
+
+    def get_access_token(self) -> str:
+        """Obtains the Google OAuth2 access token"""
+        try:
+            response = self.http.post(**self.token_request())
+        except requests.RequestException as err:
+            raise ValueError(f"Failed to obtain access token: {type(err).__name__}")
+        return self.read_access_token(response)
+
+    def get_user_info(self, access_token: str) -> (str, str):
+        """Fetches the user's Google ID and email"""
+        try:
+            response = self.http.get(**self.user_info_request(access_token))
+        except requests.RequestException as err:
+            raise ValueError(f"Failed to fetch user info: {type(err).__name__}")
+        return self.read_user_info(response)
+
+
+class AsyncGoogleAuth(GoogleRequests, AsyncSocialAuthAbstract):
+    """Authorization via Google for async views"""
+
+    async def get_access_token(self) -> str:
+        try:
+            response = await self.request("POST", **self.token_request())
+        except httpx.HTTPError as err:
+            raise ValueError(f"Failed to obtain access token: {type(err).__name__}")
+        return self.read_access_token(response)
 
+    async def get_user_info(self, access_token: str) -> (str, str):
+        try:
+            response = await self.request("GET", **self.user_info_request(access_token))
+        except httpx.HTTPError as err:
+            raise ValueError(f"Failed to fetch user info: {type(err).__name__}")
+        return self.read_user_info(response)
@@ -1,14 +1,32 @@
 from abc import ABC, abstractmethod
 
+from apps.auth_app.api.adapets import http_client
+
 
 class SocialAuthAbstract(ABC):
     """Abstract class for authorization via social media networks"""
 
+    # name of the pooled HTTP session and of the latency metrics of the provider
+    provider = None
+
     def __init__(self, code: str, client_id: str, client_secret: str) -> None:
         self.code = code
         self.client_id = client_id
         self.client_secret = client_secret
 
+    @property
+    def http(self):
+        """Pooled, timeout-bounded session shared by every request to the provider"""
+        return http_client.get_session(self.provider)
+
+    @staticmethod
+    def error_message(response) -> str:
+        """error_description of an OAuth error answer, the start of the body otherwise"""
+        try:
+            return response.json().get('error_description', 'Unknown error')
+        except ValueError:
+            return f"HTTP {response.status_code}: {response.text[:200]}"
+
     @abstractmethod
     def get_access_token(self) -> str:
         """Returns access_token"""
@@ -22,4 +40,35 @@ class SocialAuthAbstract(ABC):
     def auth(self) -> (int, str):
         """Authenticates the user and returns their ID and email"""
         access_token = self.get_access_token()
-        return self.get_user_info(access_token)
\ No newline at end of file
+        return self.get_user_info(access_token)
+
+
+class AsyncSocialAuthAbstract(ABC):
+    """Async version of SocialAuthAbstract, the provider round-trips run on the event loop"""
+
+    provider = None
+    error_message = SocialAuthAbstract.error_message
+
+    def __init__(self, code: str, client_id: str, client_secret: str) -> None:
+        self.code = code
+        self.client_id = client_id
+        self.client_secret = client_secret
+
+    async def request(self, method: str, url: str, **kwargs):
+        """Request with the async client shared by every request to the provider"""
+        return await http_client.async_request(self.provider, method, url, **kwargs)
+
+    @abstractmethod
+    async def get_access_token(self) -> str:
+        """Returns access_token"""
+        pass
+
+    @abstractmethod
+    async def get_user_info(self, access_token: str) -> (int, str):
+        """Returns the user_id and email of the user"""
+        pass
+
+    async def auth(self) -> (int, str):
+        """Authenticates the user and returns their ID and email"""
+        access_token = await self.get_access_token()
+        return await self.get_user_info(access_token)
@@ -4,4 +4,17 @@ import os
 REDIRECT_URL = "https://example.com"
 
 GOOGLE_CLIENT_ID = "409261742060-ia3molca8tcmm7c7dci610233u02eqbd.apps.googleusercontent.com"
-GOOGLE_CLIENT_SECRET = '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'
\ No newline at end of file
+GOOGLE_CLIENT_SECRET = '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'
+
+# overridable to point the adapters at the stub server (manage.py oauth_stub_server)
+GOOGLE_TOKEN_URL = os.environ.get("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+GOOGLE_USERINFO_URL = os.environ.get("GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v2/userinfo")
+GOOGLE_CERTS_URL = os.environ.get("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+
+# seconds
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("OAUTH_HTTP_CONNECT_TIMEOUT", 3.05))
+HTTP_READ_TIMEOUT = float(os.environ.get("OAUTH_HTTP_READ_TIMEOUT", 10))
+HTTP_RETRIES = int(os.environ.get("OAUTH_HTTP_RETRIES", 2))
+HTTP_POOL_SIZE = int(os.environ.get("OAUTH_HTTP_POOL_SIZE", 10))
+# connections of the async client, one event loop serves many logins at once
+ASYNC_HTTP_POOL_SIZE = int(os.environ.get("OAUTH_ASYNC_HTTP_POOL_SIZE", 100))
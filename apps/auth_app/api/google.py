@@ -1,17 +1,15 @@
+import jwt
+import requests
 from django.conf import settings
-from google.auth.transport import requests
-from google.oauth2 import id_token
+
+from apps.auth_app.api.google_certs import verify_id_token
 
 
 class Google:
     @staticmethod
     def validate(auth_token):
+        """ Claims of the Google ID token, verified with the cached signing keys """
         try:
-            idinfo = id_token.verify_oauth2_token(
-                auth_token, requests.Request(), settings.GOOGLE_CLIENT_ID)
-
-            if 'accounts.google.com' in idinfo['iss']:
-                return idinfo
-
-        except:
+            return verify_id_token(auth_token, settings.GOOGLE_CLIENT_ID)
+        except (jwt.InvalidTokenError, requests.RequestException, ValueError):
             return "The token is either invalid or has expired"
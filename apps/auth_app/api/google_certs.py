@@ -0,0 +1,124 @@
+"""
+Google ID token verification with the signing keys cached in process.
+
+The certificates are downloaded once and parsed into public keys, kept for the max-age of
+their Cache-Control header: the signature of an ID token is then checked locally.
+Shortly before they expire a background thread downloads them again while logins go on with
+the current keys. One thread at a time downloads (single-flight): concurrent logins wait
+for that download instead of starting their own.
+"""
+import logging
+import re
+import threading
+import time
+
+import jwt
+from cryptography.x509 import load_pem_x509_certificate
+
+from apps.auth_app.api.adapets import http_client, oauth_settings
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+DEFAULT_MAX_AGE = 300
+# the background refresh starts when this share of the max-age is left
+REFRESH_AHEAD = 0.1
+# after a failed background refresh, wait this long before the next attempt
+REFRESH_RETRY_INTERVAL = 10
+# a token signed with an unknown key id downloads the certificates at most this often
+UNKNOWN_KID_INTERVAL = 60
+CLOCK_SKEW = 10
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+logger = logging.getLogger(__name__)
+
+
+class GoogleCertCache:
+    def __init__(self, url=None):
+        self.url = url
+        # held by the thread downloading the certificates
+        self._lock = threading.Lock()
+        # key id -> public key
+        self._keys = {}
+        # time.monotonic() values
+        self._expires = 0.0
+        self._refresh_at = 0.0
+        self._fetched = 0.0
+        self.fetches = 0
+
+    def _fetch(self):
+        response = http_client.get_session("google").get(self.url or oauth_settings.GOOGLE_CERTS_URL)
+        response.raise_for_status()
+        keys = {
+            kid: load_pem_x509_certificate(pem.encode()).public_key()
+            for kid, pem in response.json().items()
+        }
+        match = MAX_AGE_RE.search(response.headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else DEFAULT_MAX_AGE
+        # time already spent in an intermediate cache
+        ttl = max(max_age - int(response.headers.get("Age", 0) or 0), 0)
+        now = time.monotonic()
+        self._keys = keys
+        self._expires = now + ttl
+        self._refresh_at = now + ttl * (1 - REFRESH_AHEAD)
+        self._fetched = now
+        self.fetches += 1
+
+    def _fetch_unless(self, fresh):
+        """ Download unless fresh() turns true while waiting for the thread already downloading """
+        with self._lock:
+            if not fresh():
+                self._fetch()
+
+    def _refresh_in_background(self):
+        if not self._lock.acquire(blocking=False):
+            return
+
+        def refresh():
+            try:
+                self._fetch()
+            except Exception:
+                # the current keys stay in use until they expire
+                logger.warning("Refreshing the Google certificates failed", exc_info=True)
+                self._refresh_at = min(time.monotonic() + REFRESH_RETRY_INTERVAL, self._expires)
+            finally:
+                self._lock.release()
+
+        threading.Thread(target=refresh, name="google-certs-refresh", daemon=True).start()
+
+    def get_keys(self):
+        now = time.monotonic()
+        if now >= self._expires:
+            self._fetch_unless(lambda: time.monotonic() < self._expires)
+        elif now >= self._refresh_at:
+            self._refresh_in_background()
+        return self._keys
+
+    def get_key(self, kid):
+        keys = self.get_keys()
+        if kid not in keys and time.monotonic() - self._fetched >= UNKNOWN_KID_INTERVAL:
+            # Google may have rotated the keys before the max-age ran out
+            fetched = self._fetched
+            self._fetch_unless(lambda: self._fetched != fetched)
+            keys = self._keys
+        return keys.get(kid)
+
+    def clear(self):
+        with self._lock:
+            self._keys = {}
+            self._expires = self._refresh_at = self._fetched = 0.0
+
+
+google_certs = GoogleCertCache()
+
+
+def verify_id_token(token, audience, certs=google_certs, clock_skew=CLOCK_SKEW):
+    """ Claims of a valid Google ID token for audience, raises jwt.InvalidTokenError otherwise """
+    key = certs.get_key(jwt.get_unverified_header(token).get("kid"))
+    if key is None:
+        raise jwt.InvalidTokenError("Unknown signing key")
+    claims = jwt.decode(
+        token, key, algorithms=["RS256"], audience=audience, leeway=clock_skew,
+        options={"require": ["exp", "iat", "iss", "aud", "sub"]},
+    )
+    if claims["iss"] not in GOOGLE_ISSUERS:
+        raise jwt.InvalidIssuerError("Wrong issuer")
+    return claims
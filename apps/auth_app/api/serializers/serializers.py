@@ -6,9 +6,11 @@ from jsonschema._keywords import required
 from rest_framework import serializers
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.validators import UniqueValidator
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.models import Group
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 
 from apps.auth_app.api.register import register_social_user
 from apps.auth_app.email_utils import Util
@@ -17,6 +19,8 @@ from apps.auth_app.models import (
     CustomUser,
 )
 from apps.auth_app.api import google
+from apps.auth_app.throttling import login_throttle
+from utils.token import UserRefreshToken
 
 
 class IncorrectCredentialsError(serializers.ValidationError):
@@ -54,19 +58,20 @@ class RegisterSerializer(serializers.ModelSerializer):
             "password": {"required": True},
         }
 
+    @transaction.atomic
     def create(self, validated_data):
         groups_data = validated_data.pop("groups", None)
-        user = CustomUser.objects.create_user(**validated_data)
-        user.avatar = validated_data['photo']
-        user.set_password(validated_data['password'])
-        user.photo = validated_data['photo']
+        role = None
         if groups_data:
+            # checked before the INSERT: an invalid group no longer leaves a user without it behind
             try:
                 role = Group.objects.get(id=groups_data)
-                user.groups.add(role)
             except ObjectDoesNotExist:
                 raise serializers.ValidationError({'groups': "Invalid group ID"})
-        user.save()
+        # create_user hashes the password and saves photo with the other fields in one INSERT
+        user = CustomUser.objects.create_user(**validated_data)
+        if role is not None:
+            user.groups.add(role)
         return user
 
 
@@ -138,7 +143,10 @@ class LoginSerializer(serializers.ModelSerializer):
         return data
 
     def authenticate_user(self, phone, password):
-        user = authenticate(phone=phone, password=password)
+        # raises Throttled (429) before the password is hashed
+        with login_throttle.password_check(self.context["request"], phone) as outcome:
+            user = authenticate(phone=phone, password=password)
+            outcome["ok"] = user is not None and user.is_active
         return user
 
     def validate_user(self, user):
@@ -179,6 +187,7 @@ class ResetPasswordSerializer(serializers.Serializer):
             raise serializers.ValidationError("User with this email does not exist.")
         return value
 
+    @transaction.atomic
     def save(self):
         email = self.validated_data['email']
         generate_password = generate_random_string()
@@ -196,3 +205,7 @@ class ResetPasswordSerializer(serializers.Serializer):
         }
         Util.send(email_data)
 
+
+class UserTokenRefreshSerializer(TokenRefreshSerializer):
+    """ SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER']: the blacklist check goes through the in-memory revocation set """
+    token_class = UserRefreshToken
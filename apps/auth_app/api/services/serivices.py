@@ -1,5 +1,7 @@
 import uuid
 
+from asgiref.sync import sync_to_async
+
 from apps.auth_app.api.adapets import di_container
 from apps.auth_app.models import CustomUser
 from django.conf import settings
@@ -8,8 +10,8 @@ from django.core.mail import send_mail
 from django.db import IntegrityError, transaction
 
 from rest_framework_simplejwt.backends import TokenBackend
-from rest_framework_simplejwt.tokens import RefreshToken
 from utils.data_generation import generator_password
+from utils.token import get_token_for_user
 from utils.main import object_get_or_none
 import logging
 from django.utils.timezone import now
@@ -22,11 +24,7 @@ class TokenService:
     def get_token(user: CustomUser) -> dict:
         """Получение токена"""
 
-        refresh = RefreshToken.for_user(user)
-        return {
-            "refresh": str(refresh),
-            "access": str(refresh.access_token),
-        }
+        return get_token_for_user(user)
 
     def refresh_token(self, token_refresh) -> dict:
         """Обновление токена"""
@@ -135,3 +133,32 @@ class OauthService:
             print(f"Error during OAuth process: {err}")
             # Handle the specific error appropriately. You might want to log it or send a more user-friendly message to the frontend.
             raise ValueError(f"OAuth error: {err}")
+
+
+class AsyncOauthService(OauthService):
+    """OauthService for async views: provider round-trips on the event loop, user lookup with the async ORM"""
+
+    def __init__(self, code: str, social_media_type: str):
+        super().__init__(code, social_media_type)
+        self.container = di_container.async_container
+
+    async def get_social_auth(self) -> (CustomUser, bool):
+        try:
+            social_auth_class = self.container.get(self.social_media_type)
+            social_auth = social_auth_class(self.code)
+            social_user_id, social_user_email = await social_auth.auth()
+
+            if not social_user_id or not social_user_email:
+                raise ValueError("Failed to obtain user information from social provider.")
+
+            user = await CustomUser.objects.filter(social_auth_uid=social_user_id).afirst()
+            if user is None:
+                user = await sync_to_async(self.auth_service.register_user)(
+                    email=social_user_email,
+                    social_auth_uid=social_user_id,
+                )
+                return user, True
+            return user, False
+        except ValueError as err:
+            logger.warning("Error during OAuth process: %s", err)
+            raise ValueError(f"OAuth error: {err}")
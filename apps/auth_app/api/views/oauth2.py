@@ -1,9 +1,14 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
 from rest_framework.authentication import TokenAuthentication
 
 from apps.auth_app.api.serializers import google_serializers as auth_serializers
 from apps.auth_app.api.serializers import serializers
 from apps.auth_app.api.generic.generic_api_view import GenericAPIView
-from apps.auth_app.api.services.serivices import OauthService
+from apps.auth_app.api.services.serivices import OauthService, AsyncOauthService
 from apps.auth_app.models import CustomUser
 # from apps.companies.services.users import AuthService, EmailService, OauthService, TokenService, UserService
 from drf_yasg import openapi
@@ -57,4 +62,35 @@ class GoogleModelViewSet(GenericAPIView):
             data = self.get_serializer_response(user, context=self.get_serializer_context())
             return Response(data=data, status=status.HTTP_201_CREATED)
         except ValueError as e:
-            return Response(data={"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST, exception=True)
\ No newline at end of file
+            return Response(data={"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST, exception=True)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncGoogleLoginView(View):
+    """
+    social_media_auth as an async view, for the ASGI server (config.asgi): the code -> token and
+    token -> userinfo round-trips wait on the event loop instead of holding a worker thread.
+    Same request and response as GoogleModelViewSet.social_media_auth.
+    """
+
+    async def post(self, request):
+        if request.content_type == "application/json":
+            try:
+                data = json.loads(request.body or b"{}")
+            except ValueError:
+                return JsonResponse({"detail": "Invalid JSON"}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            data = request.POST
+        serializer = auth_serializers.SocialAuthSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            user, is_created = await AsyncOauthService(**serializer.data).get_social_auth()
+        except ValueError as e:
+            return JsonResponse({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        data = await sync_to_async(self.serialize_user)(user, request)
+        return JsonResponse(data, status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def serialize_user(user, request):
+        return serializers.InformationSerializer(user, context={"request": request}).data
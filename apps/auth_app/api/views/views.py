@@ -10,9 +10,13 @@ from apps.auth_app.api.serializers.serializers import (
     LoginSerializer, GoogleSocialAuthSerializer,
     UpdateSerializer, ResetPasswordSerializer
 )
+from apps.auth_app.models import CustomUser
 from utils.expected_fields import check_required_key
 from utils.renderers import UserRenderers
-from utils.responses import bad_request_response, success_created_response, success_response, success_deleted_response
+from utils.responses import (
+    bad_request_response, success_created_response, success_response, success_deleted_response,
+    user_not_found_response,
+)
 from utils.token import get_token_for_user
 
 
@@ -93,7 +97,11 @@ class ProfileViews(APIView):
                          tags=['Profile'],
                          responses={200: InformationSerializer(many=True)})
     def get(self, request):
-        serializer = InformationSerializer(request.user, context={'request': request} )
+        # a TokenPrincipal (Bearer) carries the cached row, Session/Token/Basic auth give the CustomUser itself
+        user = getattr(request.user, 'instance', request.user)
+        if user is None:
+            return user_not_found_response("User not found")
+        serializer = InformationSerializer(user, context={'request': request} )
         return success_response(serializer.data)
 
     @swagger_auto_schema(request_body=RegisterSerializer,
@@ -106,8 +114,10 @@ class ProfileViews(APIView):
         if unexpected_fields:
             return bad_request_response(f"Unexpected fields: {', '.join(unexpected_fields)}")
 
-        serializer = UpdateSerializer(request.user, data=request.data, partial=True,
-                                              context={'request': request})
+        user = CustomUser.objects.filter(pk=request.user.id).first()
+        if user is None:
+            return user_not_found_response("User not found")
+        serializer = UpdateSerializer(user, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid(raise_exception=True):
             serializer.save()
             return success_response(serializer.data)
@@ -117,7 +127,7 @@ class ProfileViews(APIView):
                          tags=['Profile'],
                          responses={204: 'No content'})
     def delete(self, request):
-        request.user.delete()
+        CustomUser.objects.filter(pk=request.user.id).delete()
         return success_deleted_response("User deleted")
 
 
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AuthAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.auth_app'
+
+    def ready(self):
+        from apps.auth_app import signals  # noqa: F401
@@ -0,0 +1,155 @@
+"""
+Request authentication.
+
+SchemeDispatchAuthentication runs exactly one authenticator, picked from the Authorization scheme.
+With a Bearer token request.user is built from the access token claims (user id, group ids, is_staff)
+without a database query. The CustomUser row is only loaded when a view asks for it,
+through a short-lived per-process cache that CustomUser save/delete invalidates.
+"""
+import hashlib
+import hmac
+import threading
+import time
+
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework.authentication import (
+    BaseAuthentication, BasicAuthentication, SessionAuthentication, TokenAuthentication, get_authorization_header
+)
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from apps.auth_app.models import CustomUser
+
+USER_CACHE_TTL = 60
+USER_CACHE_SIZE = 10000
+BASIC_AUTH_CACHE_TTL = 60
+
+
+class UserCache:
+    """ user id -> CustomUser with its groups prefetched, shared by the threads of the process """
+
+    def __init__(self, ttl=USER_CACHE_TTL, size=USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._lock = threading.Lock()
+        # user id -> (expiry, user)
+        self._users = {}
+        # moved by every invalidation, a load started before one is not stored
+        self._generation = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        entry = self._users.get(user_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        generation = self._generation
+        user = CustomUser.objects.prefetch_related('groups').filter(pk=user_id).first()
+        with self._lock:
+            if user is not None and generation == self._generation:
+                if len(self._users) >= self.size:
+                    self._users = {key: value for key, value in self._users.items() if value[0] > now}
+                    if len(self._users) >= self.size:
+                        self._users.clear()
+                self._users[user_id] = (now + self.ttl, user)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generation += 1
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._users.clear()
+
+
+user_cache = UserCache()
+
+
+class TokenPrincipal(TokenUser):
+    """
+    request.user of JWTStatelessUserAuthentication (SIMPLE_JWT['TOKEN_USER_CLASS']).
+    id, pk, is_staff, is_superuser and group_ids come from the token; instance is the
+    cached CustomUser row, shared between requests: read it, never modify or save it.
+    """
+
+    def __str__(self):
+        return f"TokenPrincipal {self.id}"
+
+    @cached_property
+    def group_ids(self):
+        return list(self.token.get('groups', ()))
+
+    @cached_property
+    def instance(self):
+        return user_cache.get(self.id)
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    Basic authentication that remembers successful checks for BASIC_AUTH_CACHE_TTL seconds,
+    so the password hasher runs once per client instead of on every request.
+    An entry only matches while the stored password hash of the user is unchanged.
+    """
+    _lock = threading.Lock()
+    # HMAC of the credentials -> (expiry, user id, password hash)
+    _verified = {}
+
+    @staticmethod
+    def _credentials_key(userid, password):
+        return hmac.new(settings.SECRET_KEY.encode(), f"{userid}\0{password}".encode(), hashlib.sha256).digest()
+
+    def authenticate_credentials(self, userid, password, request=None):
+        key = self._credentials_key(userid, password)
+        now = time.monotonic()
+        entry = self._verified.get(key)
+        if entry is not None and entry[0] > now:
+            user = user_cache.get(entry[1])
+            if user is not None and user.is_active and user.password == entry[2]:
+                return user, None
+        user, auth = super().authenticate_credentials(userid, password, request)
+        with self._lock:
+            if len(self._verified) >= USER_CACHE_SIZE:
+                self._verified.clear()
+            self._verified[key] = (now + BASIC_AUTH_CACHE_TTL, user.pk, user.password)
+        return user, auth
+
+
+class SchemeDispatchAuthentication(BaseAuthentication):
+    """
+    Picks one authenticator from the Authorization header scheme instead of trying them all:
+    Bearer (SIMPLE_JWT AUTH_HEADER_TYPES) -> stateless JWT, Basic -> CachedBasicAuthentication,
+    Token -> DRF token. Without an Authorization header the session is used when the request
+    carries a session cookie. Unknown schemes stay anonymous.
+    """
+    jwt_class = JWTStatelessUserAuthentication
+    basic_class = CachedBasicAuthentication
+    token_class = TokenAuthentication
+    session_class = SessionAuthentication
+
+    def get_authenticator(self, request):
+        header = get_authorization_header(request).split(None, 1)
+        if not header:
+            if settings.SESSION_COOKIE_NAME in request.COOKIES:
+                return self.session_class()
+            return None
+        scheme = header[0].decode('latin-1').lower()
+        if scheme in {header_type.lower() for header_type in jwt_settings.AUTH_HEADER_TYPES}:
+            return self.jwt_class()
+        if scheme == 'basic':
+            return self.basic_class()
+        if scheme == self.token_class.keyword.lower():
+            return self.token_class()
+        return None
+
+    def authenticate(self, request):
+        authenticator = self.get_authenticator(request)
+        if authenticator is None:
+            return None
+        return authenticator.authenticate(request)
+
+    def authenticate_header(self, request):
+        return self.jwt_class().authenticate_header(request)
@@ -1,12 +1,12 @@
-from django.core.mail import EmailMessage
+from apps.auth_app.models import OutgoingEmail
 
 
 class Util:
 
     @staticmethod
     def send(data):
-        email = EmailMessage(
+        """ Queue the email in the outbox, the send_emails command delivers it """
+        return OutgoingEmail.objects.create(
             subject=data['email_subject'],
             body=data['email_body'],
-            to=[data['to_email']])
-        email.send()
+            to_email=data['to_email'])
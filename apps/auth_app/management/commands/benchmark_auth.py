@@ -0,0 +1,81 @@
+import base64
+import time
+from importlib import import_module
+
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication, TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from apps.auth_app.authentication import SchemeDispatchAuthentication, CachedBasicAuthentication, user_cache
+from apps.auth_app.models import CustomUser
+from utils.token import get_token_for_user
+
+# the DEFAULT_AUTHENTICATION_CLASSES chain before SchemeDispatchAuthentication
+CHAIN = (JWTAuthentication, SessionAuthentication, BasicAuthentication, TokenAuthentication)
+PASSWORD = "benchmark-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time authentication per request for every Authorization scheme, with the former chain of "
+        "authenticators and with SchemeDispatchAuthentication (benchmark user rolled back at the end)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            headers = self.seed()
+            self.stdout.write(f"{'scheme':>10} {'chain ms':>10} {'chain q':>8} {'dispatch ms':>12} {'dispatch q':>11}")
+            for scheme, meta in headers.items():
+                chain = self.run(meta, CHAIN, options["requests"])
+                dispatch = self.run(meta, (SchemeDispatchAuthentication,), options["requests"])
+                self.stdout.write(f"{scheme:>10} {chain[0]:>10.3f} {chain[1]:>8.1f} {dispatch[0]:>12.3f} {dispatch[1]:>11.1f}")
+            transaction.set_rollback(True)
+        user_cache.clear()
+        CachedBasicAuthentication._verified.clear()
+
+    def seed(self):
+        user = CustomUser.objects.create_user(
+            phone="+000benchmark", email="benchmark@example.com", password=PASSWORD
+        )
+        token = Token.objects.create(user=user)
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        basic = base64.b64encode(f"{user.email}:{PASSWORD}".encode()).decode()
+        return {
+            "bearer": {"HTTP_AUTHORIZATION": f"Bearer {get_token_for_user(user)['access']}"},
+            "basic": {"HTTP_AUTHORIZATION": f"Basic {basic}"},
+            "token": {"HTTP_AUTHORIZATION": f"Token {token.key}"},
+            "session": {"HTTP_COOKIE": f"{settings.SESSION_COOKIE_NAME}={session.session_key}"},
+            "anonymous": {},
+        }
+
+    def run(self, meta, authentication_classes, count):
+        """ (ms, queries) per request, averaged over count requests """
+        factory = RequestFactory()
+        elapsed, queries = 0.0, 0
+        for _ in range(count):
+            django_request = factory.get("/auth/profile/", **meta)
+            SessionMiddleware(lambda request: None).process_request(django_request)
+            AuthenticationMiddleware(lambda request: None).process_request(django_request)
+            request = Request(django_request, authenticators=[cls() for cls in authentication_classes])
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                request.user
+                elapsed += time.perf_counter() - start
+            queries += len(context.captured_queries)
+        return elapsed / count * 1000, queries / count
@@ -0,0 +1,66 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from google.auth.transport import requests as google_requests
+from google.oauth2 import id_token
+
+from apps.auth_app.api import google_certs
+from apps.auth_app.api.adapets import http_client
+from apps.auth_app.management.commands.oauth_stub_server import StubOAuthServer
+
+AUDIENCE = "stub-client-id"
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify Google ID tokens signed by the local stub key server: google-auth downloading the "
+        "certificates on every call against the in-process key cache"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=2000)
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--latency", type=float, default=0, help="seconds added by the stub to every answer")
+        parser.add_argument("--cert-max-age", type=int, default=3600, help="max-age of the stub certificates")
+
+    def handle(self, *args, **options):
+        server = StubOAuthServer(("127.0.0.1", 0), options["latency"], cert_max_age=options["cert_max_age"])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        certs_url = f"{server.url}/certs"
+        tokens = [server.mint_id_token(AUDIENCE, str(index), f"user{index}@example.com") for index in range(100)]
+        try:
+            google_request = google_requests.Request()
+            self.run(
+                "google-auth", server, options,
+                lambda token: id_token.verify_token(token, google_request, AUDIENCE, certs_url=certs_url), tokens,
+            )
+            cache = google_certs.GoogleCertCache(url=certs_url)
+            self.run(
+                "cached", server, options,
+                lambda token: google_certs.verify_id_token(token, AUDIENCE, certs=cache), tokens,
+            )
+            self.stdout.write(f"cached: {cache.fetches} certificate downloads")
+        finally:
+            http_client.close_sessions()
+            server.shutdown()
+            server.server_close()
+
+    def run(self, name, server, options, verify, tokens):
+        def login(index):
+            start = time.perf_counter()
+            claims = verify(tokens[index % len(tokens)])
+            assert claims["sub"] == str(index % len(tokens))
+            return time.perf_counter() - start
+
+        server.cert_requests = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options["threads"]) as executor:
+            timings = sorted(executor.map(login, range(options["logins"])))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{name:>11}: {options['logins'] / elapsed:.0f} verifications/s, "
+            f"p50 {timings[len(timings) // 2] * 1000:.3f} ms, p99 {timings[int(len(timings) * 0.99)] * 1000:.3f} ms, "
+            f"{server.cert_requests} requests to /certs"
+        )
@@ -0,0 +1,101 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.test import Client
+
+from apps.auth_app import throttling
+from apps.auth_app.models import CustomUser
+
+PHONE, EMAIL, PASSWORD = "+000loginbench", "loginbench@example.com", "benchmark-password"
+VICTIMS = 100
+USER_IP = "198.51.100.1"
+
+
+class Command(BaseCommand):
+    help = (
+        "Credential-stuffing burst on /auth/login/ (existing phones, wrong passwords, from a few client IPs) "
+        "while a real user logs in, without and with the login throttle. "
+        "Its throttle counters are reset and the users removed at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--attempts", type=int, default=400)
+        parser.add_argument("--threads", type=int, default=16, help="attacking threads")
+        parser.add_argument("--ips", type=int, default=4, help="client IPs of the attack")
+        parser.add_argument("--logins", type=int, default=10, help="logins of the real user during the attack")
+
+    def handle(self, *args, **options):
+        CustomUser.objects.create_user(phone=PHONE, email=EMAIL, password=PASSWORD)
+        # unknown phones are refused without hashing, the attack targets existing accounts
+        password = make_password("not-guessed")
+        CustomUser.objects.bulk_create([
+            CustomUser(phone=f"+000victim{index}", email=f"victim{index}@example.com", password=password)
+            for index in range(VICTIMS)
+        ])
+        throttle = throttling.login_throttle
+        limits = throttle.identity.limit, throttle.ip.limit, throttle._checks
+        try:
+            throttle.identity.limit = throttle.ip.limit = float("inf")
+            throttle._checks = threading.BoundedSemaphore(10 ** 6)
+            self.run("unthrottled", options)
+            throttle.identity.limit, throttle.ip.limit, throttle._checks = limits
+            self.run("throttled", options)
+        finally:
+            throttle.identity.limit, throttle.ip.limit, throttle._checks = limits
+            CustomUser.objects.filter(Q(phone=PHONE) | Q(phone__startswith="+000victim")).delete()
+            self.reset_counters(options)
+
+    @staticmethod
+    def attack_ip(index, options):
+        return f"203.0.113.{index % options['ips'] + 1}"
+
+    def reset_counters(self, options):
+        """ Only the counters of the benchmark's phones and IPs, the rest of the throttle cache is live state """
+        throttling.login_throttle.reset(
+            identities=[PHONE, *(f"+000victim{index}" for index in range(VICTIMS))],
+            ips=[USER_IP, *(self.attack_ip(index, options) for index in range(options["ips"]))],
+        )
+
+    def run(self, name, options):
+        self.reset_counters(options)
+        throttling.login_throttle_stats.clear()
+        statuses = []
+        done = threading.Event()
+
+        def attack(index):
+            response = Client(REMOTE_ADDR=self.attack_ip(index, options)).post(
+                "/auth/login/", {"phone": f"+000victim{random.randrange(VICTIMS)}", "password": "guess"}
+            )
+            statuses.append(response.status_code)
+
+        def real_user():
+            timings = []
+            client = Client(REMOTE_ADDR=USER_IP)
+            while not done.is_set() and len(timings) < options["logins"]:
+                start = time.perf_counter()
+                response = client.post("/auth/login/", {"phone": PHONE, "password": PASSWORD})
+                timings.append((time.perf_counter() - start, response.status_code))
+            return timings
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(1) as user_executor:
+            user_timings = user_executor.submit(real_user)
+            with ThreadPoolExecutor(options["threads"]) as executor:
+                list(executor.map(attack, range(options["attempts"])))
+            elapsed = time.perf_counter() - start
+            done.set()
+            user_timings = user_timings.result()
+
+        seconds = sorted(seconds for seconds, _ in user_timings)
+        self.stdout.write(
+            f"{name:>11}: {len(statuses)} attempts in {elapsed:.1f}s "
+            f"({statuses.count(429)} x 429, {statuses.count(400)} x 400), "
+            f"real user p50 {seconds[len(seconds) // 2] * 1000:.0f} ms, max {seconds[-1] * 1000:.0f} ms, "
+            f"{sum(status == 200 for _, status in user_timings)}/{len(user_timings)} ok, "
+            f"stats {dict(throttling.login_throttle_stats)}"
+        )
@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+from apps.auth_app.api.adapets import http_client, oauth_settings
+from apps.auth_app.api.adapets.oauth_adapters import GoogleAuth
+from apps.auth_app.management.commands.oauth_stub_server import StubOAuthServer
+
+
+def unpooled_auth(code):
+    """ The adapter flow before the shared client: a new connection per request, no timeout """
+    response = requests.post(oauth_settings.GOOGLE_TOKEN_URL, data={"code": code, "grant_type": "authorization_code"})
+    access_token = response.json()["access_token"]
+    response = requests.get(oauth_settings.GOOGLE_USERINFO_URL, headers={"Authorization": f"Bearer {access_token}"})
+    return response.json()["id"], response.json()["email"]
+
+
+class Command(BaseCommand):
+    help = "Time the Google OAuth flow against the local stub server, with and without the pooled client"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=500)
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--latency", type=float, default=0, help="seconds added by the stub to every answer")
+        parser.add_argument("--fail-rate", type=float, default=0, help="share of stub answers that are 503")
+
+    def handle(self, *args, **options):
+        server = StubOAuthServer(("127.0.0.1", 0), options["latency"], options["fail_rate"])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        token_url, userinfo_url = oauth_settings.GOOGLE_TOKEN_URL, oauth_settings.GOOGLE_USERINFO_URL
+        oauth_settings.GOOGLE_TOKEN_URL, oauth_settings.GOOGLE_USERINFO_URL = f"{server.url}/token", f"{server.url}/userinfo"
+        try:
+            if not options["fail_rate"]:
+                self.run("unpooled", unpooled_auth, options["logins"], options["threads"])
+            self.run("pooled", lambda code: GoogleAuth(code).auth(), options["logins"], options["threads"])
+            for provider, stats in http_client.oauth_http_stats.snapshot().items():
+                self.stdout.write(
+                    f"{provider}: {stats['requests']} requests, {stats['errors']} errors, "
+                    f"p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms, max {stats['max_ms']:.2f} ms"
+                )
+        finally:
+            oauth_settings.GOOGLE_TOKEN_URL, oauth_settings.GOOGLE_USERINFO_URL = token_url, userinfo_url
+            http_client.close_sessions()
+            server.shutdown()
+            server.server_close()
+
+    def run(self, name, auth, logins, threads):
+        def login(index):
+            start = time.perf_counter()
+            try:
+                auth(f"code{index}")
+                return time.perf_counter() - start, True
+            except ValueError:
+                return time.perf_counter() - start, False
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            results = list(executor.map(login, range(logins)))
+        elapsed = time.perf_counter() - start
+        timings = sorted(seconds for seconds, _ in results)
+        failed = sum(not ok for _, ok in results)
+        self.stdout.write(
+            f"{name:>9}: {logins / elapsed:.0f} logins/s, p50 {timings[len(timings) // 2] * 1000:.2f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms, {failed} failed"
+        )
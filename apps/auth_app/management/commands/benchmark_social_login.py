@@ -0,0 +1,92 @@
+import asyncio
+import json
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from apps.auth_app.api.adapets import http_client, oauth_settings
+from apps.auth_app.management.commands.oauth_stub_server import StubOAuthServer
+from apps.auth_app.models import CustomUser
+
+EMAIL_DOMAIN = "stub.example.com"
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test of the Google login against the local stub provider: the sync view with a pool of "
+        "worker threads against the async view served by one ASGI event loop. Users are removed at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=400)
+        parser.add_argument("--latency", type=float, default=0.05, help="seconds the stub takes to answer")
+        parser.add_argument("--threads", type=int, default=4, help="threads of the sync worker")
+        parser.add_argument("--concurrency", type=int, default=200, help="logins in flight on the async worker")
+
+    def handle(self, *args, **options):
+        server = StubOAuthServer(("127.0.0.1", 0), options["latency"])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        urls = oauth_settings.GOOGLE_TOKEN_URL, oauth_settings.GOOGLE_USERINFO_URL
+        oauth_settings.GOOGLE_TOKEN_URL, oauth_settings.GOOGLE_USERINFO_URL = f"{server.url}/token", f"{server.url}/userinfo"
+        codes = [f"login{index}" for index in range(options["logins"])]
+        # returning users: the stub answers id crc32(code) and email code@stub.example.com
+        CustomUser.objects.bulk_create([
+            CustomUser(phone=f"+stub{index}", email=f"{code}@{EMAIL_DOMAIN}", social_auth_uid=str(zlib.crc32(code.encode())))
+            for index, code in enumerate(codes)
+        ])
+        try:
+            self.report("sync", options["threads"], *self.run_sync(codes, options["threads"]))
+            self.report("async", options["concurrency"], *asyncio.run(self.run_async(codes, options["concurrency"])))
+        finally:
+            oauth_settings.GOOGLE_TOKEN_URL, oauth_settings.GOOGLE_USERINFO_URL = urls
+            http_client.close_sessions()
+            CustomUser.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").delete()
+            server.shutdown()
+            server.server_close()
+
+    def run_sync(self, codes, threads):
+        def login(code):
+            start = time.perf_counter()
+            response = Client().post(
+                "/auth/social-media/", json.dumps({"code": code, "social_media_type": "google_auth"}),
+                content_type="application/json",
+            )
+            return time.perf_counter() - start, response.status_code == 201
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            results = list(executor.map(login, codes))
+        return results, time.perf_counter() - start
+
+    async def run_async(self, codes, concurrency):
+        application = get_asgi_application()
+        semaphore = asyncio.Semaphore(concurrency)
+        async with httpx.AsyncClient(app=application, base_url="http://testserver") as client:
+            async def login(code):
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post(
+                        "/auth/social-media/async/", json={"code": code, "social_media_type": "google_auth"}
+                    )
+                    return time.perf_counter() - start, response.status_code == 201
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*(login(code) for code in codes))
+            elapsed = time.perf_counter() - start
+        await http_client.aclose_async_clients()
+        return results, elapsed
+
+    def report(self, name, workers, results, elapsed):
+        timings = sorted(seconds for seconds, _ in results)
+        failed = sum(not ok for _, ok in results)
+        self.stdout.write(
+            f"{name:>5} ({workers} in flight): {len(results) / elapsed:.0f} logins/s, "
+            f"p50 {timings[len(timings) // 2] * 1000:.1f} ms, p95 {timings[int(len(timings) * 0.95)] * 1000:.1f} ms, "
+            f"{failed} failed"
+        )
@@ -0,0 +1,149 @@
+import datetime
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.core.management.base import BaseCommand
+
+STUB_KEY_ID = "stub-key"
+
+
+class StubOAuthHandler(BaseHTTPRequestHandler):
+    """
+    POST /token exchanges any code for the access token "stub-<code>" (the code "invalid" is refused),
+    GET /userinfo answers {"id", "email"} for such a token and GET /certs serves the certificate
+    of the key signing the server's ID tokens with Cache-Control max-age, like Google's endpoints.
+    """
+    protocol_version = "HTTP/1.1"
+    # headers and body leave in one segment, a separate small write stalls keep-alive clients on delayed ACKs
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def simulate_network(self):
+        """ True when the request must fail with a 503 """
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        return random.random() < self.server.fail_rate
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        if urlparse(self.path).path != "/token":
+            return self.send_json(404, {"error": "not_found"})
+        if self.simulate_network():
+            return self.send_json(503, {"error": "unavailable", "error_description": "Stub failure"})
+        code = form.get("code", [""])[0]
+        if not code or code == "invalid":
+            return self.send_json(400, {"error": "invalid_grant", "error_description": "Bad Request"})
+        self.send_json(200, {"access_token": f"stub-{code}", "expires_in": 3599, "token_type": "Bearer"})
+
+    def send_certs(self):
+        with self.server.lock:
+            self.server.cert_requests += 1
+        if self.simulate_network():
+            return self.send_json(503, {"error": "unavailable"})
+        body = json.dumps({STUB_KEY_ID: self.server.certificate_pem}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Cache-Control", f"public, max-age={self.server.cert_max_age}, must-revalidate")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/certs":
+            return self.send_certs()
+        if path != "/userinfo":
+            return self.send_json(404, {"error": "not_found"})
+        if self.simulate_network():
+            return self.send_json(503, {"error": "unavailable", "error_description": "Stub failure"})
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not token.startswith("stub-"):
+            return self.send_json(401, {"error": "invalid_token", "error_description": "Invalid Credentials"})
+        code = token.removeprefix("stub-")
+        self.send_json(200, {"id": str(zlib.crc32(code.encode())), "email": f"{code}@stub.example.com"})
+
+
+class StubOAuthServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # load tests open hundreds of connections at once
+    request_queue_size = 1024
+
+    def __init__(self, address, latency=0.0, fail_rate=0.0, verbose=False, cert_max_age=3600):
+        super().__init__(address, StubOAuthHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.verbose = verbose
+        self.cert_max_age = cert_max_age
+        self.cert_requests = 0
+        self.lock = threading.Lock()
+        self.signing_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "stub-oauth")])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        certificate = (
+            x509.CertificateBuilder().subject_name(name).issuer_name(name)
+            .public_key(self.signing_key.public_key()).serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=30))
+            .sign(self.signing_key, hashes.SHA256())
+        )
+        self.certificate_pem = certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+    def mint_id_token(self, audience, subject, email, lifetime=3600):
+        """ An ID token signed like Google's, verifiable with the certificate of /certs """
+        now = int(time.time())
+        claims = {
+            "iss": "https://accounts.google.com", "aud": audience, "sub": subject, "email": email,
+            "name": email.split("@")[0], "iat": now, "exp": now + lifetime,
+        }
+        return jwt.encode(claims, self.signing_key, algorithm="RS256", headers={"kid": STUB_KEY_ID})
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local OAuth provider stub. Point the Google adapter at it with "
+        "GOOGLE_TOKEN_URL=http://127.0.0.1:<port>/token GOOGLE_USERINFO_URL=http://127.0.0.1:<port>/userinfo "
+        "GOOGLE_CERTS_URL=http://127.0.0.1:<port>/certs"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", type=float, default=0, help="seconds added to every answer")
+        parser.add_argument("--fail-rate", type=float, default=0, help="share of requests answered with 503")
+        parser.add_argument("--cert-max-age", type=int, default=3600, help="max-age of the /certs answer")
+
+    def handle(self, *args, **options):
+        server = StubOAuthServer(
+            ("127.0.0.1", options["port"]), options["latency"], options["fail_rate"], True, options["cert_max_age"]
+        )
+        self.stdout.write(f"Stub OAuth server on {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
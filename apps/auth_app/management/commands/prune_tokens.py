@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired OutstandingToken rows and their BlacklistedToken rows in small transactions, "
+        "so that it can run next to live traffic. With --interval it keeps running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--pause", type=float, default=0.1, help="seconds to sleep between chunks")
+        parser.add_argument("--interval", type=float, default=0,
+                            help="run again every this many seconds, 0 runs once")
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.perf_counter()
+            deleted = self.prune(options["chunk_size"], options["pause"])
+            self.stdout.write(f"{deleted} expired tokens deleted in {time.perf_counter() - start:.1f}s")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+    def prune(self, chunk_size, pause):
+        deleted = 0
+        now = timezone.now()
+        while True:
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=now).order_by("id").values_list("id", flat=True)[:chunk_size]
+            )
+            if not ids:
+                return deleted
+            with transaction.atomic():
+                BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+            time.sleep(pause)
@@ -0,0 +1,110 @@
+import datetime
+import random
+import time
+from smtplib import SMTPRecipientsRefused
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.auth_app.models import OutgoingEmail
+
+# seconds before the first retry, doubled on every failed attempt
+BACKOFF_BASE = 30
+BACKOFF_MAX = 60 * 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver the OutgoingEmail outbox in batches over one reused connection of EMAIL_BACKEND. "
+        "Failed emails are retried with exponential backoff, up to --max-attempts. "
+        "Several workers can run side by side: a batch is leased to the worker that claimed it. "
+        "With --interval it keeps polling the outbox."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--max-attempts", type=int, default=8)
+        parser.add_argument("--lease", type=int, default=300,
+                            help="seconds a claimed batch is hidden from other workers")
+        parser.add_argument("--interval", type=float, default=0,
+                            help="seconds to sleep when the outbox is empty, 0 drains it once and exits")
+
+    def handle(self, *args, **options):
+        connection = None
+        try:
+            while True:
+                emails = self.claim(options["batch_size"], options["lease"])
+                if emails:
+                    if connection is None:
+                        connection = get_connection()
+                    sent, retried, failed = self.deliver(connection, emails, options["max_attempts"])
+                    self.stdout.write(f"{sent} sent, {retried} to retry, {failed} failed")
+                    continue
+                # SMTP servers drop idle sessions, reconnect on the next batch instead
+                if connection is not None:
+                    connection.close()
+                    connection = None
+                if not options["interval"]:
+                    break
+                time.sleep(options["interval"])
+        finally:
+            if connection is not None:
+                connection.close()
+
+    @staticmethod
+    def claim(batch_size, lease):
+        """ Due pending emails, their next attempt moved past the lease so no other worker takes them """
+        now = timezone.now()
+        with transaction.atomic():
+            emails = list(
+                OutgoingEmail.objects.select_for_update(skip_locked=True)
+                .filter(status=OutgoingEmail.Status.PENDING, next_attempt_at__lte=now)
+                .order_by("next_attempt_at")[:batch_size]
+            )
+            if emails:
+                OutgoingEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                    next_attempt_at=now + datetime.timedelta(seconds=lease)
+                )
+        return emails
+
+    @staticmethod
+    def backoff(attempts):
+        delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+        return datetime.timedelta(seconds=delay * random.uniform(0.5, 1))
+
+    def deliver(self, connection, emails, max_attempts):
+        """ Send one claimed batch, returns (sent, retried, failed) """
+        sent, retried, failed = [], 0, 0
+        for email in emails:
+            try:
+                # no-op while the connection is open
+                connection.open()
+                EmailMessage(
+                    subject=email.subject, body=email.body, from_email=email.from_email or None,
+                    to=[email.to_email], connection=connection,
+                ).send()
+            except Exception as error:
+                attempts = email.attempts + 1
+                # a refused address will not be accepted by a retry
+                if isinstance(error, SMTPRecipientsRefused) or attempts >= max_attempts:
+                    status, next_attempt_at = OutgoingEmail.Status.FAILED, timezone.now()
+                    failed += 1
+                else:
+                    status, next_attempt_at = OutgoingEmail.Status.PENDING, timezone.now() + self.backoff(attempts)
+                    retried += 1
+                    # the session may be broken, the next email reconnects
+                    connection.close()
+                OutgoingEmail.objects.filter(pk=email.pk).update(
+                    status=status, attempts=attempts, next_attempt_at=next_attempt_at, last_error=repr(error)[:1000],
+                )
+                continue
+            sent.append(email.pk)
+        if sent:
+            OutgoingEmail.objects.filter(pk__in=sent).update(
+                status=OutgoingEmail.Status.SENT, attempts=F("attempts") + 1, date_sent=timezone.now(),
+                body="", last_error="",
+            )
+        return len(sent), retried, failed
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-18 12:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0002_customuser_social_auth_uid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutgoingEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('to_email', models.EmailField(max_length=255)),
+                ('from_email', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('date_sent', models.DateTimeField(blank=True, null=True)),
+                ('date_create', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'OutgoingEmail',
+                'verbose_name_plural': 'OutgoingEmails',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='auth_app_ou_status_fb9c3c_idx')],
+            },
+        ),
+    ]
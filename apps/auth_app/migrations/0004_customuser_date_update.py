@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0003_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='date_update',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
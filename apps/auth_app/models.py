@@ -69,6 +69,7 @@ class CustomUser(AbstractUser):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     date_joined = models.DateTimeField(default=timezone.now)
+    date_update = models.DateTimeField(auto_now=True)
     social_media = models.ManyToManyField(
         SocialMedia,
         through=SocialThrough,
@@ -88,3 +89,36 @@ class CustomUser(AbstractUser):
         db_table = "user_table"
         verbose_name = "CustomUser"
         verbose_name_plural = "CustomUsers"
+
+
+class OutgoingEmail(models.Model):
+    """
+    Outbox of the emails sent by the API: requests only INSERT here,
+    the send_emails command delivers them over one reused SMTP connection.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        SENT = "sent", _("Sent")
+        FAILED = "failed", _("Failed")
+
+    subject = models.CharField(max_length=255)
+    # emptied once sent: reset emails carry a password
+    body = models.TextField(blank=True)
+    to_email = models.EmailField(max_length=255)
+    from_email = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # claimed rows are pushed forward by the lease, failed attempts by the backoff
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    date_sent = models.DateTimeField(null=True, blank=True)
+    date_create = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email}"
+
+    class Meta:
+        verbose_name = "OutgoingEmail"
+        verbose_name_plural = "OutgoingEmails"
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
@@ -0,0 +1,89 @@
+"""
+In-memory set of the revoked (blacklisted) refresh token jtis.
+
+The set is loaded on first use and then follows BlacklistedToken through a high-water mark:
+every POLL_INTERVAL seconds the rows with a larger id are read. Tokens blacklisted by this
+process are added immediately. Deleted rows (an un-blacklisted token) leave the set with the
+full reload every RELOAD_INTERVAL seconds, until then the token stays rejected, which errs on
+the safe side. is_revoked answers from the set alone, without a query.
+"""
+import threading
+import time
+
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+POLL_INTERVAL = 5
+RELOAD_INTERVAL = 10 * 60
+# ids are read again this far below the high-water mark: a transaction can commit a row
+# with a smaller id after a larger one was already read
+POLL_OVERLAP = 100
+
+
+class RevokedTokens:
+    def __init__(self, poll_interval=POLL_INTERVAL, reload_interval=RELOAD_INTERVAL):
+        self.poll_interval = poll_interval
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        # jti -> expiry (epoch seconds), None until loaded
+        self._revoked = None
+        self._high_water = 0
+        self._polled = 0
+        self._loaded = 0
+
+    def _read(self, rows):
+        for blacklisted_id, jti, expires_at in rows:
+            self._revoked[jti] = expires_at.timestamp()
+            self._high_water = max(self._high_water, blacklisted_id)
+
+    def _load(self):
+        self._revoked = {}
+        self._high_water = BlacklistedToken.objects.aggregate(high_water=Max('id'))['high_water'] or 0
+        self._read(
+            BlacklistedToken.objects.filter(id__lte=self._high_water, token__expires_at__gt=timezone.now())
+            .values_list('id', 'token__jti', 'token__expires_at').iterator(chunk_size=10000)
+        )
+
+    def _poll(self):
+        self._read(
+            BlacklistedToken.objects.filter(id__gt=self._high_water - POLL_OVERLAP)
+            .values_list('id', 'token__jti', 'token__expires_at')
+        )
+        now = time.time()
+        self._revoked = {jti: expiry for jti, expiry in self._revoked.items() if expiry > now}
+
+    def refresh(self):
+        now = time.monotonic()
+        if self._revoked is not None and now - self._polled < self.poll_interval:
+            return
+        # one thread polls, the others go on with the current set
+        if not self._lock.acquire(blocking=self._revoked is None):
+            return
+        try:
+            if self._revoked is None or now - self._loaded >= self.reload_interval:
+                self._load()
+                self._loaded = now
+            elif now - self._polled >= self.poll_interval:
+                self._poll()
+            self._polled = now
+        finally:
+            self._lock.release()
+
+    def is_revoked(self, jti):
+        self.refresh()
+        return jti in self._revoked
+
+    def add(self, jti, expires_at):
+        """ Called for the tokens blacklisted by this process """
+        with self._lock:
+            if self._revoked is not None:
+                self._revoked[jti] = expires_at.timestamp()
+
+    def clear(self):
+        with self._lock:
+            self._revoked = None
+            self._high_water = 0
+
+
+revoked_tokens = RevokedTokens()
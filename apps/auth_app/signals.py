@@ -0,0 +1,34 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db import transaction
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from apps.auth_app.authentication import user_cache
+from apps.auth_app.models import CustomUser
+from apps.auth_app.revocation import revoked_tokens
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+def user_groups_changed(sender, instance, reverse, pk_set, **kwargs):
+    if not reverse:
+        user_cache.invalidate(instance.pk)
+    else:
+        # group.user_set changes: the users are in pk_set, or unknown after clear()
+        if pk_set is None:
+            user_cache.clear()
+        else:
+            for pk in pk_set:
+                user_cache.invalidate(pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, created, using, **kwargs):
+    if created:
+        token = instance.token
+        transaction.on_commit(lambda: revoked_tokens.add(token.jti, token.expires_at), using=using)
@@ -0,0 +1,484 @@
+import base64
+import threading
+import time
+from io import StringIO
+from unittest import mock
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+
+import jwt
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core import mail
+from django.core.cache import caches
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import Throttled
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from apps.auth_app.api import google_certs
+from apps.auth_app.api.google_certs import GoogleCertCache, verify_id_token
+from apps.auth_app.authentication import (
+    CachedBasicAuthentication, SchemeDispatchAuthentication, TokenPrincipal, user_cache
+)
+from apps.auth_app.email_utils import Util
+from apps.auth_app.management.commands import send_emails
+from apps.auth_app.management.commands.oauth_stub_server import StubOAuthServer
+from apps.auth_app.models import CustomUser, OutgoingEmail
+from apps.auth_app.throttling import IDENTITY_RATE, LoginThrottle, SlidingWindow, login_throttle
+from apps.auth_app.revocation import POLL_INTERVAL, RELOAD_INTERVAL, revoked_tokens
+from utils.token import UserRefreshToken, get_token_for_user
+
+AUDIENCE = "client-id.apps.googleusercontent.com"
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests"},
+    "throttle": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-throttle"},
+}
+
+
+class GoogleCertCacheTests(SimpleTestCase):
+    """ ID tokens verified against the certificates of a local stub key server """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubOAuthServer(("127.0.0.1", 0))
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.cert_max_age = 3600
+        self.certs = GoogleCertCache(f"{self.server.url}/certs")
+
+    def verify(self, token, audience=AUDIENCE):
+        return verify_id_token(token, audience, certs=self.certs)
+
+    def test_valid_token(self):
+        claims = self.verify(self.server.mint_id_token(AUDIENCE, "42", "user@example.com"))
+        self.assertEqual((claims["sub"], claims["email"]), ("42", "user@example.com"))
+
+    def test_keys_downloaded_once_within_max_age(self):
+        for index in range(20):
+            self.verify(self.server.mint_id_token(AUDIENCE, str(index), f"{index}@example.com"))
+        self.assertEqual(self.certs.fetches, 1)
+
+    def test_concurrent_logins_share_one_download(self):
+        token = self.server.mint_id_token(AUDIENCE, "42", "user@example.com")
+        threads = [threading.Thread(target=self.verify, args=(token,)) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.certs.fetches, 1)
+
+    def test_expired_keys_downloaded_again(self):
+        self.server.cert_max_age = 0
+        token = self.server.mint_id_token(AUDIENCE, "42", "user@example.com")
+        self.verify(token)
+        self.verify(token)
+        self.assertEqual(self.certs.fetches, 2)
+
+    def test_background_refresh_ahead_of_expiry(self):
+        token = self.server.mint_id_token(AUDIENCE, "42", "user@example.com")
+        self.verify(token)
+        self.certs._refresh_at = time.monotonic()
+        # answered with the current keys while the refresh runs
+        self.verify(token)
+        with self.certs._lock:
+            self.assertEqual(self.certs.fetches, 2)
+
+    def test_wrong_audience(self):
+        with self.assertRaises(jwt.InvalidAudienceError):
+            self.verify(self.server.mint_id_token("other-client", "42", "user@example.com"))
+
+    def test_expired_token(self):
+        token = self.server.mint_id_token(AUDIENCE, "42", "user@example.com", lifetime=-google_certs.CLOCK_SKEW - 60)
+        with self.assertRaises(jwt.ExpiredSignatureError):
+            self.verify(token)
+
+    def test_wrong_issuer(self):
+        token = jwt.encode(
+            {"iss": "https://evil.example.com", "aud": AUDIENCE, "sub": "42",
+             "iat": int(time.time()), "exp": int(time.time()) + 60},
+            self.server.signing_key, algorithm="RS256", headers={"kid": "stub-key"},
+        )
+        with self.assertRaises(jwt.InvalidIssuerError):
+            self.verify(token)
+
+    def test_unknown_key_id_rate_limited(self):
+        self.verify(self.server.mint_id_token(AUDIENCE, "42", "user@example.com"))
+        token = jwt.encode(
+            {"iss": "accounts.google.com", "aud": AUDIENCE, "sub": "42",
+             "iat": int(time.time()), "exp": int(time.time()) + 60},
+            self.server.signing_key, algorithm="RS256", headers={"kid": "rotated-key"},
+        )
+        for _ in range(5):
+            with self.assertRaises(jwt.InvalidTokenError):
+                self.verify(token)
+        self.assertEqual(self.certs.fetches, 1)
+        # past the interval one unknown key id downloads the certificates again
+        self.certs._fetched -= google_certs.UNKNOWN_KID_INTERVAL
+        with self.assertRaises(jwt.InvalidTokenError):
+            self.verify(token)
+        self.assertEqual(self.certs.fetches, 2)
+
+
+class FailingBackend(BaseEmailBackend):
+    """ Raises FailingBackend.error on every send """
+    error = SMTPServerDisconnected("Connection unexpectedly closed")
+
+    def send_messages(self, email_messages):
+        raise self.error
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class OutboxTests(TestCase):
+
+    def queue(self, to_email="user@example.com"):
+        return Util.send({"email_subject": "Reset", "email_body": "new password: x", "to_email": to_email})
+
+    def send(self, *args):
+        call_command("send_emails", *args, stdout=StringIO())
+
+    def test_send_only_queues(self):
+        email = self.queue()
+        self.assertEqual(email.status, OutgoingEmail.Status.PENDING)
+        self.assertEqual(mail.outbox, [])
+
+    def test_sent_in_batches(self):
+        for index in range(5):
+            self.queue(f"user{index}@example.com")
+        self.send("--batch-size", "2")
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         [f"user{index}@example.com" for index in range(5)])
+        self.assertEqual(mail.outbox[0].body, "new password: x")
+        for email in OutgoingEmail.objects.all():
+            self.assertEqual((email.status, email.attempts, email.body), (OutgoingEmail.Status.SENT, 1, ""))
+            self.assertIsNotNone(email.date_sent)
+        # nothing left to deliver
+        self.send()
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_not_due_yet(self):
+        email = self.queue()
+        OutgoingEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now() + timezone.timedelta(minutes=1))
+        self.send()
+        self.assertEqual(mail.outbox, [])
+
+    @override_settings(EMAIL_BACKEND="apps.auth_app.tests.FailingBackend")
+    def test_retried_with_backoff(self):
+        email = self.queue()
+        before = timezone.now()
+        self.send()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.Status.PENDING, 1))
+        self.assertIn("SMTPServerDisconnected", email.last_error)
+        self.assertEqual(email.body, "new password: x")
+        delay = (email.next_attempt_at - before).total_seconds()
+        self.assertTrue(send_emails.BACKOFF_BASE / 2 <= delay <= send_emails.BACKOFF_BASE + 1, delay)
+        # the next attempt waits twice as long
+        OutgoingEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        before = timezone.now()
+        self.send()
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 2)
+        self.assertGreaterEqual((email.next_attempt_at - before).total_seconds(), send_emails.BACKOFF_BASE)
+
+    @override_settings(EMAIL_BACKEND="apps.auth_app.tests.FailingBackend")
+    def test_failed_after_max_attempts(self):
+        email = self.queue()
+        for _ in range(3):
+            OutgoingEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+            self.send("--max-attempts", "3")
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.Status.FAILED, 3))
+        OutgoingEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.send("--max-attempts", "3")
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 3)
+
+    @override_settings(EMAIL_BACKEND="apps.auth_app.tests.FailingBackend")
+    def test_refused_recipient_not_retried(self):
+        email = self.queue()
+        error, FailingBackend.error = FailingBackend.error, SMTPRecipientsRefused({"user@example.com": (550, b"No such user")})
+        try:
+            self.send()
+        finally:
+            FailingBackend.error = error
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.Status.FAILED, 1))
+        self.assertIn("SMTPRecipientsRefused", email.last_error)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class LoginThrottleTests(TestCase):
+    """ Failed logins per phone and password checks per IP are limited before any password is hashed """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone="+998900000030", email="login@example.com",
+                                                  password="secret")
+
+    def setUp(self):
+        caches["default"].clear()
+        caches["throttle"].clear()
+        self.client = APIClient()
+
+    def login(self, password="wrong", phone="+998900000030"):
+        return self.client.post("/auth/login/", {"phone": phone, "password": password}, format="json")
+
+    def fail(self, times):
+        for _ in range(times):
+            self.assertNotEqual(self.login().status_code, 429)
+
+    def test_identity_limit(self):
+        self.fail(IDENTITY_RATE[0])
+        with mock.patch.object(CustomUser, "check_password") as check_password:
+            response = self.login("secret")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        check_password.assert_not_called()
+        # other phones are not locked
+        self.assertNotEqual(self.login(phone="+998900000031").status_code, 429)
+
+    def test_success_resets_identity(self):
+        self.fail(IDENTITY_RATE[0] - 1)
+        self.assertEqual(self.login("secret").status_code, 200)
+        self.fail(IDENTITY_RATE[0])
+        self.assertEqual(self.login("secret").status_code, 429)
+
+    def test_counters_in_throttle_cache(self):
+        self.fail(IDENTITY_RATE[0])
+        # the response cache and everything else in the default cache can be evicted
+        caches["default"].clear()
+        self.assertEqual(self.login("secret").status_code, 429)
+        login_throttle.reset(identities=["+998900000030"])
+        self.assertEqual(self.login("secret").status_code, 200)
+
+    def test_ip_limit(self):
+        throttle = LoginThrottle(ip_rate=(3, 60))
+        request = APIRequestFactory().post("/auth/login/", REMOTE_ADDR="10.0.0.1")
+        for index in range(3):
+            with throttle.password_check(request, f"user{index}"):
+                pass
+        with self.assertRaises(Throttled):
+            with throttle.password_check(request, "user3"):
+                pass
+        with throttle.password_check(APIRequestFactory().post("/", REMOTE_ADDR="10.0.0.2"), "user3"):
+            pass
+
+    def test_busy(self):
+        throttle = LoginThrottle(max_password_checks=1)
+        request = APIRequestFactory().post("/auth/login/")
+        with throttle.password_check(request, "first"):
+            with self.assertRaises(Throttled) as raised:
+                with throttle.password_check(request, "second"):
+                    pass
+        self.assertEqual(raised.exception.wait, 1)
+
+    def test_sliding_window(self):
+        window = SlidingWindow("identity", 10, 100)
+        # half of the previous bucket is still inside the window
+        self.assertEqual(window.wait(previous=10, current=4, elapsed=50), 0)
+        self.assertEqual(window.wait(previous=10, current=5, elapsed=40), 10)
+        # exactly at the limit
+        self.assertEqual(window.wait(previous=10, current=5, elapsed=50), 1)
+        self.assertEqual(window.wait(previous=20, current=0, elapsed=25), 25)
+        self.assertEqual(window.wait(previous=0, current=10, elapsed=10), 90)
+
+
+class TokenPrincipalTests(TestCase):
+    """ A Bearer request.user is built from the token claims, the row is loaded once and shared """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone="+998900000020", email="principal@example.com",
+                                                  password="secret", is_staff=True)
+        cls.group = Group.objects.create(name="editors")
+        cls.user.groups.add(cls.group)
+
+    def setUp(self):
+        user_cache.clear()
+        self.access = get_token_for_user(self.user)['access']
+
+    def principal(self):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        with self.assertNumQueries(0):
+            user, _ = JWTStatelessUserAuthentication().authenticate(Request(request))
+        return user
+
+    def test_claims_without_query(self):
+        principal = self.principal()
+        self.assertIsInstance(principal, TokenPrincipal)
+        with self.assertNumQueries(0):
+            self.assertEqual((principal.id, principal.is_staff), (self.user.pk, True))
+            self.assertEqual(principal.group_ids, [self.group.pk])
+            self.assertTrue(principal.is_authenticated)
+
+    def test_instance_cached(self):
+        principal = self.principal()
+        # the user and its groups
+        with self.assertNumQueries(2):
+            self.assertEqual(principal.instance.email, "principal@example.com")
+        with self.assertNumQueries(0):
+            self.assertEqual(principal.instance.pk, self.user.pk)
+            self.assertEqual(self.principal().instance.pk, self.user.pk)
+
+    def test_instance_reloaded_after_save(self):
+        self.principal().instance
+        self.user.first_name = "Ann"
+        self.user.save()
+        with self.assertNumQueries(2):
+            self.assertEqual(self.principal().instance.first_name, "Ann")
+
+    def test_deleted_user(self):
+        principal = self.principal()
+        self.user.delete()
+        self.assertIsNone(principal.instance)
+
+
+class SchemeDispatchAuthenticationTests(TestCase):
+    """ One authenticator per request, picked from the Authorization scheme """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone="+998900000021", email="scheme@example.com",
+                                                  password="secret")
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        user_cache.clear()
+        CachedBasicAuthentication._verified.clear()
+
+    def request(self, authorization=None, cookies=None):
+        factory = APIRequestFactory()
+        if cookies:
+            factory.cookies.load(cookies)
+        headers = {"HTTP_AUTHORIZATION": authorization} if authorization else {}
+        return Request(factory.get("/", **headers))
+
+    def basic(self, password="secret"):
+        return "Basic " + base64.b64encode(f"scheme@example.com:{password}".encode()).decode()
+
+    def assertRoutedTo(self, authenticator_class, **request):
+        authenticator = SchemeDispatchAuthentication().get_authenticator(self.request(**request))
+        self.assertEqual(type(authenticator) if authenticator else None, authenticator_class, request)
+
+    def test_routing(self):
+        self.assertRoutedTo(JWTStatelessUserAuthentication, authorization="Bearer abc")
+        self.assertRoutedTo(JWTStatelessUserAuthentication, authorization="bearer abc")
+        self.assertRoutedTo(CachedBasicAuthentication, authorization=self.basic())
+        self.assertRoutedTo(TokenAuthentication, authorization=f"Token {self.token.key}")
+        self.assertRoutedTo(SessionAuthentication, cookies={settings.SESSION_COOKIE_NAME: "abc"})
+        self.assertRoutedTo(None)
+        self.assertRoutedTo(None, authorization="Digest abc")
+        # the Authorization header wins over the session cookie
+        self.assertRoutedTo(TokenAuthentication, authorization=f"Token {self.token.key}",
+                            cookies={settings.SESSION_COOKIE_NAME: "abc"})
+
+    def profile(self, client=None, **headers):
+        return (client or APIClient()).get("/auth/profile/", **headers)
+
+    def test_each_scheme_authenticates(self):
+        bearer = f"Bearer {get_token_for_user(self.user)['access']}"
+        for authorization in (bearer, self.basic(), f"Token {self.token.key}"):
+            response = self.profile(HTTP_AUTHORIZATION=authorization)
+            self.assertEqual(response.status_code, 200, authorization)
+            self.assertEqual(response.data["message"]["email"], "scheme@example.com")
+        client = APIClient()
+        client.force_login(self.user)
+        self.assertEqual(self.profile(client).status_code, 200)
+
+    def test_rejected(self):
+        for authorization in ("Bearer abc", self.basic("wrong"), "Token abc"):
+            self.assertEqual(self.profile(HTTP_AUTHORIZATION=authorization).status_code, 401, authorization)
+        self.assertEqual(self.profile(HTTP_AUTHORIZATION="Digest abc").status_code, 401)
+        self.assertEqual(self.profile().status_code, 401)
+
+    def test_basic_checked_once(self):
+        self.assertEqual(self.profile(HTTP_AUTHORIZATION=self.basic()).status_code, 200)
+        with mock.patch.object(CustomUser, "check_password") as check_password:
+            self.assertEqual(self.profile(HTTP_AUTHORIZATION=self.basic()).status_code, 200)
+        check_password.assert_not_called()
+
+
+class ProfileTests(TestCase):
+
+    def test_deleted_user(self):
+        user = CustomUser.objects.create_user(phone="+998900000022", email="gone@example.com", password="secret")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_token_for_user(user)['access']}")
+        user.delete()
+        self.assertEqual(client.get("/auth/profile/").status_code, 404)
+        self.assertEqual(client.put("/auth/profile/", {"first_name": "Ann"}, format="json").status_code, 404)
+
+
+class RevokedTokensTests(TestCase):
+    """ Refresh tokens are checked against the in-memory revoked set, without a query """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone="+998900000023", email="revoked@example.com")
+
+    def setUp(self):
+        revoked_tokens.clear()
+        self.client = APIClient()
+        self.refresh = get_token_for_user(self.user)["refresh"]
+        self.jti = UserRefreshToken(self.refresh)["jti"]
+        # loads the set
+        revoked_tokens.is_revoked(self.jti)
+
+    def post_refresh(self):
+        return self.client.post("/refresh/", {"refresh": self.refresh}, format="json")
+
+    def logout(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserRefreshToken(self.refresh).blacklist()
+
+    def age(self, seconds):
+        revoked_tokens._polled -= seconds
+        revoked_tokens._loaded -= seconds
+
+    def test_valid_token_without_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post_refresh().status_code, 200)
+
+    def test_logged_out_token_rejected_without_query(self):
+        self.logout()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post_refresh().status_code, 401)
+
+    def test_blacklisted_by_another_process(self):
+        # bulk_create sends no post_save, as a row written by another worker
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=OutstandingToken.objects.get(jti=self.jti))])
+        self.assertFalse(revoked_tokens.is_revoked(self.jti))
+        self.age(POLL_INTERVAL)
+        with self.assertNumQueries(1):
+            self.assertTrue(revoked_tokens.is_revoked(self.jti))
+        self.assertEqual(self.post_refresh().status_code, 401)
+
+    def test_reload_drops_deleted_rows(self):
+        self.logout()
+        BlacklistedToken.objects.filter(token__jti=self.jti).delete()
+        self.age(POLL_INTERVAL)
+        self.assertTrue(revoked_tokens.is_revoked(self.jti))
+        self.age(RELOAD_INTERVAL)
+        self.assertFalse(revoked_tokens.is_revoked(self.jti))
+        self.assertEqual(self.post_refresh().status_code, 200)
+
+    def test_expired_rows_not_loaded(self):
+        OutstandingToken.objects.filter(jti=self.jti).update(expires_at=timezone.now())
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=self.jti))
+        revoked_tokens.clear()
+        self.assertFalse(revoked_tokens.is_revoked(self.jti))
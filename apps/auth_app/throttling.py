@@ -0,0 +1,134 @@
+"""
+Login throttling, decided before any password is hashed.
+
+Two sliding-window counters kept in the "throttle" cache: failed logins per phone/email and
+password checks per client IP. A window is approximated from two fixed buckets, the previous
+one weighted by the share of it still inside the window. Over the limit the login is answered
+429 with Retry-After and no counter moves.
+Password checks in flight are capped per process: PBKDF2 is CPU-bound, more checks than cores
+only make every login slower, the ones over the cap are answered 429 at once.
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+THROTTLE_CACHE = "throttle"
+THROTTLE_KEY = "login-throttle:{}:{}:{}"
+# failed logins per phone/email, password checks per client IP: (limit, window seconds)
+IDENTITY_RATE = (10, 15 * 60)
+IP_RATE = (50, 5 * 60)
+MAX_PASSWORD_CHECKS = os.cpu_count() or 1
+# Retry-After of a login refused because every password check slot is taken
+BUSY_RETRY_AFTER = 1
+
+# processed / failed / rejected:<reason> logins, for this process
+login_throttle_stats = Counter()
+
+
+class SlidingWindow:
+    def __init__(self, scope, limit, window):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def keys(self, ident, now):
+        """ (previous bucket, current bucket) keys of ident, seconds elapsed in the current bucket """
+        digest = hashlib.md5(ident.encode()).hexdigest()
+        bucket, elapsed = divmod(now, self.window)
+        bucket = int(bucket)
+        return (
+            THROTTLE_KEY.format(self.scope, digest, bucket - 1),
+            THROTTLE_KEY.format(self.scope, digest, bucket),
+        ), elapsed
+
+    def wait(self, previous, current, elapsed):
+        """
+        Seconds until previous * (1 - elapsed / window) + current is below the limit, 0 if it already is.
+        At least 1 second over the limit: Retry-After is in whole seconds and 0 would let the login through.
+        """
+        weight = 1 - elapsed / self.window
+        if previous * weight + current < self.limit:
+            return 0
+        if current >= self.limit:
+            # current becomes the previous bucket and has to decay below the limit
+            wait = self.window - elapsed + self.window * (1 - self.limit / current)
+        else:
+            wait = self.window * (1 - (self.limit - current) / previous) - elapsed
+        return max(wait, 1)
+
+    def hit(self, key):
+        cache = caches[THROTTLE_CACHE]
+        cache.add(key, 0, timeout=2 * self.window)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # evicted between add and incr
+            cache.set(key, 1, timeout=2 * self.window)
+
+
+class LoginThrottle:
+    def __init__(self, identity_rate=IDENTITY_RATE, ip_rate=IP_RATE, max_password_checks=MAX_PASSWORD_CHECKS):
+        self.identity = SlidingWindow("identity", *identity_rate)
+        self.ip = SlidingWindow("ip", *ip_rate)
+        self._checks = threading.BoundedSemaphore(max_password_checks)
+
+    @staticmethod
+    def client_ip(request):
+        """ Same client address as DRF throttles: REMOTE_ADDR, or X-Forwarded-For with NUM_PROXIES """
+        return BaseThrottle().get_ident(request)
+
+    def _windows(self, request, identity, now):
+        return (
+            (self.identity, *self.identity.keys((identity or "").strip().casefold(), now)),
+            (self.ip, *self.ip.keys(self.client_ip(request), now)),
+        )
+
+    @contextmanager
+    def password_check(self, request, identity):
+        """
+        Wraps the authenticate() of a login: raises Throttled before it when a counter is over its
+        limit or every password check slot is taken, records the outcome after it.
+        The body sets the outcome with outcome['ok'] = True on a successful login.
+        """
+        now = time.time()
+        windows = self._windows(request, identity, now)
+        counts = caches[THROTTLE_CACHE].get_many([key for _, keys, _ in windows for key in keys])
+        for window, (previous, current), elapsed in windows:
+            wait = window.wait(counts.get(previous, 0), counts.get(current, 0), elapsed)
+            if wait:
+                login_throttle_stats[f"rejected:{window.scope}"] += 1
+                raise Throttled(wait=math.ceil(wait))
+        if not self._checks.acquire(blocking=False):
+            login_throttle_stats["rejected:busy"] += 1
+            raise Throttled(wait=BUSY_RETRY_AFTER)
+        outcome = {"ok": False}
+        try:
+            yield outcome
+        finally:
+            self._checks.release()
+        login_throttle_stats["processed"] += 1
+        (identity_window, identity_keys, _), (ip_window, ip_keys, _) = windows
+        ip_window.hit(ip_keys[1])
+        if outcome["ok"]:
+            caches[THROTTLE_CACHE].delete_many(identity_keys)
+        else:
+            login_throttle_stats["failed"] += 1
+            identity_window.hit(identity_keys[1])
+
+    def reset(self, identities=(), ips=()):
+        """ Drop the counters of these phones/emails and client IPs """
+        now = time.time()
+        keys = [key for identity in identities for key in self.identity.keys(identity.strip().casefold(), now)[0]]
+        keys += [key for ip in ips for key in self.ip.keys(ip, now)[0]]
+        caches[THROTTLE_CACHE].delete_many(keys)
+
+
+login_throttle = LoginThrottle()
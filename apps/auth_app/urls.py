@@ -12,4 +12,5 @@ urlpatterns = [
     path('profile/', views.ProfileViews.as_view()),
     path('reset_password/', views.ResetPasswordView.as_view()),
     path("social-media/", GoogleModelViewSet.as_view({"post": "social_media_auth"}), name="social_media_auth"),
+    path("social-media/async/", oauth2.AsyncGoogleLoginView.as_view(), name="social_media_auth_async"),
 ]
\ No newline at end of file
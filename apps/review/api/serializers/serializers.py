@@ -19,7 +19,7 @@ class ReviewListSerializers(serializers.ModelSerializer):
 
     def create(self, validated_data):
         user = self.context.get('request').user
-        validated_data['user'] = user
+        validated_data['user_id'] = user.id
         return super().create(validated_data)
 
     def update(self, instance, validated_data):
@@ -41,7 +41,7 @@ class ReviewDetailSerializers(serializers.ModelSerializer):
 
     def get_job(self, obj):
         """ get job title. type : str """
-        return Job.objects.filter(id=obj.job.id).values('title')
+        return list(Job.objects.filter(id=obj.job_id).values('title'))
 
     def get_user(self, obj):
         """
@@ -52,6 +52,6 @@ class ReviewDetailSerializers(serializers.ModelSerializer):
                 ...
             }
         """
-        return list(CustomUser.obejcts.filter(id=obj.user.id).values(
+        return list(CustomUser.objects.filter(id=obj.user_id).values(
             'id', 'email', 'phone', 'first_name', 'last_name', 'photo'
         ))
\ No newline at end of file
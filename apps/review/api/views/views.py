@@ -18,6 +18,10 @@ from utils.responses import (
 from utils.expected_fields import check_required_key
 from utils.renderers import UserRenderers
 from utils.pagination import PaginationMethod, StandardResultsSetPagination
+from utils.conditional import conditional_detail, conditional_list
+
+# a review shows the title of its job and the details of its user
+REVIEW_FIELDS = ('date_update', 'job__date_update', 'user__date_update')
 
 
 class ReviewListView(APIView, PaginationMethod):
@@ -30,10 +34,13 @@ class ReviewListView(APIView, PaginationMethod):
     @swagger_auto_schema(operation_description="Retrieve a list of reviewer",
                          tags=['Review'],
                          responses={200: ReviewDetailSerializers(many=True)})
+    # the review rows of the user, and the job and user each of them shows
+    @conditional_list(Review, rows=lambda request: Review.objects.filter(user_id=request.user.id),
+                      fields=REVIEW_FIELDS, vary_on_user=True)
     def get(self, request):
         try:
             queryset = Review.objects.select_related('user').filter(
-                user=request.user
+                user_id=request.user.id
             )
         except ObjectDoesNotExist:
             return bad_request_response('Object Does Not Exist')
@@ -68,6 +75,7 @@ class ReviewDetailsViews(APIView):
     @swagger_auto_schema(operation_description="Review a category",
                          tags=['Review'],
                          responses={200: ReviewListSerializers(many=True)})
+    @conditional_detail(Review, fields=REVIEW_FIELDS)
     def get(self, request, pk):
         queryset = get_object_or_404(Review, pk=pk)
         serializer = ReviewDetailSerializers(queryset)
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.ads.models import Job
+from apps.auth_app.models import CustomUser
+from apps.review.models import Review
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests"},
+    "throttle": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-throttle"},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReviewConditionalGetTests(TestCase):
+    """ Review ETags follow the reviews shown and their job and user, not every Job or CustomUser write """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone="+998900000010", email="reviewer@example.com")
+        cls.other_user = CustomUser.objects.create_user(phone="+998900000011", email="other@example.com")
+        cls.job = Job.objects.create(title="python")
+        cls.other_job = Job.objects.create(title="django")
+        cls.review = Review.objects.create(job=cls.job, user=cls.user, rating=5, first_name="Ann",
+                                           email="reviewer@example.com")
+        cls.other_review = Review.objects.create(job=cls.other_job, user=cls.other_user, rating=3,
+                                                 first_name="Bob", email="other@example.com")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertValidators(self, url, unrelated, related):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        for write in unrelated:
+            write()
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304, f"{url} after {write}")
+        for write in related:
+            write()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, f"{url} after {write}")
+            etag = response["ETag"]
+
+    def test_list(self):
+        self.assertValidators(
+            "/review/",
+            unrelated=[self.other_job.save, self.other_user.save, self.other_review.save,
+                       lambda: Review.objects.create(job=self.job, user=self.other_user, rating=1)],
+            related=[self.review.save, self.job.save, self.user.save,
+                     lambda: Review.objects.create(job=self.other_job, user=self.user, rating=4),
+                     lambda: Review.objects.filter(user=self.user).order_by("id").first().delete()],
+        )
+
+    def test_list_costs_one_query(self):
+        etag = self.client.get("/review/")["ETag"]
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/review/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_detail(self):
+        self.assertValidators(
+            f"/review//{self.review.pk}/",
+            unrelated=[self.other_job.save, self.other_user.save, self.other_review.save],
+            related=[self.review.save, self.job.save, self.user.save],
+        )
+
+    def test_detail_without_user(self):
+        review = Review.objects.create(job=self.job, rating=4, first_name="Guest", email="guest@example.com")
+        response = self.client.get(f"/review//{review.pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f"/review//{review.pk}/", HTTP_IF_NONE_MATCH=response["ETag"]).status_code,
+                         304)
@@ -17,6 +17,8 @@ from utils.responses import (
 from utils.expected_fields import check_required_key
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from utils.cache import cache_response
+from utils.conditional import conditional_detail, conditional_list
 
 
 class TeamRoleListViews(APIView):
@@ -27,6 +29,7 @@ class TeamRoleListViews(APIView):
     @swagger_auto_schema(operation_description="Retrieve a list of team role",
                          tags=['Team Role'],
                          responses={200: TeamRoleListSerializers(many=True)})
+    @cache_response(depends_on=[TeamRole])
     def get(self, request):
         queryset = TeamRole.objects.all().order_by('-id')
         serializer = TeamRoleListSerializers(queryset, many=True)
@@ -105,6 +108,8 @@ class TeamListViews(APIView):
     @swagger_auto_schema(operation_description="Retrieve a list of Team",
                          tags=['Team'],
                          responses={200: TeamDetailSerializers(many=True)})
+    @conditional_list(Team, depends_on=[TeamRole])
+    @cache_response(depends_on=[Team, TeamRole])
     def get(self, request):
         queryset = Team.objects.all().order_by('-id')
         serializer = TeamDetailSerializers(queryset, many=True)
@@ -138,6 +143,7 @@ class TeamDetailsViews(APIView):
     @swagger_auto_schema(operation_description="Retrieve a Team",
                          tags=['Team'],
                          responses={200: TeamDetailSerializers(many=True)})
+    @conditional_detail(Team, depends_on=[TeamRole])
     def get(self, request, pk):
         queryset = get_object_or_404(Team, pk=pk)
         serializer = TeamDetailSerializers(queryset)
@@ -0,0 +1,37 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.team.models import Team, TeamRole
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests"},
+    "throttle": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-throttle"},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResponseCacheInvalidationTests(TestCase):
+    """ Every cached view misses again after a write of each model it depends on """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = TeamRole.objects.create(name="Backend")
+        cls.team = Team.objects.create(name="Ads", role=cls.role, photo="path/team.png")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def assertInvalidatedBy(self, url, *writes):
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        for write in writes:
+            self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+            write()
+            self.assertEqual(self.client.get(url)["X-Cache"], "MISS", f"{url} after {write}")
+
+    def test_team_roles(self):
+        self.assertInvalidatedBy("/team/roles/", self.role.save)
+
+    def test_teams(self):
+        self.assertInvalidatedBy("/team/", self.team.save, self.role.save)
@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
+
+The async views (auth/social-media/async/) only free the worker while they wait on the
+provider when served from here, e.g.:
+
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker -w 4
 """
 
 import os
@@ -53,7 +53,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "utils.middlewares.middleware.AsyncWhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.common.CommonMiddleware',
@@ -108,6 +108,32 @@ DATABASES = {
 #     }
 # }
 
+# Shared by every worker process: the model versions kept here invalidate the response cache
+# and the in-process indexes (category tree, city index, reference snapshot...) of all workers.
+# Without REDIS_URL (local runserver, a single process) the caches fall back to LocMemCache,
+# which would leave the other workers stale after a change: always set it in production.
+REDIS_URL = os.environ.get("REDIS_URL")
+
+# login throttle counters (apps.auth_app.throttling), apart from the response cache so that
+# a flood of cache entries can not evict them: point it at a server with maxmemory-policy noeviction
+THROTTLE_REDIS_URL = os.environ.get("THROTTLE_REDIS_URL", REDIS_URL)
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f"{REDIS_URL}/0",
+    } if REDIS_URL else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "throttle": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f"{THROTTLE_REDIS_URL}/1",
+    } if THROTTLE_REDIS_URL else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "throttle",
+    },
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -171,11 +197,9 @@ SPECTACULAR_SETTINGS = {
 
 AUTHENTICATION_CLASSES = ("dj_rest_auth.authentication.AllAuthJWTAuthentication",)
 REST_FRAMEWORK = {
+    # Bearer JWT, Session, Basic or Token auth, one of them per request picked from the Authorization scheme
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        "rest_framework.authentication.SessionAuthentication",
-        "rest_framework.authentication.BasicAuthentication",
-        'rest_framework.authentication.TokenAuthentication',
+        'apps.auth_app.authentication.SchemeDispatchAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -205,6 +229,9 @@ SIMPLE_JWT = {
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
+    # request.user is built from the token claims, the user row is loaded only on demand
+    'TOKEN_USER_CLASS': 'apps.auth_app.authentication.TokenPrincipal',
+    'TOKEN_REFRESH_SERIALIZER': 'apps.auth_app.api.serializers.serializers.UserTokenRefreshSerializer',
     'ALLOWED_HOSTS': ['*'],
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME_CLAIM': 'exp',
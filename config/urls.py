@@ -53,7 +53,11 @@ urlpatterns = [
 
     # city
     path('cities/', views.CityListView.as_view()),
-    path('city/<int:pk>/', views.CityDetailViews.as_view())
+    path('cities/autocomplete/', views.CityAutocompleteView.as_view()),
+    path('city/<int:pk>/', views.CityDetailViews.as_view()),
+
+    # reference data
+    path('reference/snapshot/', views.ReferenceSnapshotView.as_view()),
 ]
 
 
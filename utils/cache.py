@@ -0,0 +1,172 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from rest_framework import status
+from rest_framework.response import Response
+
+MODEL_VERSION_KEY = "model-version:{}"
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+# comma-separated ids, their order does not change the result
+ID_LIST_PARAMS = ("category", "city", "categoryTree")
+
+# hits / misses per view, for this process
+response_cache_stats = Counter()
+
+# (version key, version before) -> version after, of the bumps made by this process
+_local_bumps = {}
+_local_bumps_lock = threading.Lock()
+MAX_LOCAL_BUMPS = 10000
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _version_key(model):
+    return MODEL_VERSION_KEY.format(model._meta.label_lower)
+
+
+def get_model_versions(models):
+    """
+    Current version of every model, one cache round-trip.
+    Versions only grow: they start at the current time in ms and every change bumps them.
+    """
+    keys = {_version_key(model): model for model in models}
+    versions = cache.get_many(keys.keys())
+    for key in keys.keys() - versions.keys():
+        cache.add(key, _now_ms(), timeout=None)
+        versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_model_version(model):
+    return get_model_versions([model])[0]
+
+
+def bump_model_version(model):
+    """
+    Called on every change of model: all cache entries built from the old version become unreachable.
+    The version moves with one atomic cache.incr, so workers bumping at the same time still get
+    a version each. The step brings a version behind the clock up to the current time in ms.
+    """
+    key = _version_key(model)
+    now = _now_ms()
+    current = cache.get(key)
+    if current is None:
+        # missing or evicted: the version starts again from the current time
+        cache.add(key, now - 1, timeout=None)
+        current = cache.get(key, now - 1)
+    step = max(now - current, 1)
+    try:
+        version = cache.incr(key, step)
+    except ValueError:
+        # evicted between get and incr
+        return bump_model_version(model)
+    with _local_bumps_lock:
+        _local_bumps[(key, version - step)] = version
+        if len(_local_bumps) > MAX_LOCAL_BUMPS:
+            del _local_bumps[next(iter(_local_bumps))]
+    return version
+
+
+def moved_locally(model, since, version):
+    """
+    True when the version of model went from since to version through bumps of this process only:
+    whoever follows the version can then apply its own changes instead of reloading.
+    """
+    key = _version_key(model)
+    with _local_bumps_lock:
+        while since != version:
+            since = _local_bumps.get((key, since))
+            if since is None:
+                return False
+    return True
+
+
+def _model_changed(sender, **kwargs):
+    bump_model_version(sender)
+
+
+def watch_model(model):
+    """ Bump the version of model on every save/delete. Safe to call more than once. """
+    uid = _version_key(model)
+    post_save.connect(_model_changed, sender=model, dispatch_uid=uid)
+    post_delete.connect(_model_changed, sender=model, dispatch_uid=uid)
+
+
+def _reads(name, names):
+    """ names of a view's query params, a name ending with '.' stands for every param with that prefix """
+    return name in names or any(prefix.endswith('.') and name.startswith(prefix) for prefix in names)
+
+
+def normalize_query_params(query_params, names=None):
+    """
+    Order-insensitive form of the query string:
+    ?city=3,1&category=2 and ?category=2&city=1,3 give the same result.
+    Only the id lists (ID_LIST_PARAMS) are split on commas and sorted, every other value is kept
+    as sent, and a param sent with an empty value (?cursor=) is kept: it is not the same request.
+    """
+    normalized = []
+    for name in sorted(query_params.keys()):
+        if names is not None and not _reads(name, names):
+            continue
+        values = query_params.getlist(name)
+        if name in ID_LIST_PARAMS:
+            values = sorted(part.strip() for value in values for part in value.split(",") if part.strip())
+        normalized.append((name, tuple(values)))
+    return tuple(normalized)
+
+
+def make_cache_key(prefix, *parts, models=()):
+    """ Key built from arbitrary parts plus the versions of the models the cached value depends on """
+    versions = get_model_versions(models) if models else []
+    digest = hashlib.md5(repr((parts, versions)).encode()).hexdigest()
+    return f"{prefix}:{digest}"
+
+
+def cache_response(depends_on, timeout=RESPONSE_CACHE_TIMEOUT, vary_on_user=False, query_params=()):
+    """
+    Cache successful responses of an APIView method.
+
+        @cache_response(depends_on=[Job, City], query_params=("city", "page", "attr."))
+        def get(self, request): ...
+
+    The key is built from scheme, host, path, the normalized query params the view reads
+    (query_params, a name ending with '.' is a prefix) and, with vary_on_user, the user id.
+    Other params are left out of the key: the view ignores them, and an entry per junk
+    query string would evict the rest of the cache. Any save/delete of a depends_on model
+    evicts the entry. Sets the X-Cache header to HIT or MISS.
+    """
+    for model in depends_on:
+        watch_model(model)
+
+    def decorator(view_method):
+        name = view_method.__qualname__
+
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            user = request.user.pk if vary_on_user else None
+            key = make_cache_key(
+                "response", name, request.scheme, request.get_host(), request.path, args, sorted(kwargs.items()),
+                normalize_query_params(request.query_params, query_params), user,
+                models=depends_on,
+            )
+            data = cache.get(key)
+            if data is not None:
+                response_cache_stats[f"{name}:hit"] += 1
+                response = Response(data, status=status.HTTP_200_OK)
+                response["X-Cache"] = "HIT"
+                return response
+            response_cache_stats[f"{name}:miss"] += 1
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK and getattr(response, "data", None) is not None:
+                cache.set(key, response.data, timeout)
+            response["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
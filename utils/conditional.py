@@ -0,0 +1,131 @@
+"""
+Conditional GET for APIView methods.
+
+The validator of a detail response is computed with one small query before the view runs:
+the (pk, date_update) row of the object, mixed with the cache versions of the other models
+the response is built from. The validator of a list response comes from the cache versions
+of the models it is built from alone, without a query, or, when the view names the rows it
+lists, from one aggregate (count and latest timestamps) over those rows.
+A matching If-None-Match (or If-Modified-Since when no ETag is sent) is answered
+with 304 Not Modified without loading related objects or running serializers.
+"""
+import datetime
+import functools
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from utils.cache import get_model_versions, watch_model, normalize_query_params
+
+
+def _validators(parts, last_modified, depends_on):
+    """ (ETag, Last-Modified) of a response built from parts and the depends_on models """
+    versions = get_model_versions(depends_on) if depends_on else []
+    if versions:
+        # versions are ms timestamps of the last change, later than or equal to it
+        changed = datetime.datetime.fromtimestamp(max(versions) / 1000, tz=datetime.timezone.utc)
+        last_modified = max(last_modified, changed) if last_modified else changed
+    digest = hashlib.md5(repr((parts, versions, last_modified)).encode()).hexdigest()
+    return f'W/"{digest}"', last_modified
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        # weak comparison, as required for If-None-Match
+        return '*' in etags or etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in etags}
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return (
+        if_modified_since is not None and last_modified is not None
+        and int(last_modified.timestamp()) <= if_modified_since
+    )
+
+
+def _respond(view_method, self, request, args, kwargs, etag, last_modified):
+    if _not_modified(request, etag, last_modified):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    if not response.has_header('Cache-Control'):
+        response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def conditional_detail(model, depends_on=(), lookup='pk', fields=('date_update',)):
+    """
+    ETag / Last-Modified for a detail APIView method taking the primary key as the lookup kwarg.
+
+        @conditional_detail(Job, depends_on=[Category, City])
+        def get(self, request, pk): ...
+
+    fields are the datetime columns (related lookups allowed) that move when the object does,
+    Last-Modified is the latest of them, a NULL one (an unset nullable relation) is left out.
+    depends_on lists the related models the response shows: any save/delete of one of them
+    changes the validators of every object, prefer a field of a row that follows them when
+    there is one. A missing object falls through to the view (404).
+    """
+    for related in depends_on:
+        watch_model(related)
+
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            pk = kwargs.get(lookup)
+            row = model.objects.filter(pk=pk).values_list('pk', *fields).first() if pk is not None else None
+            stamps = [stamp for stamp in row[1:] if stamp is not None] if row is not None else []
+            if not stamps:
+                return view_method(self, request, *args, **kwargs)
+            etag, last_modified = _validators(
+                (model._meta.label_lower, *row, request.get_host()), max(stamps), depends_on
+            )
+            return _respond(view_method, self, request, args, kwargs, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def conditional_list(model, depends_on=(), vary_on_user=False, rows=None, fields=('date_update',)):
+    """
+    ETag / Last-Modified for a list APIView method, from the cache versions of model and
+    depends_on and the query string: no query, a list served by cache_response stays query free.
+
+        @conditional_list(City, depends_on=[Country])
+        def get(self, request): ...
+
+    rows, a function of the request returning the queryset the view lists, validates on those
+    rows instead of the version of model: one aggregate of their count and the latest of each
+    of fields (related lookups allowed), so writes to rows of other lists leave this one valid.
+
+        @conditional_list(Review, rows=lambda request: Review.objects.filter(user_id=request.user.id),
+                          fields=('date_update', 'job__date_update'), vary_on_user=True)
+    """
+    depends_on = [*depends_on] if rows is not None else [model, *depends_on]
+    for related in depends_on:
+        watch_model(related)
+
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            user = request.user.pk if vary_on_user else None
+            parts = (model._meta.label_lower, request.get_host(), request.path,
+                     normalize_query_params(request.query_params), user)
+            last_modified = None
+            if rows is not None:
+                aggregate = rows(request).order_by().aggregate(
+                    total=Count('pk'), **{f'latest_{index}': Max(field) for index, field in enumerate(fields)}
+                )
+                stamps = [stamp for name, stamp in aggregate.items() if name != 'total' and stamp is not None]
+                last_modified = max(stamps) if stamps else None
+                parts = (*parts, tuple(aggregate.values()))
+            etag, last_modified = _validators(parts, last_modified, depends_on)
+            return _respond(view_method, self, request, args, kwargs, etag, last_modified)
+        return wrapper
+    return decorator
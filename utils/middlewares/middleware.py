@@ -1,3 +1,4 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.http import JsonResponse
 from rest_framework import status
 from rest_framework_simplejwt.authentication import JWTAuthentication
@@ -5,28 +6,43 @@ from django.utils.deprecation import MiddlewareMixin
 from django.middleware.csrf import CsrfViewMiddleware
 from django.conf import settings
 import requests
+from whitenoise.middleware import WhiteNoiseMiddleware
 
 
-class JsonErrorResponseMiddleware:
+class AsyncCapableMiddleware:
+    """
+    Runs in the mode of the handler it wraps: a sync-only middleware under ASGI makes Django
+    run the rest of the chain, async views included, in a thread held for the whole request.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        response = self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
         return response
 
+
+class JsonErrorResponseMiddleware(AsyncCapableMiddleware):
     def process_exception(self, request, exception):
         error_message = str(exception)
         response_data = {"error": error_message}
         return JsonResponse(response_data, status=500)
 
 
-class Custom404Middleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
-        response = self.get_response(request)
+class Custom404Middleware(AsyncCapableMiddleware):
+    def process_response(self, request, response):
         if response is None:
             return self.handle_404(request)
 
@@ -40,6 +56,31 @@ class Custom404Middleware:
         return JsonResponse(data, status=status.HTTP_404_NOT_FOUND)
 
 
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """ WhiteNoiseMiddleware that lets the requests which are not static files through without a thread hop """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
 class SimpleJWTAuthenticationMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -7,18 +7,40 @@ class StandardResultsSetPagination(pagination.PageNumberPagination):
     max_page_size = 1000
 
 
+class CursorResultsSetPagination(pagination.CursorPagination):
+    """
+    Keyset pagination, enabled per request with ?cursor=
+    No COUNT(*) and no OFFSET: every page is a "WHERE id < last_id" seek on the primary key,
+    so page 10 000 costs the same as page 1. next/previous are opaque tokens.
+    """
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+    ordering = ('-id',)
+
+
 class Pagination:
+    cursor_pagination_class = None
+
     @property
     def paginator(self):
         if not hasattr(self, "_paginator"):
-            if self.pagination_class is None:
+            pagination_class = self.get_pagination_class()
+            if pagination_class is None:
                 self._paginator = None
             else:
-                self._paginator = self.pagination_class()
+                self._paginator = pagination_class()
         else:
             pass
         return self._paginator
 
+    def get_pagination_class(self):
+        """ Clients opt into the cursor mode by sending ?cursor= (empty value for the first page) """
+        cursor_class = self.cursor_pagination_class
+        if cursor_class is not None and cursor_class.cursor_query_param in self.request.query_params:
+            return cursor_class
+        return self.pagination_class
+
     def paginate_queryset(self, queryset):
         if self.paginator is None:
             return None
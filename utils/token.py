@@ -1,8 +1,32 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from apps.auth_app.revocation import revoked_tokens
+
+
+class UserRefreshToken(RefreshToken):
+    """
+    Carries the claims the stateless principal is built from: user id, group ids and is_staff.
+    The blacklist is checked against the in-memory set of revoked jtis.
+    """
+
+    def check_blacklist(self):
+        if revoked_tokens.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['groups'] = list(user.groups.values_list('id', flat=True))
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        return token
+
 
 def get_token_for_user(user):
-    refresh = RefreshToken.for_user(user)
+    refresh = UserRefreshToken.for_user(user)
     return {
       "refresh": str(refresh),
-      "access": str(refresh.access_token)}
\ No newline at end of file
+      "access": str(refresh.access_token)}